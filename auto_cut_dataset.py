@@ -60,13 +60,19 @@ def analyze_and_extract(dataset,
                        start_idx: int = 0,
                        end_idx: int = 10000,
                        before_frames: int = 30,
-                       after_frames: int = 30) -> tuple:
+                       after_frames: int = 30,
+                       detect_method: str = 'columnar',
+                       detect_workers: int = 1,
+                       keyframe_cache: Optional[str] = None,
+                       event_rules: Optional[list] = None,
+                       coarse_stride: int = 16) -> tuple:
     """
     分析数据集并提取关键帧
     """
     print(f"\n🔍 分析数据集 ({start_idx} - {end_idx})...")
     print(f"  - 关键帧前: {before_frames} 帧")
     print(f"  - 关键帧后: {after_frames} 帧")
+    print(f"  - 检测方式: {detect_method}")
     
     changes, frame_ranges = analyze_gripper_changes(
         dataset, 
@@ -74,7 +80,12 @@ def analyze_and_extract(dataset,
         end_idx, 
         before_frames=before_frames,
         after_frames=after_frames,
-        merge=False
+        merge=False,
+        method=detect_method,
+        num_workers=detect_workers,
+        cache_path=keyframe_cache,
+        event_rules=event_rules,
+        coarse_stride=coarse_stride
     )
     
     return changes, frame_ranges
@@ -223,9 +234,26 @@ def main():
                        help='关键帧前取的帧数')
     parser.add_argument('--after-frames', type=int, default=30,
                        help='关键帧后取的帧数')
+    parser.add_argument('--detect-method', type=str, default='columnar',
+                       choices=['columnar', 'frame', 'coarse', 'events'],
+                       help='夹爪检测方式: columnar(只读低维列，不解码图像), frame(逐帧读取), '
+                            'coarse(粗采样+二分定位，适合无法列式读取的数据源), events(多信号事件引擎)')
+    parser.add_argument('--event-rules', type=str, default='action_flip',
+                       help='events检测使用的规则，逗号分隔: action_flip, gripper_width, contact_onset')
+    parser.add_argument('--coarse-stride', type=int, default=16,
+                       help='coarse检测的采样间隔（常值区间短于该值的抖动会被漏检，默认16）')
+    parser.add_argument('--detect-workers', type=int, default=1,
+                       help='逐帧检测(frame)时的进程数，按episode分片并行（默认1）；'
+                            '只对 --detect-method frame 生效，其他检测方式会忽略并给出警告')
+    parser.add_argument('--materialize-signals', action='store_true',
+                       help='将低维信号(action/state/索引列)物化为数据集旁的内存映射文件，后续分析零拷贝复用')
+    parser.add_argument('--keyframe-cache', type=str, default=None,
+                       help='关键帧索引缓存文件（默认: output_dir/keyframe_index.npz）')
+    parser.add_argument('--no-keyframe-cache', action='store_true',
+                       help='禁用关键帧索引缓存，每次重新检测')
     parser.add_argument('--save-mode', type=str, default='lerobot',
-                       choices=['image', 'lerobot', 'both'],
-                       help='保存模式: image(图片), lerobot(Parquet), both(两者)')
+                       choices=['image', 'lerobot', 'both', 'lerobot-video', 'image-tar'],
+                       help='保存模式: image(图片), lerobot(Parquet), both(两者), lerobot-video(相机画面编码为MP4视频), image-tar(图片写入tar分片)')
     parser.add_argument('--llm-provider', type=str, default='local',
                        choices=['local', 'qwen', 'deepseek', 'gpt'],
                        help='LLM提供者')
@@ -263,9 +291,43 @@ def main():
                        help='采样频率（默认10.0）')
     parser.add_argument('--use-traditional-method', action='store_true',
                        help='使用传统方法保存（禁用官方API）')
+    parser.add_argument('--no-direct-read', action='store_true',
+                       help='禁用源Parquet按范围直接读取，改为逐帧 dataset[i] 读取')
+    parser.add_argument('--image-passthrough', action='store_true',
+                       help='原样写出源PNG/JPEG图像字节，不解码再编码（传统方法和图片模式）')
+    parser.add_argument('--read-workers', type=int, default=1,
+                       help='流式处理中读取批次的线程数（默认1）')
+    parser.add_argument('--convert-workers', type=int, default=2,
+                       help='流式处理中图像转换/编码的线程数（默认2）')
+    parser.add_argument('--pipeline-queue-size', type=int, default=1,
+                       help='流水线阶段之间缓冲的批次数（默认1，越大内存占用越高）')
+    parser.add_argument('--memory-budget', type=float, default=None,
+                       help='内存预算（GB）：按实测每帧字节数和进程RSS自适应划分批次，代替 --batch-size')
+    parser.add_argument('--data-file-size-mb', type=float, default=100,
+                       help='传统方法每个数据文件 data/chunk-XXX/file-YYY.parquet 的大小上限MB（默认100）')
+    parser.add_argument('--video-codec', type=str, default='libsvtav1',
+                       help='lerobot-video模式的视频编码器（默认libsvtav1即AV1，也可用libx264等）')
+    parser.add_argument('--video-workers', type=int, default=4,
+                       help='lerobot-video模式并行编码episode的线程数（默认4）')
+    parser.add_argument('--video-file-size-mb', type=float, default=500,
+                       help='lerobot-video模式每个视频文件 videos/<相机>/chunk-XXX/file-YYY.mp4 的大小上限MB（默认500）')
+    parser.add_argument('--image-workers', type=int, default=4,
+                       help='图片模式编码并写出JPEG的线程数（默认4）')
+    parser.add_argument('--shard-size-mb', type=float, default=1000,
+                       help='image-tar模式每个tar分片 shards/shard-XXXXXX.tar 的大小上限MB（默认1000）')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='裁剪进程数：>1时帧范围分片后在多个进程中裁剪再合并（流式lerobot模式，传统方法写出）')
+    parser.add_argument('--row-group-cache-mb', type=float, default=256,
+                       help='源Parquet row group缓存上限MB（裁剪与VLM描述生成共享，0表示禁用，默认256）')
+    parser.add_argument('--cache-images', action='store_true',
+                       help='row group缓存同时缓存图像列（默认只缓存低维列）')
     
     args = parser.parse_args()
     
+    # 进程内共享的源Parquet row group缓存
+    from parquet_range_reader import configure_row_group_cache
+    configure_row_group_cache(args.row_group_cache_mb, cache_images=args.cache_images)
+    
     print("=" * 80)
     print("🚀 Pick/Place 自动化数据集裁剪和转换")
     print("=" * 80)
@@ -286,6 +348,11 @@ def main():
         # 加载数据集
         dataset = load_lerobot_dataset(args.dataset_path)
         
+        # 物化低维信号（已是最新时直接复用）
+        if args.materialize_signals:
+            from signal_store import SignalStore
+            SignalStore.materialize(dataset.root)
+        
         # 如果没有指定 end_idx，使用数据集总长度
         end_idx = args.end_idx if args.end_idx is not None else len(dataset)
         
@@ -293,13 +360,23 @@ def main():
         if args.end_idx is None:
             print(f"   ℹ️  未指定 --end-idx，将处理所有数据")
         
+        # 关键帧索引缓存（数据集未变化时跳过检测）
+        keyframe_cache = None
+        if not args.no_keyframe_cache:
+            keyframe_cache = args.keyframe_cache or str(output_dir / 'keyframe_index.npz')
+        
         # 分析和提取
         changes, frame_ranges = analyze_and_extract(
             dataset, 
             args.start_idx, 
             end_idx,
             before_frames=args.before_frames,
-            after_frames=args.after_frames
+            after_frames=args.after_frames,
+            detect_method=args.detect_method,
+            detect_workers=args.detect_workers,
+            keyframe_cache=keyframe_cache,
+            event_rules=[r.strip() for r in args.event_rules.split(',') if r.strip()],
+            coarse_stride=args.coarse_stride
         )
         
         # 生成任务描述
@@ -345,7 +422,20 @@ def main():
             repo_id=args.repo_id,
             robot_type=args.robot_type,
             fps=args.fps,
-            use_official_api=not args.use_traditional_method
+            use_official_api=not args.use_traditional_method,
+            direct_read=not args.no_direct_read,
+            image_passthrough=args.image_passthrough,
+            read_workers=args.read_workers,
+            convert_workers=args.convert_workers,
+            pipeline_queue_size=args.pipeline_queue_size,
+            memory_budget_gb=args.memory_budget,
+            workers=args.workers,
+            data_files_size_in_mb=args.data_file_size_mb,
+            video_codec=args.video_codec,
+            video_workers=args.video_workers,
+            video_files_size_in_mb=args.video_file_size_mb,
+            image_workers=args.image_workers,
+            shard_size_in_mb=args.shard_size_mb
         )
         
         print(f"\n✅ 数据集裁剪和转换完成!")
@@ -355,6 +445,10 @@ def main():
             print(f"📋 图片模式: 可以直接查看 {output_path}/images/ 目录下的图片")
         elif args.save_mode == 'lerobot':
             print(f"📋 LeRobot模式: 可以使用LeRobotDataset加载训练")
+        elif args.save_mode == 'lerobot-video':
+            print(f"📋 LeRobot视频模式: 相机画面在 {output_path}/videos/ 目录下")
+        elif args.save_mode == 'image-tar':
+            print(f"📋 tar分片图片模式: 分片与索引在 {output_path}/shards/ 目录下（WebDataset可直接读取）")
         else:
             print(f"📋 两种模式都已保存")
     else:
@@ -0,0 +1,386 @@
+"""
+有界队列连接的多阶段流水线：读取、转换、写入并发执行，队列满时自动反压
+"""
+import gc
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# 阶段结束标记
+_DONE = object()
+
+
+class StagedPipeline:
+    """
+    多阶段流水线
+        
+        source ──► [stage 1 × N1] ──► [stage 2 × N2] ──► ... ──► sink（调用线程，按输入顺序）
+    
+    - 每个阶段有自己的工作线程，阶段之间用有界队列连接（队列满时上游阻塞，内存占用有上限）
+    - 同一阶段的多个线程可以乱序完成，sink 按输入顺序依次处理结果
+    - 任一阶段抛出异常时整个流水线停止，异常在 run() 中重新抛出
+    """
+    
+    def __init__(self, stages: List[Tuple[str, Callable, int]], queue_size: int = 2):
+        """
+        Args:
+            stages: [(阶段名, 处理函数, 线程数), ...]
+            queue_size: 阶段之间每个队列的容量（按条目计）
+        """
+        self.stages = [(name, fn, max(1, int(workers))) for name, fn, workers in stages]
+        self.queue_size = max(1, int(queue_size))
+        # 每个阶段的统计：处理条数、处理耗时、等待输入/输出的耗时（秒）
+        self.stats: Dict[str, Dict[str, float]] = {}
+    
+    def _record(self, name: str, busy: float = 0.0, wait: float = 0.0, items: int = 0):
+        with self._lock:
+            stats = self.stats.setdefault(name, {'items': 0, 'busy_s': 0.0, 'wait_s': 0.0})
+            stats['items'] += items
+            stats['busy_s'] += busy
+            stats['wait_s'] += wait
+    
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+    
+    def _fail(self, error: BaseException):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+    
+    def run(self, source: Iterable, sink: Callable, total: Optional[int] = None):
+        """
+        运行流水线直到 source 耗尽
+        
+        Args:
+            source: 输入条目（在独立线程中迭代，迭代本身也与后续阶段并发）
+            sink: 按输入顺序处理最终结果的函数（在调用线程中执行）
+            total: 条目总数（仅用于日志）
+        """
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._error = None
+        self.stats = {}
+        
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        finished = [0] * len(self.stages)
+        
+        def feed():
+            try:
+                for seq, item in enumerate(source):
+                    if not self._put(queues[0], (seq, item)):
+                        return
+                for _ in range(self.stages[0][2]):
+                    self._put(queues[0], _DONE)
+            except BaseException as e:
+                self._fail(e)
+        
+        def work(position: int):
+            name, fn, workers = self.stages[position]
+            next_workers = self.stages[position + 1][2] if position + 1 < len(self.stages) else 1
+            try:
+                while True:
+                    wait_start = time.perf_counter()
+                    got = self._get(queues[position])
+                    self._record(name, wait=time.perf_counter() - wait_start)
+                    if got is _DONE:
+                        break
+                    seq, item = got
+                    
+                    busy_start = time.perf_counter()
+                    result = fn(item)
+                    self._record(name, busy=time.perf_counter() - busy_start, items=1)
+                    
+                    wait_start = time.perf_counter()
+                    if not self._put(queues[position + 1], (seq, result)):
+                        return
+                    self._record(name, wait=time.perf_counter() - wait_start)
+            except BaseException as e:
+                self._fail(e)
+                return
+            
+            # 本阶段所有线程结束后，通知下游的每个线程
+            with self._lock:
+                finished[position] += 1
+                last = finished[position] == workers
+            if last:
+                for _ in range(next_workers):
+                    self._put(queues[position + 1], _DONE)
+        
+        threads = [threading.Thread(target=feed, name='pipeline-source', daemon=True)]
+        for position, (name, _, workers) in enumerate(self.stages):
+            threads += [threading.Thread(target=work, args=(position,), name=f'pipeline-{name}-{k}', daemon=True)
+                        for k in range(workers)]
+        for thread in threads:
+            thread.start()
+        
+        # sink：按输入顺序处理（乱序到达的结果暂存，等待前面的条目）
+        pending = {}
+        next_seq = 0
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                got = self._get(queues[-1])
+                self._record('sink', wait=time.perf_counter() - wait_start)
+                if got is _DONE:
+                    break
+                seq, result = got
+                pending[seq] = result
+                while next_seq in pending:
+                    busy_start = time.perf_counter()
+                    sink(pending.pop(next_seq))
+                    self._record('sink', busy=time.perf_counter() - busy_start, items=1)
+                    next_seq += 1
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        
+        if self._error is not None:
+            raise self._error
+        if total is not None and next_seq != total:
+            raise RuntimeError(f"流水线提前结束: 处理了 {next_seq}/{total} 个条目")
+    
+    def print_stats(self):
+        """打印各阶段的处理耗时与等待耗时"""
+        print(f"  ⏱️  流水线统计:")
+        for name, stats in self.stats.items():
+            print(f"    - {name}: {int(stats['items'])} 项, 处理 {stats['busy_s']:.1f}s, 等待 {stats['wait_s']:.1f}s")
+
+
+
+class AsyncWriterPool:
+    """
+    有界队列连接的写出线程池：提交任务（如图像编码+写文件）后立即返回，由工作线程并发执行
+    
+        提交方（主线程）──► [有界任务队列] ──► [worker × N]
+    
+    - 队列满时 submit() 阻塞（反压），排队中的任务数有上限
+    - 任务抛出的异常在下一次 submit() 或 close() 时重新抛出
+    """
+    
+    def __init__(self, workers: int = 4, queue_size: int = 64, name: str = 'writer'):
+        """
+        Args:
+            workers: 工作线程数
+            queue_size: 任务队列容量（按任务计）
+            name: 线程名前缀（也用于统计输出）
+        """
+        self.workers = max(1, int(workers))
+        self.name = name
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+        # 统计：完成的任务数、工作线程处理耗时、工作线程等待任务的耗时、提交方因队列满而等待的耗时（秒）
+        self.stats: Dict[str, float] = {'items': 0, 'busy_s': 0.0, 'idle_s': 0.0, 'submit_wait_s': 0.0}
+        self._started = time.perf_counter()
+        self._elapsed: Optional[float] = None
+        self._threads = [threading.Thread(target=self._work, name=f'{name}-{k}', daemon=True)
+                         for k in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+    
+    def _record(self, **values: float):
+        with self._lock:
+            for key, value in values.items():
+                self.stats[key] += value
+    
+    def _work(self):
+        while True:
+            wait_start = time.perf_counter()
+            task = self._queue.get()
+            busy_start = time.perf_counter()
+            self._record(idle_s=busy_start - wait_start)
+            if task is _DONE:
+                self._queue.task_done()
+                break
+            
+            fn, args = task
+            try:
+                fn(*args)
+            except BaseException as e:
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+            finally:
+                self._record(busy_s=time.perf_counter() - busy_start, items=1)
+                self._queue.task_done()
+    
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+    
+    def submit(self, fn: Callable, *args):
+        """提交一个任务 fn(*args)；队列满时阻塞到有工作线程取走任务"""
+        self._raise_error()
+        wait_start = time.perf_counter()
+        self._queue.put((fn, args))
+        self._record(submit_wait_s=time.perf_counter() - wait_start)
+    
+    def wait(self):
+        """等待已提交的任务全部完成"""
+        self._queue.join()
+        self._raise_error()
+    
+    def close(self):
+        """等待全部任务完成并结束工作线程"""
+        if self._threads:
+            for _ in self._threads:
+                self._queue.put(_DONE)
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+            self._elapsed = time.perf_counter() - self._started
+        self._raise_error()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def print_stats(self):
+        """打印吞吐量，以及编码（处理）与等待的耗时"""
+        stats = self.stats
+        elapsed = self._elapsed if self._elapsed is not None else time.perf_counter() - self._started
+        rate = stats['items'] / elapsed if elapsed > 0 else 0.0
+        print(f"  ⏱️  {self.name}: {int(stats['items'])} 项, {rate:.1f} 项/s, "
+              f"{self.workers} 线程合计处理 {stats['busy_s']:.1f}s / 空闲等待 {stats['idle_s']:.1f}s, "
+              f"提交方等待队列 {stats['submit_wait_s']:.1f}s")
+
+
+
+class MemoryBudgetBatcher:
+    """
+    按内存预算划分批次（代替固定的范围数 batch_size）
+    
+    - 每批按范围的帧数累加，使预计占用 帧数 × 每帧字节数 不超过单批预算
+      （单批预算 = (总预算 - 启动时RSS) / 同时在内存中的批次数）
+    - 每帧字节数由流水线各阶段实际测得的批次大小更新（observe）
+    - 进程RSS接近预算时自动缩小后续批次，回落后逐步恢复
+    
+    作为 StagedPipeline.run() 的 source 使用：迭代在读取线程之前按需进行，
+    因此后面的批次总是使用最新的测量结果。
+    """
+    
+    def __init__(self, frame_counts: List[int], budget_gb: float, batches_in_flight: int = 1,
+                 initial_bytes_per_frame: float = 1024 ** 2, high_water: float = 0.85,
+                 low_water: float = 0.6, probe_timeout: float = 60.0, fallback_batch_size: int = 100):
+        """
+        Args:
+            frame_counts: 每个范围的帧数（按处理顺序）
+            budget_gb: 进程内存预算（GB）
+            batches_in_flight: 流水线中同时存在的批次数
+            initial_bytes_per_frame: 尚无测量结果时使用的每帧字节数
+            high_water: RSS超过预算的该比例时缩小批次
+            low_water: RSS低于预算的该比例时逐步恢复批次大小
+            probe_timeout: 第一批（单个范围）测量结果的最长等待时间（秒）
+            fallback_batch_size: 还没有任何测量结果时（例如第一批没有帧）每批的范围数
+        """
+        self.frame_counts = [max(1, int(n)) for n in frame_counts]
+        self.budget_bytes = budget_gb * 1024 ** 3
+        self.batches_in_flight = max(1, int(batches_in_flight))
+        self.bytes_per_frame = float(initial_bytes_per_frame)
+        self.high_water = high_water
+        self.low_water = low_water
+        self.probe_timeout = probe_timeout
+        self.fallback_batch_size = max(1, int(fallback_batch_size))
+        self.scale = 1.0
+        self.batch_sizes: List[int] = []
+        
+        self._measured = threading.Event()
+        self._lock = threading.Lock()
+        self._observed_frames = 0
+        self._observed_bytes = 0
+        
+        try:
+            import psutil
+            self._process = psutil.Process()
+        except ImportError:
+            print("⚠️  未安装psutil，内存预算只按测得的每帧字节数划分批次（不监控RSS）")
+            self._process = None
+        self._baseline = self._rss() or 0
+    
+    def _rss(self) -> Optional[int]:
+        return self._process.memory_info().rss if self._process is not None else None
+    
+    def observe(self, frames: int, nbytes: int):
+        """记录一个批次的实际大小（可在任意线程中调用）"""
+        if frames <= 0:
+            # 没有帧的批次（范围为空或全部读取失败）无法测量，但第一批已经结束，不再等待
+            self._measured.set()
+            return
+        with self._lock:
+            self._observed_frames += frames
+            self._observed_bytes += nbytes
+            # 取累计平均与最近一批中的较大者：批次内容变大时立即生效
+            self.bytes_per_frame = max(self._observed_bytes / self._observed_frames, nbytes / frames)
+        self._measured.set()
+    
+    def batch_budget_bytes(self) -> float:
+        """当前单批预算（字节）"""
+        available = max(self.budget_bytes - self._baseline, self.budget_bytes * 0.1)
+        return available / self.batches_in_flight * self.scale
+    
+    def _update_scale(self):
+        rss = self._rss()
+        if rss is None:
+            return
+        if rss > self.budget_bytes * self.high_water:
+            if self.scale > 1 / 64:
+                self.scale = max(self.scale / 2, 1 / 64)
+                print(f"  ⚠️  RSS {rss / 1024 ** 3:.2f} GB 接近内存预算 {self.budget_bytes / 1024 ** 3:.2f} GB，"
+                      f"缩小批次（×{self.scale:.3g}）")
+            gc.collect()
+        elif rss < self.budget_bytes * self.low_water and self.scale < 1.0:
+            self.scale = min(1.0, self.scale * 1.25)
+    
+    def __iter__(self):
+        total = len(self.frame_counts)
+        start = 0
+        while start < total:
+            if self.batch_sizes:
+                # 第一批只有一个范围，用于测量每帧字节数
+                if len(self.batch_sizes) == 1:
+                    self._measured.wait(self.probe_timeout)
+                self._update_scale()
+                frame_budget = self.batch_budget_bytes() / self.bytes_per_frame
+            else:
+                frame_budget = 0
+            
+            if self.batch_sizes and self._observed_frames == 0:
+                # 还没有任何测量结果：退回固定的批次大小
+                end = min(start + self.fallback_batch_size, total)
+            else:
+                # 至少一个范围；超长范围单独成批
+                end = start + 1
+                frames = self.frame_counts[start]
+                while end < total and frames + self.frame_counts[end] <= frame_budget:
+                    frames += self.frame_counts[end]
+                    end += 1
+            
+            self.batch_sizes.append(end - start)
+            yield start, end
+            start = end
+
+
+if __name__ == '__main__':
+    print("Cut Pipeline Module")
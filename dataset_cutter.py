@@ -14,6 +14,80 @@ import io
 import shutil
 import os
 
+from parquet_episode_writer import (EpisodeParquetWriter, RollingParquetWriter, build_frame_table, encode_png,
+                                    DATA_PATH, DEFAULT_CHUNKS_SIZE, DEFAULT_DATA_FILE_SIZE_MB,
+                                    FRAME_SCHEMA, VIDEO_FRAME_SCHEMA)
+from video_writer import (RollingVideoWriter, encode_video, video_backend,
+                          VIDEO_PATH, VIDEO_PIX_FMT, DEFAULT_VIDEO_CODEC, DEFAULT_VIDEO_FILE_SIZE_MB)
+from tar_shard_writer import TarShardWriter, DEFAULT_SHARD_SIZE_MB
+
+
+# 裁剪时从源数据读取的列
+IMAGE_KEYS = ['observation.images.image', 'observation.images.image2']
+FRAME_COLUMNS = IMAGE_KEYS + ['observation.state', 'action', 'timestamp', 'frame_index', 'episode_index', 'task_index']
+LOW_DIM_KEYS = [key for key in FRAME_COLUMNS if key not in IMAGE_KEYS]
+
+# 图片模式写出线程池中每个线程对应的排队任务数（排队的图像引用批次数组，决定额外的内存占用）
+IMAGE_QUEUE_PER_WORKER = 16
+
+
+
+def _stack_rows(rows, count: int) -> np.ndarray:
+    """把逐行产生的数组写入预分配的 [count, ...] 连续数组（不先收集为列表再stack），多余的行位截掉"""
+    stacked = None
+    filled = 0
+    for row in rows:
+        if stacked is None:
+            stacked = np.empty((count,) + np.shape(row), dtype=np.asarray(row).dtype)
+        stacked[filled] = row
+        filled += 1
+    if stacked is None:
+        return np.empty((0,), dtype=np.uint8)
+    return stacked[:filled] if filled < count else stacked
+
+
+def _stack_records(records, count: int) -> Dict[str, np.ndarray]:
+    """把逐帧产生的 {列名: 值} 写入每列一个预分配的连续数组"""
+    stacked = {}
+    filled = 0
+    for record in records:
+        if not stacked:
+            stacked = {key: np.empty((count,) + np.shape(value), dtype=np.asarray(value).dtype)
+                       for key, value in record.items()}
+        for key, value in record.items():
+            stacked[key][filled] = value
+        filled += 1
+    return {key: values[:filled] for key, values in stacked.items()}
+
+
+class RangeFrames:
+    """
+    一个裁剪范围的帧序列：数据保存在整段连续数组中，按下标访问时才构造单帧字典
+    （字典中的值是数组的行视图，不复制）
+    """
+    
+    def __init__(self, arrays: Dict[str, Any], original_index: np.ndarray):
+        self.arrays = arrays
+        self.original_index = original_index
+    
+    def __len__(self) -> int:
+        return len(self.original_index)
+    
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[p] for p in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        frame = {key: values[position] for key, values in self.arrays.items()}
+        frame['original_index'] = int(self.original_index[position])
+        return frame
+    
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
 
 class DatasetCutter:
     """
@@ -25,13 +99,20 @@ class DatasetCutter:
     def __init__(self, output_dir: Optional[str] = None, save_mode: str = 'lerobot', batch_size: int = 100,
                  insert_placeholders: bool = False, placeholder_action_value: float = -999.0,
                  repo_id: Optional[str] = None, robot_type: str = "panda", fps: float = 10.0,
-                 use_official_api: bool = True):
+                 use_official_api: bool = True, direct_read: bool = True,
+                 image_passthrough: bool = False, read_workers: int = 1, convert_workers: int = 2,
+                 pipeline_queue_size: int = 1, memory_budget_gb: Optional[float] = None,
+                 data_files_size_in_mb: float = DEFAULT_DATA_FILE_SIZE_MB,
+                 video_codec: str = DEFAULT_VIDEO_CODEC, video_workers: int = 4,
+                 video_files_size_in_mb: float = DEFAULT_VIDEO_FILE_SIZE_MB, image_workers: int = 4,
+                 shard_size_in_mb: float = DEFAULT_SHARD_SIZE_MB):
         """
         初始化数据集裁剪器
         
         Args:
             output_dir: 输出目录
-            save_mode: 保存模式 'image' 或 'lerobot' 或 'both'
+            save_mode: 保存模式 'image' 或 'lerobot' 或 'both' 或 'lerobot-video'（相机画面编码为视频，传统方法写出）
+                       或 'image-tar'（图片模式写入tar分片）
             batch_size: 批处理大小（每次处理多少个episode）
             insert_placeholders: 是否在同一chunk的不同segments之间物理插入placeholder（方案3）
             placeholder_action_value: placeholder的action值（默认-999.0）
@@ -39,6 +120,20 @@ class DatasetCutter:
             robot_type: 机器人类型（默认"panda"）
             fps: 采样频率（默认10.0）
             use_official_api: 是否使用LeRobot官方API（推荐）
+            direct_read: 是否直接从源Parquet按范围读取（不可用时自动退回逐帧 dataset[i]）
+            image_passthrough: 直接读取时保留源图像的PNG/JPEG字节，传统方法和图片模式原样写出
+                               （不解码再编码；官方API仍需解码为像素）
+            read_workers: 流水线读取阶段的线程数
+            convert_workers: 流水线转换阶段（图像解码/编码）的线程数
+            pipeline_queue_size: 流水线阶段之间的队列容量（按批次计，决定额外的内存占用）
+            memory_budget_gb: 进程内存预算（GB）；设置后流式处理按实测每帧字节数和RSS自适应划分批次，
+                              batch_size 不再生效
+            data_files_size_in_mb: 传统方法每个数据文件（data/chunk-XXX/file-YYY.parquet）的大小上限（MB）
+            video_codec: 视频模式的编码器（默认 libsvtav1 即AV1；也可用 libx264 等）
+            video_workers: 视频模式中并行编码episode的线程数
+            video_files_size_in_mb: 视频模式每个视频文件（videos/<相机>/chunk-XXX/file-YYY.mp4）的大小上限（MB）
+            image_workers: 图片模式中编码并写出图像文件的线程数
+            shard_size_in_mb: image-tar 模式每个tar分片（shards/shard-XXXXXX.tar）的大小上限（MB）
         """
         self.output_dir = Path(output_dir) if output_dir else Path('./cut_dataset')
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -51,6 +146,35 @@ class DatasetCutter:
         self.fps = fps
         self.episodes_data = []
         self.metadata_buffer = []
+        self.direct_read = direct_read
+        self.image_passthrough = image_passthrough
+        self.read_workers = max(1, read_workers)
+        self.convert_workers = max(1, convert_workers)
+        self.pipeline_queue_size = max(1, pipeline_queue_size)
+        self.memory_budget_gb = memory_budget_gb
+        self.data_files_size_in_mb = data_files_size_in_mb
+        self.video_codec = video_codec
+        self.video_workers = max(1, video_workers)
+        self.video_files_size_in_mb = video_files_size_in_mb
+        self.video_backend = None
+        self.image_workers = max(1, image_workers)
+        self.shard_size_in_mb = shard_size_in_mb
+        self._batcher = None
+        
+        # 视频模式需要本地编码器（PyAV 或 ffmpeg），都没有时退回图像Parquet
+        if save_mode == 'lerobot-video':
+            self.video_backend = video_backend()
+            if self.video_backend is None:
+                print("⚠️  未找到 PyAV 或 ffmpeg，无法编码视频，改为保存图像Parquet（save_mode='lerobot'）")
+                self.save_mode = save_mode = 'lerobot'
+                self.use_official_api = use_official_api = False
+            else:
+                print(f"  🎬 视频模式: {self.video_backend} / {video_codec}，{self.video_workers} 个编码线程")
+                if use_official_api:
+                    print("  ⚠️  视频模式使用传统方法写出（不使用官方API）")
+        self._range_reader = None
+        self._range_reader_dataset = None
+        self._signal_store = None
         
         # 如果使用官方API，初始化LeRobotDataset
         self.lerobot_dataset = None
@@ -157,7 +281,9 @@ class DatasetCutter:
                             batch_end: Optional[int] = None,
                             verbose: bool = True) -> List[Dict]:
         """
-        从数据集中批量提取指定范围的帧（避免一次性加载所有数据）
+        从数据集中批量提取指定范围的帧（逐帧字典，兼容旧接口）
+        
+        数据由 extract_ranges_batch 整段读取，每帧字典中的数组是范围连续数组的行视图。
         
         Args:
             dataset: LeRobot数据集
@@ -170,59 +296,260 @@ class DatasetCutter:
             提取的数据列表
         """
         extracted_data = []
+        episodes_data = self.extract_ranges_batch(dataset, frame_ranges, batch_start, batch_end, verbose)
+        
+        for cut_range_id, episode_data in sorted(episodes_data.items()):
+            metadata = episode_data['metadata']
+            for new_item in episode_data['frames']:
+                # 添加元数据
+                new_item['cut_range_id'] = cut_range_id
+                new_item['original_task'] = metadata['original_task']
+                new_item['new_task'] = metadata['new_task']
+                new_item['action_type'] = metadata['action_type']
+                new_item['keyframe_index'] = metadata['keyframe_index']
+                
+                extracted_data.append(new_item)
+        
+        return extracted_data
+    
+    def extract_ranges_batch(self,
+                             dataset,
+                             frame_ranges: List[Dict],
+                             batch_start: int = 0,
+                             batch_end: Optional[int] = None,
+                             verbose: bool = True) -> Dict[int, Dict]:
+        """
+        批量提取帧范围，每个范围为一个episode级结构，数据为整段连续数组（不逐帧复制）：
+            observation.images.*: [T, H, W, 3] uint8（image_passthrough 时为 EncodedImage 列表）
+            observation.state: [T, 8]，action: [T, 7]
+            timestamp / frame_index / episode_index / task_index: [T]
+        同一episode内重叠的范围是同一块并集数组的切片视图，共享内存。
+        
+        Args:
+            dataset: LeRobot数据集
+            frame_ranges: 帧范围列表
+            batch_start: 批次起始索引
+            batch_end: 批次结束索引（None表示到末尾）
+            verbose: 是否打印详细信息
+            
+        Returns:
+            {cut_range_id: {'arrays': {列名: 数组}, 'original_index': [T], 'frames': RangeFrames, 'metadata': {...}}}
+            （与 organize_by_episode 的结果结构相同；没有读取到任何帧的范围被跳过）
+        """
         batch_end = batch_end or len(frame_ranges)
         
         if verbose:
             print(f"📥 提取帧数据批次 [{batch_start}:{batch_end}]...")
         
+        reader = self._get_range_reader(dataset) if self.direct_read else None
+        
+        # 同一episode内重叠/相接范围的并集：每个源帧只读取一次，每个并集区间为一块连续数组
+        blocks_by_episode = {}
+        for block in self._read_union_blocks(dataset, reader, frame_ranges[batch_start:batch_end], verbose):
+            blocks_by_episode.setdefault(block['episode_index'], []).append(block)
+        
+        # 同一episode的并集块互不重叠：按起点排序，范围所在的块用二分查找定位
+        block_starts = {}
+        for episode_index, blocks in blocks_by_episode.items():
+            blocks.sort(key=lambda b: b['start'])
+            block_starts[episode_index] = np.array([b['start'] for b in blocks], dtype=np.int64)
+        
+        episodes = {}
+        total_frames = 0
         for range_idx in range(batch_start, batch_end):
-            if verbose and (range_idx - batch_start) % 10 == 0:
-                print(f"  处理范围 {range_idx}/{batch_end}")
-            
             frame_range = frame_ranges[range_idx]
-            start_idx = frame_range['frame_start']
-            end_idx = frame_range['frame_end']
+            start_idx = int(frame_range['frame_start'])
+            end_idx = int(frame_range['frame_end'])
+            
+            episode_index = int(frame_range.get('episode_index', -1))
+            if episode_index not in blocks_by_episode:
+                continue
+            position = int(np.searchsorted(block_starts[episode_index], start_idx, side='right')) - 1
+            if position < 0 or end_idx > blocks_by_episode[episode_index][position]['end']:
+                continue
+            block = blocks_by_episode[episode_index][position]
+            
+            # 逐帧读取失败的帧不在块中；原始索引有序，范围内的可用帧仍是连续的一段行
+            lo, hi = np.searchsorted(block['original_index'], [start_idx, end_idx]).tolist()
+            if hi <= lo:
+                continue
+            
+            arrays = {key: values[lo:hi] for key, values in block['arrays'].items()}
+            original_index = block['original_index'][lo:hi]
+            episodes[range_idx] = {
+                'arrays': arrays,
+                'original_index': original_index,
+                'frames': RangeFrames(arrays, original_index),
+                'metadata': {
+                    'cut_range_id': range_idx,
+                    'action_type': frame_range['action_type'],
+                    'original_task': frame_range.get('original_task', frame_range.get('task', '')),
+                    'new_task': frame_range.get('new_task', frame_range.get('original_task', frame_range.get('task', ''))),
+                    'episode_index': arrays['episode_index'][0] if 'episode_index' in arrays else frame_range.get('episode_index', -1),
+                    'task_index': arrays['task_index'][0] if 'task_index' in arrays else -1,
+                    'keyframe_index': frame_range['keyframe_index']
+                }
+            }
+            total_frames += hi - lo
+        
+        if verbose:
+            print(f"✓ 批次提取完成，共 {total_frames} 帧")
+        
+        return episodes
+    
+    def _read_union_blocks(self, dataset, reader, batch_ranges: List[Dict],
+                           verbose: bool = True) -> List[Dict]:
+        """
+        读取一批范围的并集（每个源帧只读取一次），每个并集区间读为一块连续数组
+        
+        Args:
+            dataset: LeRobot数据集
+            reader: 源Parquet范围读取器（None表示逐帧读取）
+            batch_ranges: 当前批次的帧范围
+            verbose: 是否打印详细信息
+            
+        Returns:
+            [{'start', 'end', 'episode_index', 'original_index', 'arrays'}, ...]
+        """
+        from frame_intervals import FrameIntervalIndex
+        
+        union_starts, union_ends, union_episodes = FrameIntervalIndex(batch_ranges).union_intervals()
+        intervals = [(s, e, ep) for s, e, ep in zip(union_starts.tolist(), union_ends.tolist(),
+                                                    union_episodes.tolist()) if e > s]
+        
+        # 按源文件和row group顺序读取（顺序访问），共享row group的区间合并为一次读取；
+        # 调用方仍按 cut_range_id 顺序组装
+        if reader is not None:
+            try:
+                plan = reader.plan_reads([(s, e) for s, e, _ in intervals])
+            except Exception as e:
+                print(f"⚠️  规划读取顺序失败，改为逐帧读取: {e}")
+                reader = None
+        if reader is None:
+            plan = [(s, e, [k]) for k, (s, e, _) in enumerate(intervals)]
+        store = self._signal_store if reader is not None else None
+        
+        blocks = [None] * len(intervals)
+        for read_idx, (read_start, read_end, members) in enumerate(plan):
+            if verbose and read_idx % 10 == 0:
+                print(f"  读取 {read_idx}/{len(plan)}: [{read_start}, {read_end})")
+            
+            # 优先整段读取源Parquet（有信号存储时只读图像列），失败时退回逐帧读取
+            table = None
+            if reader is not None:
+                try:
+                    table = reader.read_range(read_start, read_end, columns=IMAGE_KEYS if store else FRAME_COLUMNS)
+                except Exception as e:
+                    print(f"⚠️  直接读取范围 [{read_start}, {read_end}) 失败，改为逐帧读取: {e}")
+            
+            for k in members:
+                start_idx, end_idx, episode = intervals[k]
+                arrays = None
+                if table is not None:
+                    try:
+                        arrays = self._table_to_arrays(table.slice(start_idx - read_start, end_idx - start_idx),
+                                                       self.image_passthrough)
+                        if store is not None:
+                            # 复制出内存映射：批次数组可写，内存统计只计入切片本身
+                            arrays.update({key: np.array(store.slice(key, start_idx, end_idx))
+                                           for key in LOW_DIM_KEYS})
+                        original_index = np.arange(start_idx, end_idx, dtype=np.int64)
+                    except Exception as e:
+                        print(f"⚠️  转换范围 [{start_idx}, {end_idx}) 失败，改为逐帧读取: {e}")
+                if arrays is None:
+                    original_index, arrays = self._fetch_range_arrays(dataset, start_idx, end_idx, verbose)
+                blocks[k] = {'start': start_idx, 'end': end_idx, 'episode_index': episode,
+                             'original_index': original_index, 'arrays': arrays}
+        
+        if verbose:
+            requested = sum(int(r['frame_end']) - int(r['frame_start']) for r in batch_ranges)
+            print(f"  ✓ {len(batch_ranges)} 个范围共 {requested} 帧，合并为 {len(intervals)} 个区间"
+                  f"（{len(plan)} 次读取），实际读取 {sum(len(b['original_index']) for b in blocks)} 帧")
+        return blocks
+    
+    def _get_range_reader(self, dataset):
+        """获取（并缓存）数据集的源Parquet范围读取器；不可用时返回None"""
+        if self._range_reader_dataset is not dataset:
+            from parquet_range_reader import ParquetRangeReader
             
+            reader = ParquetRangeReader.for_dataset(dataset)
+            if reader is not None and not set(FRAME_COLUMNS) <= set(reader.column_names):
+                # 例如图像以视频存储，Parquet中没有图像列
+                reader = None
+            if reader is not None:
+                print(f"  ⚡ 直接从源Parquet按范围读取 ({len(reader.spans)} 个数据文件)")
+            
+            # 已物化的信号存储（与检测共用）：低维列从内存映射切片，源Parquet只读取图像列
+            store = None
+            if reader is not None:
+                from signal_store import SignalStore
+                store = SignalStore.open_for_dataset(dataset.root)
+                if store is not None and not (store.covers(LOW_DIM_KEYS) and len(store) == len(dataset)):
+                    store = None
+                if store is not None:
+                    print(f"  ⚡ 低维列从信号存储切片读取: {store.store_dir}")
+            
+            self._range_reader = reader
+            self._range_reader_dataset = dataset
+            self._signal_store = store
+        return self._range_reader
+    
+    @staticmethod
+    def _table_to_arrays(table, image_passthrough: bool = False) -> Dict[str, Any]:
+        """
+        将源Parquet的一段行转换为连续数组（图像解码为 [T, H, W, 3] uint8；
+        image_passthrough 时为未解码的 EncodedImage 列表）
+        """
+        from gripper_detector import _table_to_columns
+        from parquet_range_reader import decode_image, EncodedImage
+        
+        arrays = _table_to_columns(table, LOW_DIM_KEYS)
+        for key in IMAGE_KEYS:
+            images = table.column(key).combine_chunks().field('bytes')
+            if image_passthrough:
+                arrays[key] = [EncodedImage(images[row].as_py()) for row in range(len(images))]
+            else:
+                arrays[key] = _stack_rows((decode_image(images[row].as_py()) for row in range(len(images))),
+                                          len(images))
+        return arrays
+    
+    @classmethod
+    def _fetch_range_arrays(cls, dataset, start_idx: int, end_idx: int,
+                            verbose: bool = True) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        通过 dataset[i] 逐帧读取 [start_idx, end_idx)，直接写入连续数组（跳过读取失败的帧）
+        
+        Returns:
+            (成功读取的原始帧索引, {列名: 数组})
+        """
+        indices = []
+        
+        def frames():
             for frame_idx in range(start_idx, end_idx):
                 try:
                     item = dataset[frame_idx]
                     
-                    # 只提取需要的字段，不使用 deepcopy（内存优化）
-                    new_item = {
-                        'observation.images.image': item['observation.images.image'].clone().detach() if hasattr(item['observation.images.image'], 'clone') else item['observation.images.image'],
-                        'observation.images.image2': item['observation.images.image2'].clone().detach() if hasattr(item['observation.images.image2'], 'clone') else item['observation.images.image2'],
-                        'observation.state': item['observation.state'].clone().detach() if hasattr(item['observation.state'], 'clone') else item['observation.state'],
-                        'action': item['action'].clone().detach() if hasattr(item['action'], 'clone') else item['action'],
-                        'timestamp': item.get('timestamp', torch.tensor(0.0)),
-                        'frame_index': item.get('frame_index', torch.tensor(0)),
-                        'episode_index': item.get('episode_index', torch.tensor(0)),
-                        'task_index': item.get('task_index', torch.tensor(0)),
-                    }
-                    
-                    # 添加元数据
-                    new_item['original_index'] = frame_idx
-                    new_item['cut_range_id'] = range_idx
-                    new_item['original_task'] = frame_range.get('original_task', frame_range.get('task', ''))
-                    new_item['new_task'] = frame_range.get('new_task', frame_range.get('original_task', frame_range.get('task', '')))
-                    new_item['action_type'] = frame_range['action_type']
-                    new_item['keyframe_index'] = frame_range['keyframe_index']
-                    
-                    extracted_data.append(new_item)
-                
+                    # 只提取需要的字段，直接写入数组（不逐帧clone）
+                    values = {key: cls._tensor_to_numpy_image(item[key]) for key in IMAGE_KEYS}
+                    values['observation.state'] = cls._tensor_to_numpy(item['observation.state'])
+                    values['action'] = cls._tensor_to_numpy(item['action'])
+                    values['timestamp'] = cls._tensor_to_numpy(item.get('timestamp', 0.0))
+                    for key in ['frame_index', 'episode_index', 'task_index']:
+                        values[key] = cls._tensor_to_numpy(item.get(key, 0))
                 except Exception as e:
                     if verbose:
                         print(f"⚠️  提取索引 {frame_idx} 时出错: {e}")
                     continue
+                indices.append(frame_idx)
+                yield values
         
-        if verbose:
-            print(f"✓ 批次提取完成，共 {len(extracted_data)} 帧")
-        
-        return extracted_data
+        arrays = _stack_records(frames(), end_idx - start_idx)
+        return np.array(indices, dtype=np.int64), arrays
     
     def organize_by_episode(self, 
                            extracted_data: List[Dict]) -> Dict[int, Dict]:
         """
-        按episode组织提取的数据
+        按episode组织提取的数据（逐帧字典形式；extract_ranges_batch 直接返回同样的结构）
         
         Args:
             extracted_data: 提取的数据列表
@@ -259,6 +586,9 @@ class DatasetCutter:
         """
         将数据保存为图片格式（类似data_dealer）
         
+        图像由 image_workers 个线程编码写出：主线程只提交任务（有界队列，满时等待），
+        episode级的metadata.json也在后台写出。
+        
         Args:
             episodes_data: 按episode组织的数据
             frame_ranges: 帧范围列表
@@ -267,77 +597,215 @@ class DatasetCutter:
         Returns:
             保存的文件路径
         """
+        from cut_pipeline import AsyncWriterPool
+        
         print(f"💾 保存数据为图片格式...")
         
-        # 创建输出目录
-        images_dir = self.output_dir / 'images'
-        images_dir.mkdir(parents=True, exist_ok=True)
+        episodes_info = []
+        with AsyncWriterPool(self.image_workers, self.image_workers * IMAGE_QUEUE_PER_WORKER, name='图像写出') as writer:
+            self._write_image_episodes(episodes_data, writer, episodes_info, max_episodes)
+        writer.print_stats()
+        
+        return self._save_images_summary(episodes_info)
+    
+    def save_as_image_format_streaming(self,
+                                       dataset,
+                                       frame_ranges: List[Dict],
+                                       max_episodes: Optional[int] = None) -> Path:
+        """
+        流式保存为图片格式：读取线程提取下一批的同时，上一批的图像在写出线程池中编码
+        
+        Args:
+            dataset: 原始LeRobot数据集
+            frame_ranges: 帧范围列表
+            max_episodes: 最多保存的episode数量
+            
+        Returns:
+            保存的文件路径
+        """
+        from cut_pipeline import AsyncWriterPool
+        
+        print(f"💾 流式保存数据为图片格式...")
+        self._print_batching()
+        
+        # 限制episode数量
+        total_ranges = min(len(frame_ranges), max_episodes) if max_episodes else len(frame_ranges)
+        
+        # 图像保持读取时的格式（像素数组或直通的源字节），在写出线程池中编码
+        pipeline, batches = self._build_batch_pipeline(dataset, frame_ranges, total_ranges, image_target=None)
         
         episodes_info = []
+        with AsyncWriterPool(self.image_workers, self.image_workers * IMAGE_QUEUE_PER_WORKER, name='图像写出') as writer:
+            def write_batch(batch):
+                (batch_start, batch_end), episodes_data = batch
+                print(f"\n  处理批次 [{batch_start}:{batch_end}]/{total_ranges}")
+                self._write_image_episodes(episodes_data, writer, episodes_info)
+            
+            self._run_batch_pipeline(pipeline, batches, write_batch)
+        writer.print_stats()
+        
+        return self._save_images_summary(episodes_info)
+    
+    def _write_image_episodes(self, episodes_data: Dict[int, Dict], writer, episodes_info: List[Dict],
+                              max_episodes: Optional[int] = None):
+        """
+        把一批episode的图像和metadata.json提交给写出线程池，episode信息追加到 episodes_info
+        （episode编号接着 episodes_info 已有的数量，多个批次写入同一个 images/ 目录）
+        """
+        images_dir = self.output_dir / 'images'
         
         for cut_range_id, episode_data in sorted(episodes_data.items()):
             if max_episodes and len(episodes_info) >= max_episodes:
                 break
             
-            frames = episode_data['frames']
-            metadata = episode_data['metadata']
-            
             episode_idx = len(episodes_info)
             episode_dir = images_dir / f"episode_{episode_idx:04d}"
             episode_dir.mkdir(parents=True, exist_ok=True)
             
-            # 保存每一帧的图像
-            frame_files = []
-            for frame_idx, frame_data in enumerate(frames):
-                # 保存主摄像头图像
-                img1 = self._tensor_to_image(frame_data['observation.images.image'])
-                img1_path = episode_dir / f"frame_cam1_{frame_idx:04d}.jpg"
-                img1.save(img1_path, quality=95)
-                
-                # 保存第二摄像头图像
-                img2 = self._tensor_to_image(frame_data['observation.images.image2'])
-                img2_path = episode_dir / f"frame_cam2_{frame_idx:04d}.jpg"
-                img2.save(img2_path, quality=95)
-                
-                frame_files.append({
-                    'frame_idx': frame_idx,
-                    'cam1': str(img1_path.relative_to(self.output_dir)),
-                    'cam2': str(img2_path.relative_to(self.output_dir)),
-                    'action': frame_data['action'].cpu().numpy().tolist() if hasattr(frame_data['action'], 'cpu') else frame_data['action'].tolist(),
-                    'state': frame_data['observation.state'].cpu().numpy().tolist() if hasattr(frame_data['observation.state'], 'cpu') else frame_data['observation.state'].tolist(),
-                })
-            
-            episode_info = {
-                'episode_idx': episode_idx,
-                'cut_range_id': cut_range_id,
-                'action_type': metadata['action_type'],
-                'original_task': metadata['original_task'],
-                'new_task': metadata['new_task'],
-                'keyframe_index': metadata['keyframe_index'],
-                'num_frames': len(frames),
-                'frames': frame_files
-            }
+            def save_image(image_data, frame_idx, camera):
+                image_path = self._save_frame_image(image_data, episode_dir / f"frame_{camera}_{frame_idx:04d}", writer)
+                return str(image_path.relative_to(self.output_dir))
             
+            episode_info = self._image_episode_info(cut_range_id, episode_data, episode_idx, save_image)
             episodes_info.append(episode_info)
             
             # 保存episode级别的元数据
-            episode_meta_path = episode_dir / 'metadata.json'
-            with open(episode_meta_path, 'w', encoding='utf-8') as f:
-                json.dump(episode_info, f, indent=2, ensure_ascii=False)
+            writer.submit(self._write_json, episode_dir / 'metadata.json', episode_info)
+    
+    @staticmethod
+    def _image_episode_info(cut_range_id: int, episode_data: Dict, episode_idx: int, save_image) -> Dict:
+        """
+        图片模式的episode信息（每帧的图像路径、action、state）
+        
+        Args:
+            save_image: save_image(图像, 帧序号, 'cam1'/'cam2') 保存一帧图像，返回记录在元数据中的路径
+        """
+        frames = episode_data['frames']
+        metadata = episode_data['metadata']
+        
+        # 保存每一帧的图像
+        frame_files = []
+        for frame_idx, frame_data in enumerate(frames):
+            frame_files.append({
+                'frame_idx': frame_idx,
+                # 主摄像头 / 第二摄像头
+                'cam1': save_image(frame_data['observation.images.image'], frame_idx, 'cam1'),
+                'cam2': save_image(frame_data['observation.images.image2'], frame_idx, 'cam2'),
+                'action': frame_data['action'].cpu().numpy().tolist() if hasattr(frame_data['action'], 'cpu') else frame_data['action'].tolist(),
+                'state': frame_data['observation.state'].cpu().numpy().tolist() if hasattr(frame_data['observation.state'], 'cpu') else frame_data['observation.state'].tolist(),
+            })
+        
+        return {
+            'episode_idx': episode_idx,
+            'cut_range_id': cut_range_id,
+            'action_type': metadata['action_type'],
+            'original_task': metadata['original_task'],
+            'new_task': metadata['new_task'],
+            'keyframe_index': metadata['keyframe_index'],
+            'num_frames': len(frames),
+            'frames': frame_files
+        }
+    
+    def save_as_image_shards_streaming(self,
+                                       dataset,
+                                       frame_ranges: List[Dict],
+                                       max_episodes: Optional[int] = None) -> Path:
+        """
+        流式保存为tar分片的图片格式（WebDataset风格，见 tar_shard_writer）
+        
+        图像在 image_workers 个线程中编码；每帧的两路相机图像和该帧的json按顺序由一个写出线程
+        追加到按大小滚动的 shards/shard-XXXXXX.tar，episode级元数据写入 shards/index.json。
+        
+        Args:
+            dataset: 原始LeRobot数据集
+            frame_ranges: 帧范围列表
+            max_episodes: 最多保存的episode数量
+            
+        Returns:
+            保存的文件路径
+        """
+        from concurrent.futures import Future, ThreadPoolExecutor
+        from cut_pipeline import AsyncWriterPool
+        
+        print(f"💾 流式保存数据为tar分片图片格式（每个分片最大 {self.shard_size_in_mb} MB）...")
+        self._print_batching()
+        
+        total_ranges = min(len(frame_ranges), max_episodes) if max_episodes else len(frame_ranges)
+        pipeline, batches = self._build_batch_pipeline(dataset, frame_ranges, total_ranges, image_target=None)
         
-        # 保存总体元数据
+        shards = TarShardWriter(self.output_dir, self.shard_size_in_mb)
+        episodes_info = []
+        
+        def append_episode(key, members, episode_info):
+            # 按提交顺序执行（单个写出线程），等待该episode的图像编码完成
+            shards.write_episode(key, [(name, data.result() if isinstance(data, Future) else data)
+                                       for name, data in members], episode_info)
+        
+        with ThreadPoolExecutor(self.image_workers, thread_name_prefix='image-encode') as encoder, \
+                AsyncWriterPool(1, queue_size=2, name='分片写出') as writer:
+            def write_batch(batch):
+                (batch_start, batch_end), episodes_data = batch
+                print(f"\n  处理批次 [{batch_start}:{batch_end}]/{total_ranges}")
+                
+                for cut_range_id, episode_data in sorted(episodes_data.items()):
+                    episode_idx = len(episodes_info)
+                    key = f"episode_{episode_idx:04d}"
+                    members = []
+                    
+                    def save_image(image_data, frame_idx, camera):
+                        name = f"frame_{frame_idx:04d}.{camera}{self._frame_image_extension(image_data)}"
+                        members.append((name, encoder.submit(self._encode_frame_image, image_data)))
+                        return f"{key}/{name}"
+                    
+                    episode_info = self._image_episode_info(cut_range_id, episode_data, episode_idx, save_image)
+                    episodes_info.append(episode_info)
+                    
+                    # 每帧一个WebDataset样本：两路相机图像后紧跟该帧的json，同一样本的成员连续排列
+                    # （json带上裁剪来源，样本脱离索引文件也能追溯）
+                    cut_info = {
+                        'episode_idx': episode_idx,
+                        'task': episode_info['new_task'],
+                        'action_type': episode_info['action_type'],
+                        'original_task': episode_info['original_task'],
+                        'cut_range_id': cut_range_id,
+                        'keyframe_index': int(episode_info['keyframe_index']),
+                        'original_episode_index': int(episode_data['metadata']['episode_index']),
+                    }
+                    images = iter(members)
+                    samples = []
+                    for frame in episode_info['frames']:
+                        record = dict(frame, **cut_info)
+                        samples += [next(images), next(images),
+                                    (f"frame_{frame['frame_idx']:04d}.json",
+                                     json.dumps(record, ensure_ascii=False).encode('utf-8'))]
+                    writer.submit(append_episode, key, samples, episode_info)
+            
+            self._run_batch_pipeline(pipeline, batches, write_batch)
+        writer.print_stats()
+        
+        index_path = shards.close()
+        print(f"  ✓ {len(shards.shards)} 个分片, 索引: {index_path}")
+        
+        return self._save_images_summary(episodes_info)
+    
+    def _save_images_summary(self, episodes_info: List[Dict]) -> Path:
+        """保存图片格式的总体元数据"""
         summary_path = self.output_dir / 'episodes_summary.json'
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                'total_episodes': len(episodes_info),
-                'episodes': episodes_info
-            }, f, indent=2, ensure_ascii=False)
+        self._write_json(summary_path, {
+            'total_episodes': len(episodes_info),
+            'episodes': episodes_info
+        })
         
         print(f"  ✓ 保存了 {len(episodes_info)} 个episode的图片")
         print(f"  ✓ 元数据: {summary_path}")
         
         return self.output_dir
     
+    @staticmethod
+    def _write_json(path: Path, data):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    
     def _create_placeholder_frame(self, previous_frame: Dict, episode_index: int, 
                                   global_frame_idx: int, task_index: int) -> Dict:
         """
@@ -352,17 +820,23 @@ class DatasetCutter:
         Returns:
             placeholder帧数据
         """
-        # 复制observation（图像和状态）
+        # 复制observation（图像和状态；数组行视图需要复制，EncodedImage直接共享）
+        def copy_value(value):
+            return value.clone() if hasattr(value, 'clone') else np.array(value)
+        
         placeholder = {
-            'observation.images.image': previous_frame['observation.images.image'].clone(),
-            'observation.images.image2': previous_frame['observation.images.image2'].clone(),
-            'observation.state': previous_frame['observation.state'].clone(),
+            'observation.images.image': copy_value(previous_frame['observation.images.image']),
+            'observation.images.image2': copy_value(previous_frame['observation.images.image2']),
+            'observation.state': copy_value(previous_frame['observation.state']),
         }
         
         # 设置特殊的action值（全为placeholder_action_value）
-        action_shape = previous_frame['action'].shape
-        placeholder['action'] = torch.full(action_shape, self.placeholder_action_value, 
-                                          dtype=previous_frame['action'].dtype)
+        action = previous_frame['action']
+        if hasattr(action, 'clone'):
+            placeholder['action'] = torch.full(action.shape, self.placeholder_action_value, dtype=action.dtype)
+        else:
+            placeholder['action'] = np.full(np.shape(action), self.placeholder_action_value,
+                                            dtype=np.asarray(action).dtype)
         
         # 设置元数据
         placeholder['timestamp'] = previous_frame.get('timestamp', torch.tensor(0.0))
@@ -373,43 +847,79 @@ class DatasetCutter:
         
         return placeholder
     
-    @staticmethod
-    def _tensor_to_image(tensor_data):
-        """将Tensor转换为PIL Image"""
-        if hasattr(tensor_data, 'cpu'):
-            tensor_data = tensor_data.cpu()
-        if hasattr(tensor_data, 'numpy'):
-            tensor_data = tensor_data.numpy()
+    def _save_frame_image(self, image_data, path_stem: Path, writer=None) -> Path:
+        """
+        保存一帧图像：源PNG/JPEG字节原样写出（扩展名与编码一致），其余编码为JPEG
         
-        # CHW -> HWC
-        if tensor_data.ndim == 3 and tensor_data.shape[0] == 3:
-            tensor_data = tensor_data.transpose(1, 2, 0)
+        Args:
+            image_data: 图像（EncodedImage / Tensor / 数组）
+            path_stem: 不含扩展名的文件路径
+            writer: AsyncWriterPool；给定时编码和写文件作为任务提交，立即返回
         
-        # 0-1 float -> 0-255 uint8
-        if tensor_data.dtype != np.uint8:
-            if tensor_data.max() <= 1.0:
-                tensor_data = (tensor_data * 255).astype(np.uint8)
-            else:
-                tensor_data = tensor_data.astype(np.uint8)
+        Returns:
+            图像文件路径
+        """
+        image_path = path_stem.with_suffix(self._frame_image_extension(image_data))
+        if writer is None:
+            self._write_frame_image(image_data, image_path)
+        else:
+            writer.submit(self._write_frame_image, image_data, image_path)
+        return image_path
+    
+    @staticmethod
+    def _frame_image_extension(image_data) -> str:
+        from parquet_range_reader import EncodedImage
         
-        return Image.fromarray(tensor_data)
+        return image_data.extension if isinstance(image_data, EncodedImage) else '.jpg'
+    
+    @classmethod
+    def _encode_frame_image(cls, image_data) -> bytes:
+        """图片模式的图像文件内容：源字节原样返回，其余编码为JPEG"""
+        from parquet_range_reader import EncodedImage
+        
+        if isinstance(image_data, EncodedImage):
+            return image_data.data
+        buffer = io.BytesIO()
+        cls._tensor_to_image(image_data).save(buffer, format='JPEG', quality=95)
+        return buffer.getvalue()
+    
+    @classmethod
+    def _write_frame_image(cls, image_data, image_path: Path):
+        image_path.write_bytes(cls._encode_frame_image(image_data))
+    
+    @classmethod
+    def _tensor_to_image(cls, tensor_data):
+        """将Tensor转换为PIL Image"""
+        return Image.fromarray(cls._tensor_to_numpy_image(tensor_data))
     
     @staticmethod
     def _tensor_to_numpy_image(tensor_data):
-        """将Tensor转换为numpy图像（用于LeRobot API）"""
+        """
+        将图像转换为 uint8 HWC numpy数组（用于LeRobot API）
+        
+        直接读取的图像本来就是 uint8 HWC，原样返回；dataset[i] 返回的 float32 CHW [0,1]
+        在读取时逐帧转换，批次中不保留float图像（内存为uint8的4倍）。
+        """
+        from parquet_range_reader import EncodedImage
+        
+        if isinstance(tensor_data, EncodedImage):
+            return tensor_data.decode()
         if hasattr(tensor_data, 'cpu'):
             tensor_data = tensor_data.cpu()
         if hasattr(tensor_data, 'numpy'):
             tensor_data = tensor_data.numpy()
+        if isinstance(tensor_data, np.ndarray) and tensor_data.dtype == np.uint8 and tensor_data.ndim == 3 \
+                and tensor_data.shape[-1] == 3:
+            return tensor_data
         
         # CHW -> HWC
         if tensor_data.ndim == 3 and tensor_data.shape[0] == 3:
             tensor_data = tensor_data.transpose(1, 2, 0)
         
-        # 0-1 float -> 0-255 uint8
+        # 0-1 float -> 0-255 uint8（四舍五入，避免 k/255*255 的浮点误差被截断为 k-1）
         if tensor_data.dtype != np.uint8:
             if tensor_data.max() <= 1.0:
-                tensor_data = (tensor_data * 255).astype(np.uint8)
+                tensor_data = np.rint(tensor_data * 255).clip(0, 255).astype(np.uint8)
             else:
                 tensor_data = tensor_data.astype(np.uint8)
         
@@ -424,6 +934,182 @@ class DatasetCutter:
             return tensor_data.numpy()
         return np.array(tensor_data)
     
+    def _build_batch_pipeline(self, dataset, frame_ranges: List[Dict], total_ranges: int,
+                              image_target: Optional[str], encode=None):
+        """
+        构建批处理流水线：读取阶段（提取+按episode组织）→ 转换阶段（图像转为写入格式）
+        [→ 编码阶段（encode，例如视频编码）]
+        
+        image_target 为 None 时没有转换阶段，图像保持读取时的格式（图片模式在写出线程池中编码）。
+        
+        写入阶段由调用方作为 sink 传给 pipeline.run()，在主线程中按批次顺序执行。
+        
+        Returns:
+            (pipeline, batches) - batches 为 [(batch_start, batch_end), ...]，
+            设置了内存预算时为按需产生批次的 MemoryBudgetBatcher
+        """
+        from cut_pipeline import StagedPipeline, MemoryBudgetBatcher
+        
+        convert_workers = self.convert_workers if image_target is not None else 0
+        in_flight = self.read_workers + convert_workers + 2 * self.pipeline_queue_size + 1
+        if encode is not None:
+            # 编码阶段的线程及其输出队列；插入placeholder时编码中的批次还有一份拼接后的帧副本
+            in_flight += 1 + self.pipeline_queue_size + (1 if self.insert_placeholders else 0)
+        
+        if self.memory_budget_gb:
+            # 按内存预算划分：读取/转换阶段测得的批次大小反馈给划分器
+            frame_counts = [int(r['frame_end']) - int(r['frame_start']) for r in frame_ranges[:total_ranges]]
+            batches = self._batcher = MemoryBudgetBatcher(frame_counts, self.memory_budget_gb, in_flight,
+                                                          fallback_batch_size=self.batch_size)
+        else:
+            batches = [(batch_start, min(batch_start + self.batch_size, total_ranges))
+                       for batch_start in range(0, total_ranges, self.batch_size)]
+            self._batcher = None
+        
+        def observe(episodes_data, nbytes):
+            if self._batcher is not None:
+                self._batcher.observe(sum(len(e['frames']) for e in episodes_data.values()), nbytes)
+        
+        # 在启动读取线程之前创建范围读取器，避免多个线程重复创建
+        if self.direct_read:
+            self._get_range_reader(dataset)
+        
+        def read(spec):
+            episodes_data = self.extract_ranges_batch(dataset, frame_ranges, spec[0], spec[1], verbose=False)
+            observe(episodes_data, self._episodes_nbytes(episodes_data))
+            return spec, episodes_data
+        
+        def convert(batch):
+            seen = {}
+            before = self._episodes_nbytes(batch[1], seen)
+            self._convert_episode_images(batch[1], image_target)
+            # 转换过程中原图像与转换新分配的结果同时存在（原样保留的数组不重复计入）
+            observe(batch[1], before + self._episodes_nbytes(batch[1], seen))
+            return batch
+        
+        stages = [('read', read, self.read_workers)]
+        if image_target is not None:
+            stages.append(('convert', convert, self.convert_workers))
+        if encode is not None:
+            stages.append(('encode', encode, 1))
+        pipeline = StagedPipeline(stages, queue_size=self.pipeline_queue_size)
+        
+        print(f"  流水线: 读取 {self.read_workers} 线程 / 转换 {convert_workers} 线程，"
+              f"最多约 {in_flight} 个批次同时在内存中")
+        return pipeline, batches
+    
+    def _print_batching(self):
+        if self.memory_budget_gb:
+            print(f"  内存预算: {self.memory_budget_gb} GB（按实测每帧字节数自适应划分批次）")
+        else:
+            print(f"  批处理大小: {self.batch_size} episodes/批")
+    
+    def _run_batch_pipeline(self, pipeline, batches, write_batch):
+        """运行批处理流水线并打印各阶段、缓存和批次划分的统计"""
+        pipeline.run(batches, write_batch, total=len(batches) if isinstance(batches, list) else None)
+        pipeline.print_stats()
+        if self._range_reader is not None:
+            self._range_reader.cache.print_stats()
+        if self._batcher is not None and self._batcher.batch_sizes:
+            sizes = self._batcher.batch_sizes
+            print(f"  📏 自适应批次: {len(sizes)} 批，每批 {min(sizes)}-{max(sizes)} 个范围，"
+                  f"实测每帧 {self._batcher.bytes_per_frame / 1024:.1f} KB")
+    
+    @staticmethod
+    def _episodes_nbytes(episodes_data: Dict[int, Dict], seen: Optional[Dict[int, Any]] = None) -> int:
+        """
+        批次实际占用的字节数（重叠范围共享的并集数组、EncodedImage只计一次）
+        
+        Args:
+            seen: 已计入的对象 {id: 对象}；多次调用共用时只计入新出现的对象（保留引用，id不会被复用）
+        """
+        seen = {} if seen is None else seen
+        total = 0
+        for episode_data in episodes_data.values():
+            for values in episode_data['arrays'].values():
+                if isinstance(values, np.ndarray):
+                    owner = values
+                    while isinstance(owner.base, np.ndarray):
+                        owner = owner.base
+                    if id(owner) not in seen:
+                        seen[id(owner)] = owner
+                        total += owner.nbytes
+                else:
+                    for value in values:
+                        if id(value) not in seen:
+                            seen[id(value)] = value
+                            total += len(value)
+        return total
+    
+    def _convert_episode_images(self, episodes_data: Dict[int, Dict], image_target: str):
+        """
+        转换阶段：把每个范围的图像数组原地转换为写入端需要的格式
+        
+        Args:
+            episodes_data: extract_ranges_batch 的结果
+            image_target: 'numpy' - [T, H, W, 3] uint8数组（官方API add_frame；直通的源字节在此解码）
+                          'encoded' - PNG字节 EncodedImage 列表（传统方法；与HF Image特征编码PIL图像的结果一致，
+                                      源字节直通的图像保持不变）
+        """
+        from parquet_range_reader import EncodedImage
+        
+        # 重叠范围共享同一块并集数组（或同一批EncodedImage）：每个源帧只转换一次
+        converted = {}
+        
+        def convert_once(key, fn, value):
+            if key not in converted:
+                converted[key] = fn(value)
+            return converted[key]
+        
+        def encode(image):
+            return EncodedImage(encode_png(image))
+        
+        for episode_data in episodes_data.values():
+            arrays = episode_data['arrays']
+            original_index = episode_data['original_index'].tolist()
+            for key in IMAGE_KEYS:
+                images = arrays[key]
+                if image_target == 'numpy' and not isinstance(images, np.ndarray):
+                    arrays[key] = _stack_rows((convert_once(id(image), EncodedImage.decode, image) for image in images),
+                                              len(images))
+                elif image_target == 'encoded' and isinstance(images, np.ndarray):
+                    base = id(images.base if images.base is not None else images)
+                    arrays[key] = [convert_once((base, frame_idx), encode, image)
+                                   for image, frame_idx in zip(images, original_index)]
+    
+    def _encode_batch_videos(self, batch, frame_ranges: List[Dict], total_ranges: int, executor):
+        """
+        编码阶段（视频模式）：批次内每个范围、每个相机编码为一个临时视频，各episode在线程池中并行编码
+        
+        结果记录在 episode_data['videos'] = {相机: (临时视频路径, 帧数)}；
+        需要placeholder时视频末尾重复最后一帧（与数据文件中追加的placeholder帧对应）。
+        """
+        spec, episodes_data = batch
+        tmp_dir = self.output_dir / 'videos' / '_episodes'
+        
+        jobs = []
+        for cut_range_id, episode_data in episodes_data.items():
+            metadata = episode_data['metadata']
+            next_idx = cut_range_id + 1
+            placeholder = (self.insert_placeholders and next_idx < total_ranges and
+                           frame_ranges[next_idx].get('episode_index', -1) == metadata['episode_index'])
+            episode_data['placeholder'] = placeholder
+            episode_data['videos'] = {}
+            
+            for key in IMAGE_KEYS:
+                frames = episode_data['arrays'][key]
+                if placeholder:
+                    frames = np.concatenate([frames, frames[-1:]])
+                path = tmp_dir / f"{key}_{cut_range_id:07d}.mp4"
+                future = executor.submit(encode_video, frames, path, self.fps, self.video_codec, self.video_backend)
+                jobs.append((future, episode_data, key, path, len(frames)))
+        
+        for future, episode_data, key, path, num_frames in jobs:
+            future.result()
+            episode_data['videos'][key] = (path, num_frames)
+        
+        return spec, episodes_data
+    
     def save_as_lerobot_format_streaming(self,
                                         dataset,
                                         frame_ranges: List[Dict],
@@ -463,7 +1149,7 @@ class DatasetCutter:
             保存的文件路径
         """
         print(f"💾 使用LeRobot官方API保存数据...")
-        print(f"  批处理大小: {self.batch_size} episodes/批")
+        self._print_batching()
 
         if self.lerobot_dataset is None:
             raise RuntimeError("LeRobot dataset 未初始化")
@@ -472,20 +1158,14 @@ class DatasetCutter:
         # 限制episode数量
         total_ranges = min(len(frame_ranges), max_episodes) if max_episodes else len(frame_ranges)
         
-        # 分批处理
-        for batch_start in range(0, total_ranges, self.batch_size):
-            batch_end = min(batch_start + self.batch_size, total_ranges)
+        # 分批处理：读取、图像转换与写入在流水线中并发执行，写入按批次顺序进行
+        pipeline, batches = self._build_batch_pipeline(dataset, frame_ranges, total_ranges, image_target='numpy')
+        
+        def write_batch(batch):
+            (batch_start, batch_end), episodes_data = batch
             
             print(f"\n  处理批次 [{batch_start}:{batch_end}]/{total_ranges}")
             
-            # 提取当前批次的帧数据
-            extracted_data = self.extract_frames_batch(
-                dataset, frame_ranges, batch_start, batch_end, verbose=False
-            )
-            
-            # 按episode组织
-            episodes_data = self.organize_by_episode(extracted_data)
-            
             # 处理每个episode
             # 用于缓存下一个episode需要的placeholder
             # pending_placeholder = None
@@ -507,31 +1187,29 @@ class DatasetCutter:
                     is_last_segment= True
                 
                 is_last_segment = np.array([is_last_segment])
-                # 使用官方API逐帧添加
-                for frame_idx, frame in enumerate(frames):
-                    # 转换图像格式（LeRobot API需要numpy格式）
-                    image1 = self._tensor_to_numpy_image(frame['observation.images.image'])
-                    image2 = self._tensor_to_numpy_image(frame['observation.images.image2'])
-                    state = self._tensor_to_numpy(frame['observation.state'])
-                    action = self._tensor_to_numpy(frame['action'])
-                    
+                # 使用官方API逐帧添加（转换阶段已把图像转为 [T, H, W, 3] uint8，直接取整段数组的行）
+                arrays = episode_data['arrays']
+                images1 = arrays['observation.images.image']
+                images2 = arrays['observation.images.image2']
+                states = arrays['observation.state']
+                actions = arrays['action']
+                for frame_idx in range(len(frames)):
                     # 注意：timestamp, frame_index, episode_index, index, task_index
                     # 这些字段由官方API自动生成，不需要手动传入
                     lrd.add_frame({
-                        "observation.images.image": image1,
-                        "observation.images.image2": image2,
-                        "observation.state": state,
-                        "action": action,
+                        "observation.images.image": images1[frame_idx],
+                        "observation.images.image2": images2[frame_idx],
+                        "observation.state": states[frame_idx],
+                        "action": actions[frame_idx],
                         "task": task_name,
                         "is_last_segment": is_last_segment,
                     })
                 
                 if self.insert_placeholders:
                     placeholder_action = np.full((7,), self.placeholder_action_value, dtype=np.float32)
-                    last_frame = frames[-1]
-                    image1 = self._tensor_to_numpy_image(last_frame['observation.images.image'])
-                    image2 = self._tensor_to_numpy_image(last_frame['observation.images.image2'])
-                    state = self._tensor_to_numpy(last_frame['observation.state'])
+                    image1 = images1[-1]
+                    image2 = images2[-1]
+                    state = states[-1]
                     
 
                     lrd.add_frame({
@@ -575,11 +1253,13 @@ class DatasetCutter:
             print(f"  ✓ 批次完成，已保存 {len(episodes_data)} episodes")
             
             # 清理内存
-            del extracted_data
+            del batch
             del episodes_data
             import gc
             gc.collect()
         
+        self._run_batch_pipeline(pipeline, batches, write_batch)
+        
         print(f"\n✅ 使用官方API保存完成!")
         print(f"  总episodes: {total_ranges}")
         
@@ -602,7 +1282,7 @@ class DatasetCutter:
             保存的文件路径
         """
         print(f"💾 使用传统方法保存数据...")
-        print(f"  批处理大小: {self.batch_size} episodes/批")
+        self._print_batching()
         
         # 首先构建任务映射表
         task_to_index = {}
@@ -621,28 +1301,37 @@ class DatasetCutter:
         meta_dir.mkdir(parents=True, exist_ok=True)
         data_root_dir.mkdir(parents=True, exist_ok=True)
         
-        # 流式处理
+        # 视频模式：相机画面编码为视频文件，数据文件只保存低维列
+        video = self.save_mode == 'lerobot-video'
+        
+        # 流式处理：连续的episode追加到按大小滚动的数据文件
         episodes_list = []
         global_frame_idx = 0
-        file_idx = 0
+        writer = RollingParquetWriter(self.output_dir, max_file_mb=self.data_files_size_in_mb,
+                                      schema=VIDEO_FRAME_SCHEMA if video else FRAME_SCHEMA)
+        video_writers = {key: RollingVideoWriter(self.output_dir, key, self.fps, self.video_files_size_in_mb,
+                                                 backend=self.video_backend)
+                         for key in IMAGE_KEYS} if video else {}
         
         # 限制episode数量
         total_ranges = min(len(frame_ranges), max_episodes) if max_episodes else len(frame_ranges)
         
-        # 分批处理
-        for batch_start in range(0, total_ranges, self.batch_size):
-            batch_end = min(batch_start + self.batch_size, total_ranges)
+        # 分批处理：读取、图像编码与写入在流水线中并发执行，写入按批次顺序进行
+        if video:
+            from concurrent.futures import ThreadPoolExecutor
+            video_executor = ThreadPoolExecutor(self.video_workers, thread_name_prefix='video-encode')
+            pipeline, batches = self._build_batch_pipeline(
+                dataset, frame_ranges, total_ranges, image_target='numpy',
+                encode=lambda batch: self._encode_batch_videos(batch, frame_ranges, total_ranges, video_executor))
+        else:
+            pipeline, batches = self._build_batch_pipeline(dataset, frame_ranges, total_ranges, image_target='encoded')
+        
+        def write_batch(batch):
+            nonlocal global_frame_idx
+            (batch_start, batch_end), episodes_data = batch
             
             print(f"\n  处理批次 [{batch_start}:{batch_end}]/{total_ranges}")
             
-            # 提取当前批次的帧数据
-            extracted_data = self.extract_frames_batch(
-                dataset, frame_ranges, batch_start, batch_end, verbose=False
-            )
-            
-            # 按episode组织
-            episodes_data = self.organize_by_episode(extracted_data)
-            
             # 保存当前批次
             for cut_range_id, episode_data in sorted(episodes_data.items()):
                 frames = episode_data['frames']
@@ -660,8 +1349,10 @@ class DatasetCutter:
                 episode_meta = {
                     'episode_index': new_episode_idx,
                     'tasks': np.array([metadata['new_task']]),
-                    'data/chunk_index': to_int(metadata['episode_index']),
-                    'data/file_index': new_episode_idx,
+                    # 数据文件位置（写出后填入）：data/chunk-XXX/file-YYY.parquet 及episode在文件中的起始行
+                    'data/chunk_index': 0,
+                    'data/file_index': 0,
+                    'data/row_offset': 0,
                     'dataset_from_index': global_frame_idx,
                     'dataset_to_index': global_frame_idx + num_frames - 1,
                     'length': num_frames,
@@ -680,55 +1371,70 @@ class DatasetCutter:
                 current_task = metadata['new_task']
                 current_task_index = task_to_index[current_task]
                 
-                # 准备帧数据
-                frame_records = []
-                for local_idx, frame in enumerate(frames):
-                    record = {
-                        'observation.images.image': frame['observation.images.image'],
-                        'observation.images.image2': frame['observation.images.image2'],
-                        'observation.state': frame['observation.state'],
-                        'action': frame['action'],
-                        'timestamp': frame.get('timestamp', torch.tensor(0.0)),
-                        'episode_index': torch.tensor(new_episode_idx),
-                        'frame_index': torch.tensor(local_idx),
-                        'index': torch.tensor(global_frame_idx - num_frames + local_idx),
-                        'task_index': torch.tensor(current_task_index),
-                    }
-                    frame_records.append(record)
+                # 整段列数据（图像已在转换阶段编码为PNG字节，state/action为 [T, D] 数组；
+                # 视频模式下图像已编码为视频，不写入数据文件）
+                arrays = episode_data['arrays']
+                columns = {} if video else {key: list(arrays[key]) for key in IMAGE_KEYS}
+                columns.update({
+                    'observation.state': arrays['observation.state'],
+                    'action': arrays['action'],
+                    'timestamp': arrays['timestamp'] if 'timestamp' in arrays else np.zeros(num_frames, dtype=np.float32),
+                    'episode_index': np.full(num_frames, new_episode_idx, dtype=np.int64),
+                    'frame_index': np.arange(num_frames, dtype=np.int64),
+                    'index': np.arange(global_frame_idx - num_frames, global_frame_idx, dtype=np.int64),
+                    'task_index': np.full(num_frames, current_task_index, dtype=np.int64),
+                })
                 
-                # 插入placeholder（如果启用且不是最后一个episode）
+                # 插入placeholder（如果启用且不是最后一个episode；视频模式在编码阶段已决定，视频中含placeholder帧）
                 placeholder_added = False
-                if self.insert_placeholders and new_episode_idx < total_ranges - 1:
+                if 'placeholder' in episode_data:
+                    wants_placeholder = episode_data['placeholder']
+                else:
+                    wants_placeholder = self.insert_placeholders and new_episode_idx < total_ranges - 1
+                if wants_placeholder:
                     # 检查下一个episode是否属于同一个chunk
                     next_idx = cut_range_id + 1
                     if next_idx < len(frame_ranges):
                         next_metadata = frame_ranges[next_idx]
                         if next_metadata.get('episode_index', -1) == metadata['episode_index']:
-                            # 同一个chunk，将placeholder追加到当前segment
-                            placeholder_frame_dict = self._create_placeholder_frame(
-                                frames[-1],  # 使用当前segment的最后一帧
+                            # 同一个chunk，将placeholder追加到当前segment（使用当前segment的最后一帧）
+                            placeholder = self._create_placeholder_frame(
+                                frames[-1],
                                 new_episode_idx,
                                 global_frame_idx,  # placeholder使用下一个frame的index
                                 current_task_index
                             )
-                            
-                            # 将placeholder作为额外帧追加到frame_records
-                            frame_records.append(placeholder_frame_dict)
+                            for key, value in placeholder.items():
+                                if key not in columns:
+                                    continue
+                                if isinstance(columns[key], list):
+                                    columns[key] = columns[key] + [value]
+                                else:
+                                    row = np.asarray(self._tensor_to_numpy(value), dtype=columns[key].dtype)
+                                    columns[key] = np.concatenate([columns[key], row[None]])
                             global_frame_idx += 1  # placeholder占用一个frame
                             placeholder_added = True
                             
                             if new_episode_idx < 3:  # 只打印前几个
                                 print(f"  ⚡ 插入placeholder @ 索引 {global_frame_idx-1} (追加到 segment {new_episode_idx})")
                 
-                # 保存为parquet（包含可能的placeholder帧）
-                if frame_records:
-                    original_ep_idx = to_int(metadata['episode_index'])
-                    episode_dir = data_root_dir / f'episode_{original_ep_idx}'
-                    episode_dir.mkdir(parents=True, exist_ok=True)
-                    
-                    data_file = episode_dir / f'segment_{new_episode_idx}.parquet'
-                    self._save_frame_batch(frame_records, data_file)
-                    file_idx += 1
+                # 视频模式：timestamp 是帧在本episode视频片段内的位置（LeRobot在 from_timestamp + timestamp 处解码），
+                # 不能沿用源episode的时间戳；placeholder帧对应视频末尾重复的那一帧
+                if video:
+                    columns['timestamp'] = (np.arange(len(columns['action'])) / self.fps).astype(np.float32)
+                
+                # 追加到当前数据文件（包含可能的placeholder帧）
+                chunk_index, file_index, row_offset = writer.write_episode(build_frame_table(columns, writer.schema))
+                episode_meta['data/chunk_index'] = chunk_index
+                episode_meta['data/file_index'] = file_index
+                episode_meta['data/row_offset'] = row_offset
+                
+                # 视频模式：把编码好的episode视频追加到各相机的滚动视频文件
+                for key, video_writer in video_writers.items():
+                    episode_video, video_frames = episode_data['videos'][key]
+                    if video_frames != episode_meta['length'] + int(placeholder_added):
+                        raise RuntimeError(f"视频帧数 {video_frames} 与数据帧数不一致 (episode {new_episode_idx})")
+                    episode_meta.update(video_writer.add_episode(episode_video, video_frames))
                 
                 # 调整episode metadata以包含placeholder
                 if placeholder_added:
@@ -736,12 +1442,22 @@ class DatasetCutter:
                     episode_meta['dataset_to_index'] += 1  # 结束索引后移
             
             # 清理内存
-            del extracted_data
+            del batch
             del episodes_data
             import gc
             gc.collect()
             
-            print(f"  ✓ 批次完成，已处理 {len(episodes_list)} episodes, {file_idx} 文件")
+            print(f"  ✓ 批次完成，已处理 {len(episodes_list)} episodes, {writer.num_files} 文件")
+        
+        try:
+            self._run_batch_pipeline(pipeline, batches, write_batch)
+        finally:
+            writer.close()
+            for video_writer in video_writers.values():
+                video_writer.close()
+            if video:
+                video_executor.shutdown()
+                shutil.rmtree(self.output_dir / 'videos' / '_episodes', ignore_errors=True)
         
         # 保存元数据
         episodes_df = pd.DataFrame(episodes_list)
@@ -764,11 +1480,17 @@ class DatasetCutter:
         
         print(f"  ✓ 保存tasks列表: {tasks_file}")
         print(f"    - Tasks数: {len(tasks_df)}")
-        print(f"  ✓ 总共保存 {file_idx} 个数据文件")
+        print(f"  ✓ 总共保存 {writer.num_files} 个数据文件（每个最大 {self.data_files_size_in_mb} MB）")
+        video_info = None
+        if video:
+            print(f"  ✓ 视频文件: " + ", ".join(f"{key} {w.num_files} 个" for key, w in video_writers.items()))
+            video_info = {'video.fps': self.fps, 'video.codec': self.video_codec, 'video.pix_fmt': VIDEO_PIX_FMT,
+                          'video.is_depth_map': False, 'has_audio': False,
+                          'video_files_size_in_mb': self.video_files_size_in_mb}
         
         # 保存元信息
         root_meta_dir = self.output_dir / 'meta'
-        self._save_metadata(root_meta_dir, episodes_df, tasks_df)
+        self._save_metadata(root_meta_dir, episodes_df, tasks_df, self.data_files_size_in_mb, video_info)
         
         return self.output_dir
     
@@ -811,9 +1533,9 @@ class DatasetCutter:
         for task, idx in sorted(task_to_index.items(), key=lambda x: x[1]):
             print(f"    {idx}: {task}")
         
-        # 保存帧数据
+        # 保存帧数据（连续的episode追加到按大小滚动的数据文件）
         print(f"\n  保存帧数据...")
-        file_idx = 0
+        writer = RollingParquetWriter(self.output_dir, max_file_mb=self.data_files_size_in_mb)
         
         for cut_range_id, episode_data in sorted(episodes_data.items()):
             if max_episodes and len(episodes_list) >= max_episodes:
@@ -836,9 +1558,10 @@ class DatasetCutter:
             episode_meta = {
                 'episode_index': new_episode_idx,
                 'tasks': np.array([metadata['new_task']]),
-                # LeRobot required: data file location
-                'data/chunk_index': to_int(metadata['episode_index']),  # 使用原始episode作为chunk
-                'data/file_index': new_episode_idx,  # 使用新episode index作为file index
+                # LeRobot required: data file location（写出后填入）
+                'data/chunk_index': 0,
+                'data/file_index': 0,
+                'data/row_offset': 0,  # episode在数据文件中的起始行
                 'dataset_from_index': global_frame_idx,
                 'dataset_to_index': global_frame_idx + num_frames - 1,
                 'length': num_frames,
@@ -877,19 +1600,13 @@ class DatasetCutter:
             
             # 保存为parquet
             if frame_records:
-                # 使用原始episode index创建文件夹
-                original_ep_idx = to_int(metadata['episode_index'])
-                episode_dir = data_root_dir / f'episode_{original_ep_idx}'
-                episode_dir.mkdir(parents=True, exist_ok=True)
-                
-                # 文件名包含新的episode index以区分同一原始episode下的不同片段
-                data_file = episode_dir / f'segment_{new_episode_idx}.parquet'
+                location = writer.write_episode(self._frame_records_table(frame_records))
+                episode_meta['data/chunk_index'], episode_meta['data/file_index'], episode_meta['data/row_offset'] = location
                 
-                self._save_frame_batch(frame_records, data_file)
-                file_idx += 1
-                
-                if file_idx % 10 == 0:
-                    print(f"    已保存 {file_idx} 个数据文件")
+                if len(episodes_list) % 10 == 0:
+                    print(f"    已保存 {len(episodes_list)} 个episode（{writer.num_files} 个数据文件）")
+        
+        writer.close()
 
         # 转换为DataFrame
         episodes_df = pd.DataFrame(episodes_list)
@@ -917,89 +1634,51 @@ class DatasetCutter:
         print(f"  ✓ 保存tasks列表: {tasks_file}")
         print(f"    - Tasks数: {len(tasks_df)}")
         
-        print(f"  ✓ 总共保存 {file_idx} 个数据文件")
+        print(f"  ✓ 总共保存 {writer.num_files} 个数据文件（每个最大 {self.data_files_size_in_mb} MB）")
         
         # 保存元信息 - 传递正确的meta根目录
         root_meta_dir = self.output_dir / 'meta'
-        self._save_metadata(root_meta_dir, episodes_df, tasks_df)
+        self._save_metadata(root_meta_dir, episodes_df, tasks_df, self.data_files_size_in_mb)
         
         return self.output_dir
     
     def _save_frame_batch(self, frame_records: List[Dict], file_path: Path):
         """
-        保存一批帧数据为parquet文件，使用LeRobot的方式编码图像
+        保存一批帧数据为单独的parquet文件（图像编码为PNG，schema与LeRobot/HF Image特征一致）
         """
-        from datasets import Dataset, Features, Image as HFImage, Sequence, Value
-        
-        def to_numpy(val):
-            if hasattr(val, 'detach'):
-                val = val.detach()
-            if hasattr(val, 'cpu'):
-                val = val.cpu()
-            if hasattr(val, 'numpy'):
-                return val.numpy()
-            if isinstance(val, list):
-                return np.array(val)
-            return val
-        
-        # 将Tensor图像转换为PIL Image
-        def tensor_to_pil(tensor_data):
-            if hasattr(tensor_data, 'cpu'):
-                tensor_data = tensor_data.cpu()
-            if hasattr(tensor_data, 'numpy'):
-                tensor_data = tensor_data.numpy()
-            
-            # CHW -> HWC
-            if tensor_data.ndim == 3 and tensor_data.shape[0] == 3:
-                tensor_data = tensor_data.transpose(1, 2, 0)
-            
-            # 0-1 float -> 0-255 uint8
-            if tensor_data.dtype != np.uint8:
-                if tensor_data.max() <= 1.0:
-                    tensor_data = (tensor_data * 255).astype(np.uint8)
-                else:
-                    tensor_data = tensor_data.astype(np.uint8)
-            
-            return Image.fromarray(tensor_data)
-        
-        # 准备数据
-        data = {
-            'observation.images.image': [tensor_to_pil(f['observation.images.image']) for f in frame_records],
-            'observation.images.image2': [tensor_to_pil(f['observation.images.image2']) for f in frame_records],
-            'observation.state': [to_numpy(f['observation.state']).tolist() for f in frame_records],
-            'action': [to_numpy(f['action']).tolist() for f in frame_records],
-            'timestamp': [float(to_numpy(f['timestamp'])) for f in frame_records],
-            # 添加元数据字段
-            'episode_index': [int(to_numpy(f['episode_index'])) for f in frame_records],
-            'frame_index': [int(to_numpy(f['frame_index'])) for f in frame_records],
-            'index': [int(to_numpy(f['index'])) for f in frame_records],
-            'task_index': [int(to_numpy(f['task_index'])) for f in frame_records],
-        }
-        
-        # 定义HuggingFace Dataset的Features
-        features = Features({
-            'observation.images.image': HFImage(),
-            'observation.images.image2': HFImage(),
-            'observation.state': Sequence(Value('float32')),
-            'action': Sequence(Value('float32')),
-            'timestamp': Value('float32'),
-            # 添加元数据字段
-            'episode_index': Value('int64'),
-            'frame_index': Value('int64'),
-            'index': Value('int64'),
-            'task_index': Value('int64'),
-        })
-        
-        # 创建HuggingFace Dataset
-        dataset = Dataset.from_dict(data, features=features)
-        
-        # 写入Parquet文件
-        dataset.to_parquet(file_path)
+        with EpisodeParquetWriter(file_path) as writer:
+            writer.write(self._frame_records_table(frame_records))
+    
+    def _frame_records_table(self, frame_records: List[Dict]):
+        """
+        逐帧记录 -> 帧表（pyarrow.Table）
+        """
+        from parquet_range_reader import EncodedImage
+        
+        # 源图像字节直接写入，其余图像转为 uint8 HWC 后编码
+        def to_image(tensor_data):
+            if isinstance(tensor_data, EncodedImage):
+                return tensor_data
+            return self._tensor_to_numpy_image(tensor_data)
+        
+        columns = {}
+        for key in IMAGE_KEYS:
+            columns[key] = [to_image(f[key]) for f in frame_records]
+        for key in ['observation.state', 'action']:
+            columns[key] = np.stack([self._tensor_to_numpy(f[key]) for f in frame_records])
+        for key in ['timestamp', 'episode_index', 'frame_index', 'index', 'task_index']:
+            columns[key] = np.array([self._tensor_to_numpy(f[key]) for f in frame_records])
+        
+        return build_frame_table(columns)
     
     @staticmethod
-    def _save_metadata(meta_dir: Path, episodes_df: pd.DataFrame, tasks_df: pd.DataFrame):
+    def _save_metadata(meta_dir: Path, episodes_df: pd.DataFrame, tasks_df: pd.DataFrame,
+                       data_files_size_in_mb: float = DEFAULT_DATA_FILE_SIZE_MB,
+                       video_info: Optional[Dict] = None):
         """
         保存元信息文件
+        
+        video_info: 视频模式的编码信息（相机特征改为 dtype 'video'，并写入 video_path）
         """
         print(f"  📝 开始保存元信息到 {meta_dir}...")
         
@@ -1010,12 +1689,13 @@ class DatasetCutter:
             'total_episodes': int(len(episodes_df)),
             'total_frames': int(episodes_df['length'].sum()),
             'total_tasks': int(len(tasks_df)),
-            'chunks_size': 1000,
+            'chunks_size': DEFAULT_CHUNKS_SIZE,
+            'data_files_size_in_mb': data_files_size_in_mb,
             'fps': 10.0,
             'splits': {
                 'train': f"0:{len(episodes_df)}"
             },
-            'data_path': 'data/episode_{chunk_index}/segment_{file_index}.parquet',
+            'data_path': DATA_PATH,
             'features': {
                 'observation.images.image': {
                     'dtype': 'image',
@@ -1074,6 +1754,14 @@ class DatasetCutter:
             }
         }
         
+        if video_info is not None:
+            video_info = dict(video_info)
+            info['video_files_size_in_mb'] = video_info.pop('video_files_size_in_mb', DEFAULT_VIDEO_FILE_SIZE_MB)
+            info['video_path'] = VIDEO_PATH
+            for key in IMAGE_KEYS:
+                info['features'][key]['dtype'] = 'video'
+                info['features'][key]['info'] = dict(video_info)
+        
         with open(meta_dir / 'info.json', 'w') as f:
             json.dump(info, f, indent=2, default=str)
         
@@ -1105,7 +1793,20 @@ def cut_and_convert_dataset(dataset,
                            repo_id: Optional[str] = None,
                            robot_type: str = "panda",
                            fps: float = 10.0,
-                           use_official_api: bool = True) -> Path:
+                           use_official_api: bool = True,
+                           direct_read: bool = True,
+                           image_passthrough: bool = False,
+                           read_workers: int = 1,
+                           convert_workers: int = 2,
+                           pipeline_queue_size: int = 1,
+                           memory_budget_gb: Optional[float] = None,
+                           workers: int = 1,
+                           data_files_size_in_mb: float = DEFAULT_DATA_FILE_SIZE_MB,
+                           video_codec: str = DEFAULT_VIDEO_CODEC,
+                           video_workers: int = 4,
+                           video_files_size_in_mb: float = DEFAULT_VIDEO_FILE_SIZE_MB,
+                           image_workers: int = 4,
+                           shard_size_in_mb: float = DEFAULT_SHARD_SIZE_MB) -> Path:
     """
     完整的数据集裁剪和转换流程
     
@@ -1113,7 +1814,9 @@ def cut_and_convert_dataset(dataset,
         dataset: 原始LeRobot数据集
         frame_ranges: 帧范围列表（包含new_task字段）
         output_dir: 输出目录
-        save_mode: 保存模式 'image'（图片）, 'lerobot'（Parquet）, 或 'both'（两者）
+        save_mode: 保存模式 'image'（图片）, 'lerobot'（Parquet）, 'both'（两者）,
+                   或 'lerobot-video'（相机画面编码为MP4视频，需要PyAV或ffmpeg；总是流式处理）
+                   或 'image-tar'（图片写入按大小滚动的tar分片并生成索引；总是流式处理）
         max_episodes: 最多保存的episode数量
         batch_size: 批处理大小（每次处理多少个episode）
         streaming: 是否使用流式处理（推荐，节省内存）
@@ -1123,18 +1826,59 @@ def cut_and_convert_dataset(dataset,
         robot_type: 机器人类型（默认"panda"）
         fps: 采样频率（默认10.0）
         use_official_api: 是否使用LeRobot官方API（推荐）
+        direct_read: 是否直接从源Parquet按范围读取帧（不可用时自动退回逐帧读取）
+        image_passthrough: 是否原样写出源图像的PNG/JPEG字节（需要直接读取）
+        read_workers / convert_workers: 流式处理流水线中读取、转换阶段的线程数
+        pipeline_queue_size: 流水线阶段之间的队列容量（批次）
+        memory_budget_gb: 内存预算（GB）；设置后流式处理按预算自适应划分批次，代替 batch_size
+        workers: 进程数；>1时把帧范围切成多个分片在独立进程中裁剪，再合并为一个数据集
+                 （仅流式的 'lerobot' 模式，使用传统方法写出）
+        data_files_size_in_mb: 传统方法每个数据文件的大小上限（MB）
+        video_codec / video_workers / video_files_size_in_mb: 视频模式的编码器、并行编码线程数、视频文件大小上限（MB）
+        image_workers: 图片模式编码并写出图像文件的线程数
+        shard_size_in_mb: image-tar 模式每个tar分片的大小上限（MB）
         
     Returns:
         输出目录路径
     """
+    if workers > 1:
+        if streaming and save_mode == 'lerobot':
+            from sharded_cut import cut_and_convert_sharded
+            if use_official_api:
+                print("⚠️  多进程分片模式使用传统方法写出（官方API的分片需要LeRobot的数据集聚合）")
+            return cut_and_convert_sharded(dataset, frame_ranges, output_dir, workers, max_episodes,
+                                           batch_size=batch_size, insert_placeholders=insert_placeholders,
+                                           placeholder_action_value=placeholder_action_value,
+                                           robot_type=robot_type, fps=fps, direct_read=direct_read,
+                                           image_passthrough=image_passthrough, read_workers=read_workers,
+                                           convert_workers=convert_workers,
+                                           pipeline_queue_size=pipeline_queue_size,
+                                           # 内存预算由各进程均分
+                                           memory_budget_gb=memory_budget_gb / workers if memory_budget_gb else None,
+                                           data_files_size_in_mb=data_files_size_in_mb)
+        print(f"⚠️  多进程分片只支持流式的 'lerobot' 保存模式，使用单进程处理")
+    
     cutter = DatasetCutter(output_dir, save_mode=save_mode, batch_size=batch_size,
                           insert_placeholders=insert_placeholders,
                           placeholder_action_value=placeholder_action_value,
                           repo_id=repo_id, robot_type=robot_type, fps=fps,
-                          use_official_api=use_official_api)
+                          use_official_api=use_official_api, direct_read=direct_read,
+                          image_passthrough=image_passthrough, read_workers=read_workers,
+                          convert_workers=convert_workers, pipeline_queue_size=pipeline_queue_size,
+                          memory_budget_gb=memory_budget_gb, data_files_size_in_mb=data_files_size_in_mb,
+                          video_codec=video_codec, video_workers=video_workers,
+                          video_files_size_in_mb=video_files_size_in_mb, image_workers=image_workers,
+                          shard_size_in_mb=shard_size_in_mb)
+    
+    if save_mode == 'lerobot-video' and not streaming:
+        print(f"⚠️  视频模式总是使用流式处理")
+        streaming = True
+    if save_mode == 'image-tar' and not streaming:
+        print(f"⚠️  tar分片模式总是使用流式处理")
+        streaming = True
     
     # 使用流式处理（推荐）
-    if streaming and save_mode in ['lerobot', 'both']:
+    if streaming and save_mode in ['lerobot', 'both', 'lerobot-video']:
         print(f"\n💡 使用流式处理模式（批大小: {batch_size}）")
         output_path = cutter.save_as_lerobot_format_streaming(dataset, frame_ranges, max_episodes)
         
@@ -1142,19 +1886,17 @@ def cut_and_convert_dataset(dataset,
         if save_mode == 'both':
             print("\n📦 额外保存图片格式...\n")
             # 图片格式也使用批处理
-            for batch_start in range(0, len(frame_ranges), batch_size):
-                batch_end = min(batch_start + batch_size, len(frame_ranges))
-                extracted_data = cutter.extract_frames_batch(dataset, frame_ranges, batch_start, batch_end)
-                episodes_data = cutter.organize_by_episode(extracted_data)
-                cutter.save_as_image_format(episodes_data, frame_ranges[batch_start:batch_end], max_episodes)
-                del extracted_data, episodes_data
-                import gc
-                gc.collect()
+            cutter.save_as_image_format_streaming(dataset, frame_ranges, max_episodes)
+    elif streaming and save_mode == 'image':
+        print(f"\n💡 使用流式处理模式（批大小: {batch_size}）")
+        output_path = cutter.save_as_image_format_streaming(dataset, frame_ranges, max_episodes)
+    elif streaming and save_mode == 'image-tar':
+        print(f"\n💡 使用流式处理模式（批大小: {batch_size}）")
+        output_path = cutter.save_as_image_shards_streaming(dataset, frame_ranges, max_episodes)
     else:
         # 旧方式：一次性加载所有数据（不推荐，但保留兼容性）
         print(f"\n⚠️  使用传统处理模式（一次性加载所有数据）")
-        extracted_data = cutter.extract_frames_batch(dataset, frame_ranges, 0, len(frame_ranges))
-        episodes_data = cutter.organize_by_episode(extracted_data)
+        episodes_data = cutter.extract_ranges_batch(dataset, frame_ranges, 0, len(frame_ranges))
         
         if save_mode == 'image':
             output_path = cutter.save_as_image_format(episodes_data, frame_ranges, max_episodes)
@@ -1165,7 +1907,8 @@ def cut_and_convert_dataset(dataset,
             cutter.save_as_image_format(episodes_data, frame_ranges, max_episodes)
             output_path = cutter.save_as_lerobot_format(episodes_data, frame_ranges, max_episodes)
         else:
-            raise ValueError(f"Unknown save_mode: {save_mode}. Use 'image', 'lerobot', or 'both'")
+            raise ValueError(f"Unknown save_mode: {save_mode}. Use 'image', 'lerobot', 'both', 'lerobot-video', "
+                             f"or 'image-tar'")
     
     return output_path
 
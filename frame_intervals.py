@@ -0,0 +1,150 @@
+"""
+帧范围区间索引：排序+扫描合并、点查询和重叠查询
+"""
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+
+class FrameIntervalIndex:
+    """
+    帧范围的区间索引（左闭右开 [frame_start, frame_end)）
+    
+    范围按 frame_start 稳定排序后，用前缀最大 frame_end 剪枝，使得：
+    - 合并：一次排序 + 一次线性扫描，O(n log n)，输入无需有序（例如来自并行分片）
+    - 点查询 / 重叠查询：两次二分定位候选区间
+    - 批量判断帧是否被覆盖：在合并后的并集区间上向量化 searchsorted
+    """
+    
+    def __init__(self, ranges: List[Dict]):
+        """
+        Args:
+            ranges: 帧范围列表（至少包含 frame_start / frame_end / episode_index）
+        """
+        self.ranges = ranges
+        count = len(ranges)
+        
+        starts = np.fromiter((int(r['frame_start']) for r in ranges), dtype=np.int64, count=count)
+        ends = np.fromiter((int(r['frame_end']) for r in ranges), dtype=np.int64, count=count)
+        episodes = np.fromiter((int(r.get('episode_index', -1)) for r in ranges), dtype=np.int64, count=count)
+        
+        # 稳定排序：起点相同的范围保持输入顺序
+        self.order = np.argsort(starts, kind='stable')
+        self.starts = starts[self.order]
+        self.ends = ends[self.order]
+        self.episodes = episodes[self.order]
+        # 前缀最大终点：位置 p 之前（含）所有区间的最远终点，单调不减
+        self.max_ends = np.maximum.accumulate(self.ends) if count else ends
+        
+        self._union = None
+    
+    def __len__(self) -> int:
+        return len(self.ranges)
+    
+    def merge(self, min_gap: int = 50) -> List[Dict]:
+        """
+        排序+扫描合并：同一episode内，后一个范围的起点与当前合并范围终点的间隔小于
+        min_gap 时合并（与 GripperStateDetector.merge_adjacent_ranges 的规则一致）
+        
+        Args:
+            min_gap: 最小间隔阈值（0 表示只合并真正重叠的范围，1 表示合并重叠或相接的范围）
+        
+        Returns:
+            合并后的帧范围列表（按起点排序，元数据取自每组的第一个范围）
+        """
+        if not self.ranges:
+            return []
+        
+        groups = self._merge_groups(min_gap)
+        merged = []
+        for first, _, end in groups:
+            current_range = self.ranges[first].copy()
+            current_range['frame_end'] = end
+            current_range['num_frames'] = end - int(current_range['frame_start'])
+            merged.append(current_range)
+        return merged
+    
+    def _merge_groups(self, min_gap: int) -> List[Tuple[int, int, int]]:
+        """扫描排序后的区间，返回 [(组内第一个范围的原始下标, 起点, 终点), ...]"""
+        order = self.order.tolist()
+        starts = self.starts.tolist()
+        ends = self.ends.tolist()
+        episodes = self.episodes.tolist()
+        
+        groups = []
+        first, group_start, group_end, group_episode = order[0], starts[0], ends[0], episodes[0]
+        for p in range(1, len(order)):
+            if episodes[p] == group_episode and starts[p] - group_end < min_gap:
+                group_end = max(group_end, ends[p])
+            else:
+                groups.append((first, group_start, group_end))
+                first, group_start, group_end, group_episode = order[p], starts[p], ends[p], episodes[p]
+        groups.append((first, group_start, group_end))
+        return groups
+    
+    def union_intervals(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        每个episode内所有范围的并集（重叠或相接的范围合并为一段）
+        
+        Returns:
+            (starts, ends, episode_indices) - 按起点排序、互不重叠的区间
+        """
+        if self._union is None:
+            if not self.ranges:
+                empty = np.zeros(0, dtype=np.int64)
+                self._union = (empty, empty, empty)
+            else:
+                groups = self._merge_groups(min_gap=1)
+                firsts = np.array([g[0] for g in groups], dtype=np.int64)
+                episodes = np.array([int(self.ranges[f].get('episode_index', -1)) for f in firsts.tolist()],
+                                    dtype=np.int64)
+                self._union = (np.array([g[1] for g in groups], dtype=np.int64),
+                               np.array([g[2] for g in groups], dtype=np.int64),
+                               episodes)
+        return self._union
+    
+    def query_point(self, frame: int) -> List[int]:
+        """
+        包含帧 frame 的所有范围
+        
+        Returns:
+            范围在输入列表中的下标（按起点排序）
+        """
+        return self.query_overlap(frame, frame + 1)
+    
+    def query_overlap(self, start: int, end: int) -> List[int]:
+        """
+        与 [start, end) 重叠的所有范围
+        
+        Returns:
+            范围在输入列表中的下标（按起点排序）
+        """
+        # 候选区间：起点 < end，且前缀最大终点 > start（更靠前的区间不可能重叠）
+        hi = int(np.searchsorted(self.starts, end, side='left'))
+        lo = int(np.searchsorted(self.max_ends, start, side='right'))
+        if lo >= hi:
+            return []
+        hits = np.flatnonzero(self.ends[lo:hi] > start) + lo
+        return self.order[hits].tolist()
+    
+    def contains(self, frames) -> np.ndarray:
+        """
+        向量化判断每一帧是否被任意范围覆盖
+        
+        Args:
+            frames: 全局帧索引数组
+        
+        Returns:
+            bool数组
+        """
+        frames = np.asarray(frames, dtype=np.int64)
+        starts, ends, _ = self.union_intervals()
+        positions = np.searchsorted(starts, frames, side='right') - 1
+        valid = positions >= 0
+        result = np.zeros(frames.shape, dtype=bool)
+        result[valid] = frames[valid] < ends[positions[valid]]
+        return result
+
+
+if __name__ == '__main__':
+    print("Frame Interval Index Module")
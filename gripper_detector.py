@@ -1,9 +1,258 @@
 """
 检测和识别抓取器夹爪状态变化的关键帧
 """
+import os
+from abc import ABC, abstractmethod
 import torch
 import numpy as np
-from typing import List, Dict, Tuple
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional
+
+from frame_intervals import FrameIntervalIndex
+
+
+# 列式检测只需要的低维列（不包含图像）
+LOW_DIM_COLUMNS = ['action', 'episode_index', 'frame_index', 'task_index']
+
+
+def _column_to_numpy(column) -> np.ndarray:
+    """
+    将pyarrow列转换为numpy数组（list/fixed_size_list列转换为二维数组）
+    """
+    import pyarrow as pa
+    
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    
+    column_type = column.type
+    if (pa.types.is_list(column_type) or pa.types.is_large_list(column_type)
+            or pa.types.is_fixed_size_list(column_type)):
+        values = column.flatten().to_numpy(zero_copy_only=False)
+        if len(column) == 0:
+            width = column_type.list_size if pa.types.is_fixed_size_list(column_type) else 0
+            return values.reshape(0, width)
+        return values.reshape(len(column), -1)
+    
+    return column.to_numpy(zero_copy_only=False)
+
+
+def _table_to_columns(table, columns: List[str]) -> Dict[str, np.ndarray]:
+    """从pyarrow Table中取出存在的列并转换为numpy"""
+    return {
+        name: _column_to_numpy(table.column(name))
+        for name in columns if name in table.column_names
+    }
+
+
+def find_parquet_data_files(dataset_root) -> List[Path]:
+    """查找 dataset_root/data 下的所有Parquet文件（按路径排序）"""
+    data_dir = Path(dataset_root) / 'data'
+    if not data_dir.exists():
+        return []
+    return sorted(data_dir.glob('**/*.parquet'))
+
+
+def read_parquet_columns(dataset_root,
+                         columns: List[str]) -> Optional[Dict[str, np.ndarray]]:
+    """
+    直接从源Parquet文件读取指定列（按 index 列恢复全局顺序）
+    
+    Args:
+        dataset_root: 数据集根目录
+        columns: 需要读取的列名（不存在的列会被忽略）
+        
+    Returns:
+        {列名: numpy数组}；没有数据文件时返回None
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    data_files = find_parquet_data_files(dataset_root)
+    if not data_files:
+        return None
+    
+    tables = []
+    for data_file in data_files:
+        available = pq.read_schema(data_file).names
+        wanted = [c for c in dict.fromkeys(list(columns) + ['index']) if c in available]
+        tables.append(pq.read_table(data_file, columns=wanted))
+    table = pa.concat_tables(tables, promote_options='default')
+    
+    if 'index' in table.column_names:
+        order = np.argsort(_column_to_numpy(table.column('index')), kind='stable')
+        if np.any(order != np.arange(len(order))):
+            table = table.take(pa.array(order))
+    
+    return _table_to_columns(table, list(columns))
+
+
+def load_low_dim_columns(dataset,
+                         columns: Optional[List[str]] = None) -> Optional[Dict[str, np.ndarray]]:
+    """
+    只读取低维列（不解码图像）
+    
+    优先使用数据集旁已物化的信号存储（内存映射，零拷贝）；其次直接读取源Parquet
+    文件中的指定列；最后从 hf_dataset 中选择这些列（排除图像列）。
+    
+    Args:
+        dataset: LeRobot数据集
+        columns: 需要读取的列名（默认 LOW_DIM_COLUMNS）
+        
+    Returns:
+        {列名: numpy数组}，行号与 dataset[i] 的索引一致；无法读取时返回None
+    """
+    columns = list(columns or LOW_DIM_COLUMNS)
+    root = getattr(dataset, 'root', None)
+    
+    # 信号存储与源Parquet的行号都是全局索引，仅当数据集未按episode子集加载时可直接使用
+    if root is not None and getattr(dataset, 'episodes', None) is None:
+        # 方式1：已物化的信号存储
+        from signal_store import SignalStore
+        store = SignalStore.open_for_dataset(root)
+        if store is not None and store.covers(columns) and len(store) == len(dataset):
+            return store.as_columns(columns)
+        
+        # 方式2：直接读取源Parquet
+        try:
+            result = read_parquet_columns(root, columns)
+            if result is not None:
+                num_rows = len(next(iter(result.values()))) if result else 0
+                if num_rows == len(dataset):
+                    return result
+                print(f"⚠️  Parquet行数({num_rows})与数据集长度({len(dataset)})不一致，改用hf_dataset")
+        except Exception as e:
+            print(f"⚠️  直接读取Parquet列失败: {e}")
+    
+    # 方式3：从hf_dataset中选择低维列（不触发图像解码）
+    hf_dataset = getattr(dataset, 'hf_dataset', None)
+    if hf_dataset is not None:
+        try:
+            available = [c for c in columns if c in hf_dataset.column_names]
+            table = hf_dataset.select_columns(available).with_format('arrow')[:]
+            return _table_to_columns(table, columns)
+        except Exception as e:
+            print(f"⚠️  从hf_dataset读取列失败: {e}")
+    
+    return None
+
+
+def build_task_lookup(dataset) -> Dict[int, str]:
+    """
+    构建 task_index -> 任务描述 的映射（与 dataset[i]['task'] 一致）
+    """
+    meta = getattr(dataset, 'meta', None)
+    tasks = getattr(meta, 'tasks', None)
+    if tasks is None:
+        return {}
+    
+    if isinstance(tasks, dict):
+        return {int(k): str(v) for k, v in tasks.items()}
+    
+    # LeRobot v3: DataFrame，任务描述为index，dataset[i]['task'] 取 iloc[task_index].name
+    if hasattr(tasks, 'index') and hasattr(tasks, 'iloc'):
+        return {i: str(name) for i, name in enumerate(tasks.index)}
+    
+    return {}
+
+
+def make_frame_range(change: Dict, start_idx: int, end_idx: int) -> Dict:
+    """由关键帧信息和 [start_idx, end_idx) 构建帧范围字典"""
+    frame_range = {
+        'keyframe_index': change['index'],
+        'action_type': change['action_type'],
+        'frame_start': start_idx,
+        'frame_end': end_idx,
+        'num_frames': end_idx - start_idx,
+        'episode_index': change['episode_index'],
+        'frame_index': change['frame_index'],
+        'task': change['task'],
+        'task_index': change['task_index'],
+        'prev_gripper': change['prev_gripper'],
+        'curr_gripper': change['curr_gripper']
+    }
+    if 'source' in change:
+        frame_range['source'] = change['source']
+    return frame_range
+
+
+class EpisodeTable:
+    """
+    episode起止偏移表：每个episode在全局索引中的 [start, end) 区间
+    
+    一次构建后，所有关键帧的episode边界都可以通过 searchsorted 向量化得到，
+    不需要再逐帧读取数据集。
+    """
+    
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, episode_ids: np.ndarray):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.episode_ids = np.asarray(episode_ids, dtype=np.int64)
+    
+    def __len__(self) -> int:
+        return len(self.starts)
+    
+    @classmethod
+    def from_episode_column(cls, episode_index: np.ndarray) -> 'EpisodeTable':
+        """由逐帧的 episode_index 列构建（相邻帧episode不同处即为边界）"""
+        episode_index = np.asarray(episode_index)
+        if len(episode_index) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return cls(empty, empty, empty)
+        
+        boundaries = np.flatnonzero(np.diff(episode_index) != 0) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(episode_index)]])
+        return cls(starts, ends, episode_index[starts])
+    
+    @classmethod
+    def from_dataset(cls, dataset,
+                     columns: Optional[Dict[str, np.ndarray]] = None) -> Optional['EpisodeTable']:
+        """
+        构建episode偏移表
+        
+        优先使用已读取的 episode_index 列，其次使用 meta.episodes 中的
+        dataset_from_index / dataset_to_index，最后只读取 episode_index 列。
+        
+        Returns:
+            EpisodeTable；无法构建时返回None
+        """
+        if columns is not None and 'episode_index' in columns:
+            return cls.from_episode_column(columns['episode_index'])
+        
+        # meta.episodes 记录的是全局索引，仅当数据集未按episode子集加载时可直接使用
+        meta = getattr(dataset, 'meta', None)
+        episodes = getattr(meta, 'episodes', None)
+        if episodes is not None and getattr(dataset, 'episodes', None) is None:
+            try:
+                starts = np.asarray(episodes['dataset_from_index'], dtype=np.int64)
+                ends = np.asarray(episodes['dataset_to_index'], dtype=np.int64)
+                episode_ids = np.asarray(episodes['episode_index'], dtype=np.int64)
+                order = np.argsort(starts, kind='stable')
+                starts, ends, episode_ids = starts[order], ends[order], episode_ids[order]
+                # 校验：区间首尾相接且覆盖整个数据集
+                if (len(starts) > 0 and starts[0] == 0 and ends[-1] == len(dataset)
+                        and np.array_equal(starts[1:], ends[:-1])):
+                    return cls(starts, ends, episode_ids)
+            except Exception as e:
+                print(f"⚠️  从meta.episodes构建episode偏移表失败: {e}")
+        
+        columns = load_low_dim_columns(dataset, ['episode_index'])
+        if columns is not None and 'episode_index' in columns:
+            return cls.from_episode_column(columns['episode_index'])
+        
+        return None
+    
+    def bounds(self, indices) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        向量化查询全局索引所在episode的起止位置
+        
+        Returns:
+            (episode_starts, episode_ends) - 左闭右开
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        positions = np.searchsorted(self.starts, indices, side='right') - 1
+        positions = np.clip(positions, 0, max(len(self.starts) - 1, 0))
+        return self.starts[positions], self.ends[positions]
 
 
 class GripperStateDetector:
@@ -37,7 +286,8 @@ class GripperStateDetector:
     
     def detect_gripper_changes(self, dataset, 
                                start_idx: int = 0,
-                               end_idx: int = None) -> List[Dict]:
+                               end_idx: int = None,
+                               verbose: bool = True) -> List[Dict]:
         """
         检测数据集中所有的夹爪状态变化
         
@@ -45,6 +295,7 @@ class GripperStateDetector:
             dataset: LeRobot数据集
             start_idx: 开始索引
             end_idx: 结束索引（None表示到末尾）
+            verbose: 是否打印进度
             
         Returns:
             关键帧信息列表，每项包含：
@@ -64,10 +315,11 @@ class GripperStateDetector:
         prev_gripper = None
         prev_idx = start_idx - 1
         
-        print(f"🔍 开始检测夹爪状态变化 ({start_idx} - {end_idx})...")
+        if verbose:
+            print(f"🔍 开始检测夹爪状态变化 ({start_idx} - {end_idx})...")
         
         for i in range(start_idx, min(end_idx, len(dataset))):
-            if i % 1000 == 0:
+            if verbose and i % 1000 == 0:
                 print(f"  进度: {i}/{end_idx}")
             
             try:
@@ -103,6 +355,291 @@ class GripperStateDetector:
                 print(f"⚠️  处理索引 {i} 时出错: {e}")
                 continue
         
+        if verbose:
+            print(f"✓ 检测完成，找到 {len(changes)} 个夹爪状态变化")
+        return changes
+    
+    def detect_gripper_changes_parallel(self, dataset,
+                                        start_idx: int = 0,
+                                        end_idx: int = None,
+                                        num_workers: Optional[int] = None,
+                                        episode_table: Optional[EpisodeTable] = None) -> List[Dict]:
+        """
+        多进程逐帧检测：按episode边界把索引区间切分为多个分片，
+        每个分片在进程池中独立检测，最后按全局索引顺序合并
+        
+        每个分片从起点之前最后一个能读取的帧开始检测（作为 prev_gripper，读取失败的帧向前跳过），
+        因此跨分片（跨episode）的状态变化与串行检测完全一致。
+        
+        Args:
+            dataset: LeRobot数据集
+            start_idx: 开始索引
+            end_idx: 结束索引（None表示到末尾）
+            num_workers: 进程数（None表示CPU核数）
+            episode_table: episode偏移表（None则自动构建）
+            
+        Returns:
+            与 detect_gripper_changes 相同的关键帧信息列表
+        """
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        
+        end_idx = len(dataset) if end_idx is None else min(end_idx, len(dataset))
+        num_workers = num_workers or os.cpu_count() or 1
+        
+        if num_workers <= 1 or end_idx - start_idx < 2:
+            return self.detect_gripper_changes(dataset, start_idx, end_idx)
+        
+        if episode_table is None:
+            episode_table = EpisodeTable.from_dataset(dataset)
+        
+        # 分片数多于进程数，平衡不同长度episode带来的负载差异
+        shards = split_into_shards(start_idx, end_idx, num_workers * 4, episode_table)
+        
+        print(f"🔍 开始并行检测夹爪状态变化 ({start_idx} - {end_idx})，"
+              f"{len(shards)} 个分片 / {num_workers} 进程...")
+        
+        tasks = [
+            (self.threshold, shard_start, shard_end, start_idx)
+            for shard_start, shard_end in shards
+        ]
+        
+        # fork时子进程直接继承数据集，避免序列化
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        
+        changes = []
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=context,
+                                 initializer=_init_shard_worker, initargs=(dataset,)) as executor:
+            for done, shard_changes in enumerate(executor.map(_detect_shard_worker, tasks), 1):
+                changes.extend(shard_changes)
+                if done % max(1, len(tasks) // 10) == 0:
+                    print(f"  进度: {done}/{len(tasks)} 分片")
+        
+        print(f"✓ 检测完成，找到 {len(changes)} 个夹爪状态变化")
+        return changes
+    
+    def detect_gripper_changes_coarse(self, dataset,
+                                      start_idx: int = 0,
+                                      end_idx: int = None,
+                                      stride: int = 16,
+                                      episode_table: Optional[EpisodeTable] = None,
+                                      verbose: bool = True) -> List[Dict]:
+        """
+        由粗到细的逐帧检测：先在每个episode内每隔 stride 帧采样一次夹爪信号，
+        只在相邻采样值不同的区间内二分查找精确的变化帧
+        
+        适用于无法构建列式缓存的数据源（例如视频存储的数据集）。夹爪指令在很长的区间内
+        保持常值，读取的帧数约为 N/stride + 变化数×log2(stride)。
+        
+        当每段常值区间都不短于 stride 帧时，结果与 detect_gripper_changes 完全一致；
+        短于 stride 且首尾值相同的抖动（例如 -1→1→-1）会被漏检。episode首帧和末帧
+        总会被采样，因此跨episode的变化与逐帧检测一致。
+        
+        Args:
+            dataset: LeRobot数据集
+            start_idx: 开始索引
+            end_idx: 结束索引（None表示到末尾）
+            stride: 粗扫描的采样间隔（1 等价于逐帧检测）
+            episode_table: episode偏移表（None则自动构建；采样网格对齐到episode起点）
+            verbose: 是否打印进度
+        
+        Returns:
+            与 detect_gripper_changes 相同的关键帧信息列表
+        """
+        end_idx = len(dataset) if end_idx is None else min(end_idx, len(dataset))
+        if end_idx - start_idx < 2:
+            return []
+        stride = max(1, int(stride))
+        
+        if episode_table is None:
+            episode_table = EpisodeTable.from_dataset(dataset)
+        
+        # 粗扫描采样点：各episode内从episode起点开始每隔stride帧一个，加上区间/episode的首末帧
+        points = [np.array([start_idx, end_idx - 1], dtype=np.int64)]
+        if episode_table is not None and len(episode_table) > 0:
+            for ep_start, ep_end in zip(episode_table.starts.tolist(), episode_table.ends.tolist()):
+                lo, hi = max(ep_start, start_idx), min(ep_end, end_idx)
+                if lo >= hi:
+                    continue
+                first = ep_start + -(-(lo - ep_start) // stride) * stride
+                points += [np.arange(first, hi, stride, dtype=np.int64), np.array([lo, hi - 1], dtype=np.int64)]
+        else:
+            points.append(np.arange(start_idx, end_idx, stride, dtype=np.int64))
+        points = np.unique(np.concatenate(points)).tolist()
+        
+        if verbose:
+            print(f"🔍 开始粗到细检测夹爪状态变化 ({start_idx} - {end_idx})，"
+                  f"采样间隔 {stride}，{len(points)} 个采样点...")
+        
+        values = {}  # 全局索引 -> 夹爪状态（读取失败为None）
+        infos = {}   # 全局索引 -> 关键帧所需的元信息
+        
+        def read(i):
+            if i not in values:
+                try:
+                    item = dataset[i]
+                    values[i] = self.extract_gripper_state(item['action'])
+                    infos[i] = {key: item.get(key, default) for key, default in
+                                [('episode_index', -1), ('frame_index', -1), ('task', 'unknown'), ('task_index', -1)]}
+                except Exception as e:
+                    print(f"⚠️  处理索引 {i} 时出错: {e}")
+                    values[i] = None
+            return values[i]
+        
+        changes = []
+        stack = list(zip(points[:-1], points[1:]))[::-1]
+        while stack:
+            a, b = stack.pop()
+            prev_gripper, curr_gripper = read(a), read(b)
+            
+            if prev_gripper is None or curr_gripper is None:
+                # 读取失败：该区间退回逐帧检测
+                fallback = self.detect_gripper_changes(dataset, a, b + 1, verbose=False)
+                changes.extend(c for c in fallback if c['index'] > a)
+                continue
+            if prev_gripper == curr_gripper:
+                continue
+            
+            if b - a > 1:
+                # 区间内存在变化：二分，只继续检查两端值不同的一半
+                mid = (a + b) // 2
+                stack += [(mid, b), (a, mid)]
+                continue
+            
+            if abs(curr_gripper - prev_gripper) > self.threshold:
+                if prev_gripper < 0 and curr_gripper > 0:
+                    action_type = 'pick'
+                elif prev_gripper > 0 and curr_gripper < 0:
+                    action_type = 'place'
+                else:
+                    action_type = 'unknown'
+                
+                changes.append({
+                    'index': b,
+                    'prev_gripper': round(prev_gripper, 4),
+                    'curr_gripper': round(curr_gripper, 4),
+                    'action_type': action_type,
+                    **infos[b]
+                })
+        
+        changes.sort(key=lambda c: c['index'])
+        
+        if verbose:
+            print(f"✓ 检测完成，找到 {len(changes)} 个夹爪状态变化"
+                  f"（读取 {len(values)}/{end_idx - start_idx} 帧）")
+        return changes
+    
+    def changes_from_arrays(self,
+                            gripper: np.ndarray,
+                            start_idx: int = 0,
+                            episode_index: Optional[np.ndarray] = None,
+                            frame_index: Optional[np.ndarray] = None,
+                            task_index: Optional[np.ndarray] = None,
+                            task_lookup: Optional[Dict[int, str]] = None) -> List[Dict]:
+        """
+        在夹爪信号数组上一次性（向量化）找出所有状态变化
+        
+        判定规则与 detect_gripper_changes 完全一致：相邻两帧差值超过阈值即为变化，
+        并按符号判断 pick/place。
+        
+        Args:
+            gripper: 夹爪信号 [N]，对应全局索引 start_idx ~ start_idx+N-1
+            start_idx: gripper[0] 对应的全局索引
+            episode_index / frame_index / task_index: 与gripper对齐的列（可选）
+            task_lookup: task_index -> 任务描述
+            
+        Returns:
+            与 detect_gripper_changes 相同结构的关键帧信息列表
+        """
+        gripper = np.asarray(gripper, dtype=np.float64)
+        task_lookup = task_lookup or {}
+        
+        if len(gripper) < 2:
+            return []
+        
+        # 一次 diff 找出所有变化位置（local为数组内位置）
+        local = np.flatnonzero(np.abs(np.diff(gripper)) > self.threshold) + 1
+        prev_values = gripper[local - 1]
+        curr_values = gripper[local]
+        
+        is_pick = (prev_values < 0) & (curr_values > 0)
+        is_place = (prev_values > 0) & (curr_values < 0)
+        
+        def column_values(column):
+            if column is None:
+                return np.full(len(local), -1, dtype=np.int64)
+            return np.asarray(column)[local].astype(np.int64)
+        
+        episodes = column_values(episode_index)
+        frames = column_values(frame_index)
+        task_indices = column_values(task_index)
+        
+        changes = []
+        for k, pos in enumerate(local):
+            if is_pick[k]:
+                action_type = 'pick'
+            elif is_place[k]:
+                action_type = 'place'
+            else:
+                action_type = 'unknown'
+            
+            task_idx = int(task_indices[k])
+            changes.append({
+                'index': int(start_idx + pos),
+                'prev_gripper': round(float(prev_values[k]), 4),
+                'curr_gripper': round(float(curr_values[k]), 4),
+                'action_type': action_type,
+                'episode_index': int(episodes[k]),
+                'frame_index': int(frames[k]),
+                'task': task_lookup.get(task_idx, 'unknown'),
+                'task_index': task_idx
+            })
+        
+        return changes
+    
+    def detect_gripper_changes_columnar(self, dataset,
+                                        start_idx: int = 0,
+                                        end_idx: int = None,
+                                        columns: Optional[Dict[str, np.ndarray]] = None) -> List[Dict]:
+        """
+        列式检测夹爪状态变化：只读取 action/episode_index/frame_index/task_index 列，
+        不解码任何图像，并用一次 numpy diff 找出所有变化
+        
+        Args:
+            dataset: LeRobot数据集
+            start_idx: 开始索引
+            end_idx: 结束索引（None表示到末尾）
+            columns: 已读取的低维列（None则自动读取）
+            
+        Returns:
+            与 detect_gripper_changes 相同结构的关键帧信息列表
+        """
+        if columns is None:
+            columns = load_low_dim_columns(dataset)
+        
+        if columns is None or 'action' not in columns:
+            print("⚠️  无法读取低维列，回退到逐帧检测")
+            return self.detect_gripper_changes(dataset, start_idx, end_idx)
+        
+        total = len(columns['action'])
+        end_idx = total if end_idx is None else min(end_idx, total)
+        
+        print(f"🔍 开始列式检测夹爪状态变化 ({start_idx} - {end_idx})...")
+        
+        def window(name):
+            column = columns.get(name)
+            return None if column is None else column[start_idx:end_idx]
+        
+        changes = self.changes_from_arrays(
+            columns['action'][start_idx:end_idx, -1],
+            start_idx=start_idx,
+            episode_index=window('episode_index'),
+            frame_index=window('frame_index'),
+            task_index=window('task_index'),
+            task_lookup=build_task_lookup(dataset)
+        )
+        
         print(f"✓ 检测完成，找到 {len(changes)} 个夹爪状态变化")
         return changes
     
@@ -110,19 +647,54 @@ class GripperStateDetector:
                             dataset,
                             changes: List[Dict],
                             before_frames: int = 30,
-                            after_frames: int = 30) -> List[Dict]:
+                            after_frames: int = 30,
+                            episode_table: Optional[EpisodeTable] = None) -> List[Dict]:
         """
         从关键帧提取前后各N帧的范围
         
+        使用episode偏移表一次性向量化计算所有范围（不解码任何帧）；
+        无法构建偏移表时回退到逐帧查找episode边界。
+        
         Args:
             dataset: LeRobot数据集
             changes: 关键帧信息列表
             before_frames: 关键帧前取的帧数
             after_frames: 关键帧后取的帧数
+            episode_table: episode偏移表（None则自动构建）
             
         Returns:
             帧范围列表
         """
+        if not changes:
+            return []
+        
+        if episode_table is None:
+            episode_table = EpisodeTable.from_dataset(dataset)
+        
+        if episode_table is None:
+            print("⚠️  无法构建episode偏移表，回退到逐帧查找episode边界")
+            return self._extract_frame_ranges_by_lookup(dataset, changes, before_frames, after_frames)
+        
+        keyframes = np.array([int(c['index']) for c in changes], dtype=np.int64)
+        episode_starts, episode_ends = episode_table.bounds(keyframes)
+        
+        # 起点不能早于episode开始，终点不能晚于episode结束
+        range_starts = np.maximum(episode_starts, keyframes - before_frames)
+        range_ends = np.minimum(episode_ends, keyframes + 1 + after_frames)
+        
+        return [
+            make_frame_range(change, start_idx, end_idx)
+            for change, start_idx, end_idx in zip(changes, range_starts.tolist(), range_ends.tolist())
+        ]
+    
+    def _extract_frame_ranges_by_lookup(self,
+                                        dataset,
+                                        changes: List[Dict],
+                                        before_frames: int = 30,
+                                        after_frames: int = 30) -> List[Dict]:
+        """
+        逐帧读取 episode_index 查找边界（无法构建episode偏移表时使用）
+        """
         ranges = []
         
         for change in changes:
@@ -178,6 +750,8 @@ class GripperStateDetector:
         """
         合并相邻的帧范围（如果间隔过小）
         
+        使用区间索引排序+扫描合并，输入无需有序（例如并行分片的结果）
+        
         Args:
             ranges: 帧范围列表
             min_gap: 最小间隔阈值
@@ -188,26 +762,525 @@ class GripperStateDetector:
         if not ranges:
             return ranges
         
-        merged = []
-        current_range = ranges[0].copy()
-        
-        for next_range in ranges[1:]:
-            # 检查是否是同一episode且间隔较小
-            if (current_range['episode_index'] == next_range['episode_index'] and
-                next_range['frame_start'] - current_range['frame_end'] < min_gap):
-                # 合并范围
-                current_range['frame_end'] = max(
-                    current_range['frame_end'], 
-                    next_range['frame_end']
-                )
-                current_range['num_frames'] = current_range['frame_end'] - current_range['frame_start']
+        return FrameIntervalIndex(ranges).merge(min_gap)
+
+
+class StreamingGripperDetector:
+    """
+    推送式（增量）夹爪检测器：录制过程中逐帧或小批量推送动作，
+    实时产出关键帧，并在关键帧后 after_frames 帧到达（或episode结束）时产出完整帧范围
+    
+    判定规则与 GripperStateDetector 一致，按录制顺序推送全部帧时，产出的关键帧和
+    帧范围与离线的 detect_gripper_changes + extract_frame_ranges 完全相同。
+    每个episode只保留常数大小的状态（起点、上一帧夹爪值和尚未完成的关键帧窗口）。
+    """
+    
+    def __init__(self,
+                 threshold: float = 0.5,
+                 before_frames: int = 30,
+                 after_frames: int = 30,
+                 start_index: int = 0):
+        """
+        初始化流式检测器
+        
+        Args:
+            threshold: 状态变化的阈值
+            before_frames: 关键帧前取的帧数
+            after_frames: 关键帧后取的帧数
+            start_index: 第一帧的全局索引
+        """
+        self.detector = GripperStateDetector(threshold=threshold)
+        self.before_frames = before_frames
+        self.after_frames = after_frames
+        self.next_index = start_index
+        
+        self._prev_gripper = None
+        self._episode_index = None
+        self._episode_start = start_index
+        self._task = 'unknown'
+        self._task_index = -1
+        self._pending = []  # 等待 after_frames 的关键帧（按索引递增）
+    
+    def push(self, action, episode_index: int,
+             task: str = 'unknown', task_index: int = -1) -> Tuple[List[Dict], List[Dict]]:
+        """
+        推送一帧
+        
+        Args:
+            action: 动作向量 [x, y, z, α, β, γ, gripper]
+            episode_index: 该帧所属的episode
+            task: 任务描述
+            task_index: 任务索引
+            
+        Returns:
+            (new_changes, completed_ranges) - 新检测到的关键帧和已完成的帧范围
+        """
+        gripper = self.detector.extract_gripper_state(action)
+        return self.push_batch(np.array([gripper]), episode_index, task, task_index)
+    
+    def push_batch(self, actions, episode_index: int,
+                   task: str = 'unknown', task_index: int = -1) -> Tuple[List[Dict], List[Dict]]:
+        """
+        推送同一episode的一小批帧
+        
+        Args:
+            actions: 动作数组 [T, 7]，或夹爪信号 [T]
+            episode_index: 这批帧所属的episode（与上一批不同时自动结束上一个episode）
+            task: 任务描述
+            task_index: 任务索引
+            
+        Returns:
+            (new_changes, completed_ranges)
+        """
+        if isinstance(actions, torch.Tensor):
+            actions = actions.detach().cpu().numpy()
+        gripper = np.asarray(actions, dtype=np.float64)
+        if gripper.ndim == 2:
+            gripper = gripper[:, -1]
+        
+        completed = []
+        if episode_index != self._episode_index:
+            completed.extend(self.end_episode())
+            self._episode_index = episode_index
+            self._episode_start = self.next_index
+            self._task = task
+            self._task_index = task_index
+        
+        if len(gripper) == 0:
+            return [], completed
+        
+        # 拼接上一帧（可能来自上一个episode，与离线检测一致），使批次边界上的变化也能被检测到
+        start = self.next_index
+        if self._prev_gripper is not None:
+            signal = np.concatenate([[self._prev_gripper], gripper])
+            offset = start - 1
+        else:
+            signal = gripper
+            offset = start
+        
+        positions = np.arange(offset, start + len(gripper))
+        changes = self.detector.changes_from_arrays(
+            signal,
+            start_idx=offset,
+            episode_index=np.full(len(signal), episode_index, dtype=np.int64),
+            frame_index=positions - self._episode_start,
+            task_index=np.full(len(signal), self._task_index, dtype=np.int64),
+            task_lookup={self._task_index: self._task}
+        )
+        
+        self.next_index += len(gripper)
+        self._prev_gripper = float(gripper[-1])
+        self._pending.extend(changes)
+        
+        completed.extend(self._pop_completed(episode_end=None))
+        return changes, completed
+    
+    def end_episode(self) -> List[Dict]:
+        """
+        结束当前episode：剩余关键帧的窗口截断到episode末尾
+        
+        Returns:
+            已完成的帧范围
+        """
+        if self._episode_index is None:
+            return []
+        return self._pop_completed(episode_end=self.next_index)
+    
+    def _pop_completed(self, episode_end: Optional[int]) -> List[Dict]:
+        """取出窗口已完整（或episode已结束）的关键帧，生成帧范围"""
+        completed = []
+        while self._pending:
+            change = self._pending[0]
+            keyframe_idx = change['index']
+            window_end = keyframe_idx + 1 + self.after_frames
+            
+            if episode_end is None:
+                if window_end > self.next_index:
+                    break
+                end_idx = window_end
             else:
-                # 保存当前范围，开始新的
-                merged.append(current_range)
-                current_range = next_range.copy()
+                end_idx = min(window_end, episode_end)
+            
+            start_idx = max(self._episode_start, keyframe_idx - self.before_frames)
+            completed.append(make_frame_range(change, start_idx, end_idx))
+            self._pending.pop(0)
+        
+        return completed
+
+
+def _frame_episode_bounds(episode_index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """每一帧所在episode的 [start, end)（数组内位置）"""
+    table = EpisodeTable.from_episode_column(episode_index)
+    lengths = table.ends - table.starts
+    return np.repeat(table.starts, lengths), np.repeat(table.ends, lengths)
+
+
+def _causal_window_mean(values: np.ndarray, window: int, frame_starts: np.ndarray) -> np.ndarray:
+    """因果滑动平均：第t帧取 [max(episode起点, t-window+1), t] 的均值，不跨episode"""
+    if window <= 1:
+        return values.astype(np.float64)
+    cumsum = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+    positions = np.arange(len(values))
+    lows = np.maximum(frame_starts, positions - window + 1)
+    return (cumsum[positions + 1] - cumsum[lows]) / (positions + 1 - lows)
+
+
+def _forward_window_all(mask: np.ndarray, window: int, frame_ends: np.ndarray) -> np.ndarray:
+    """第t帧起（含）的 window 帧是否全部满足mask，且都在同一episode内"""
+    cumsum = np.concatenate([[0], np.cumsum(mask, dtype=np.int64)])
+    positions = np.arange(len(mask))
+    highs = positions + window
+    return (highs <= frame_ends) & (cumsum[np.minimum(highs, len(mask))] - cumsum[positions] == window)
+
+
+def _forward_fill_labels(labels: np.ndarray, frame_starts: np.ndarray) -> np.ndarray:
+    """把 -1（未定）向后填充为episode内最近一次确定的标签（滞回比较）"""
+    positions = np.arange(len(labels))
+    known = np.where(labels >= 0, positions, -1)
+    last_known = np.maximum.accumulate(known)
+    # 不允许跨episode继承
+    last_known = np.where(last_known >= frame_starts, last_known, -1)
+    return np.where(last_known >= 0, labels[np.maximum(last_known, 0)], -1)
+
+
+class EventRule(ABC):
+    """
+    事件规则基类：在整段（多个episode拼接的）信号数组上向量化地求出事件位置
+    """
+    
+    name = 'event'
+    required_columns: List[str] = []
+    
+    @abstractmethod
+    def detect(self, columns: Dict[str, np.ndarray],
+               frame_starts: np.ndarray,
+               frame_ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Args:
+            columns: {列名: 数组}，均已切片到待检测区间
+            frame_starts / frame_ends: 每一帧所在episode的 [start, end)（数组内位置）
+            
+        Returns:
+            (positions, action_types, prev_values, curr_values) - 事件位置（数组内）、
+            类型和事件前后的信号值
+        """
+
+
+class ActionGripperFlipRule(EventRule):
+    """
+    动作夹爪指令翻转：与 GripperStateDetector 相同的判定（相邻帧差值超过阈值）
+    """
+    
+    name = 'action_flip'
+    required_columns = ['action']
+    
+    def __init__(self, threshold: float = 0.5, cross_episodes: bool = True):
+        """
+        Args:
+            threshold: 状态变化的阈值
+            cross_episodes: 是否与上一个episode的最后一帧比较（与逐帧检测一致）
+        """
+        self.threshold = threshold
+        self.cross_episodes = cross_episodes
+    
+    def detect(self, columns, frame_starts, frame_ends):
+        gripper = np.asarray(columns['action'][:, -1], dtype=np.float64)
+        positions = np.flatnonzero(np.abs(np.diff(gripper)) > self.threshold) + 1
+        if not self.cross_episodes:
+            positions = positions[frame_starts[positions] != positions]
+        
+        prev_values = gripper[positions - 1]
+        curr_values = gripper[positions]
+        action_types = np.where((prev_values < 0) & (curr_values > 0), 'pick',
+                                np.where((prev_values > 0) & (curr_values < 0), 'place', 'unknown'))
+        return positions, action_types, prev_values, curr_values
+
+
+class GripperWidthRule(EventRule):
+    """
+    夹爪开合宽度：由 observation.state 中两个手指的位置计算宽度，
+    平滑后用滞回阈值判定开/合，开→合为 pick，合→开为 place
+    """
+    
+    name = 'gripper_width'
+    required_columns = ['observation.state']
+    
+    def __init__(self,
+                 close_width: float = 0.06,
+                 open_width: float = 0.07,
+                 finger_dims: Tuple[int, int] = (-2, -1),
+                 smooth_window: int = 3):
+        """
+        Args:
+            close_width: 宽度低于该值视为闭合（默认值适用于LIBERO Panda夹爪）
+            open_width: 宽度高于该值视为张开（与close_width之间为滞回区）
+            finger_dims: 两个手指位置在state中的维度
+            smooth_window: 平滑窗口（帧）
+        """
+        self.close_width = close_width
+        self.open_width = open_width
+        self.finger_dims = finger_dims
+        self.smooth_window = smooth_window
+    
+    def detect(self, columns, frame_starts, frame_ends):
+        state = np.asarray(columns['observation.state'], dtype=np.float64)
+        width = np.abs(state[:, self.finger_dims[0]]) + np.abs(state[:, self.finger_dims[1]])
+        width = _causal_window_mean(width, self.smooth_window, frame_starts)
+        
+        # 1: 闭合, 0: 张开, -1: 滞回区（沿用之前的状态）
+        labels = np.where(width < self.close_width, 1, np.where(width > self.open_width, 0, -1))
+        labels = _forward_fill_labels(labels, frame_starts)
+        
+        positions = np.arange(1, len(labels))
+        changed = ((labels[1:] != labels[:-1]) & (labels[1:] >= 0) & (labels[:-1] >= 0)
+                   & (frame_starts[1:] != positions))
+        positions = positions[changed]
+        
+        action_types = np.where(labels[positions] == 1, 'pick', 'place')
+        return positions, action_types, width[positions - 1], width[positions]
+
+
+class ContactOnsetRule(EventRule):
+    """
+    基于末端速度的接触起始：末端从运动状态减速到静止并保持若干帧的时刻
+    """
+    
+    name = 'contact_onset'
+    required_columns = ['observation.state']
+    
+    def __init__(self,
+                 speed_threshold: float = 0.002,
+                 min_still_frames: int = 3,
+                 position_dims: Tuple[int, int] = (0, 3),
+                 smooth_window: int = 3):
+        """
+        Args:
+            speed_threshold: 每帧末端位移低于该值视为静止
+            min_still_frames: 静止至少持续的帧数
+            position_dims: 末端位置在state中的维度区间 [start, end)
+            smooth_window: 速度平滑窗口（帧）
+        """
+        self.speed_threshold = speed_threshold
+        self.min_still_frames = min_still_frames
+        self.position_dims = position_dims
+        self.smooth_window = smooth_window
+    
+    def detect(self, columns, frame_starts, frame_ends):
+        state = np.asarray(columns['observation.state'], dtype=np.float64)
+        position = state[:, self.position_dims[0]:self.position_dims[1]]
+        
+        speed = np.zeros(len(state))
+        if len(state) > 1:
+            speed[1:] = np.linalg.norm(np.diff(position, axis=0), axis=1)
+        # episode首帧没有有效速度
+        speed[frame_starts == np.arange(len(state))] = 0.0
+        speed = _causal_window_mean(speed, self.smooth_window, frame_starts)
+        
+        still = speed < self.speed_threshold
+        settled = _forward_window_all(still, self.min_still_frames, frame_ends)
+        
+        positions = np.arange(1, len(state))
+        onset = settled[1:] & ~still[:-1] & (frame_starts[1:] != positions)
+        positions = positions[onset]
+        
+        action_types = np.full(len(positions), 'contact')
+        return positions, action_types, speed[positions - 1], speed[positions]
+
+
+# 可通过名字选择的事件规则
+EVENT_RULES = {
+    ActionGripperFlipRule.name: ActionGripperFlipRule,
+    GripperWidthRule.name: GripperWidthRule,
+    ContactOnsetRule.name: ContactOnsetRule,
+}
+
+
+class MultiSignalEventDetector:
+    """
+    向量化多信号事件检测引擎：对整段episode数组一次性评估多个事件规则，
+    输出与 GripperStateDetector 相同结构的关键帧列表（可直接用于 extract_frame_ranges）
+    """
+    
+    def __init__(self, rules: Optional[List[EventRule]] = None, min_separation: int = 0):
+        """
+        Args:
+            rules: 事件规则列表（默认只有动作夹爪翻转）
+            min_separation: 同一episode内不同规则的事件间隔小于该值时只保留时间上靠前的事件
+        """
+        self.rules = rules if rules is not None else [ActionGripperFlipRule()]
+        self.min_separation = min_separation
+    
+    @classmethod
+    def from_names(cls, names: List[str], threshold: float = 0.5, min_separation: int = 0):
+        """按名字构建规则（见 EVENT_RULES）"""
+        rules = []
+        for name in names:
+            if name not in EVENT_RULES:
+                raise ValueError(f"Unknown event rule: {name}. Use one of {list(EVENT_RULES)}")
+            rules.append(ActionGripperFlipRule(threshold) if name == ActionGripperFlipRule.name
+                         else EVENT_RULES[name]())
+        return cls(rules, min_separation=min_separation)
+    
+    @property
+    def required_columns(self) -> List[str]:
+        columns = list(LOW_DIM_COLUMNS)
+        for rule in self.rules:
+            columns += [c for c in rule.required_columns if c not in columns]
+        return columns
+    
+    def detect(self, columns: Dict[str, np.ndarray],
+               start_idx: int = 0,
+               end_idx: Optional[int] = None,
+               task_lookup: Optional[Dict[int, str]] = None) -> List[Dict]:
+        """
+        在已读取的列上检测所有规则的事件
+        
+        Args:
+            columns: {列名: 数组}（行号为全局索引）
+            start_idx: 开始索引
+            end_idx: 结束索引（None表示到末尾）
+            task_lookup: task_index -> 任务描述
+            
+        Returns:
+            关键帧信息列表（按索引排序，额外包含 'source' 规则名）
+        """
+        task_lookup = task_lookup or {}
+        total = len(next(iter(columns.values())))
+        end_idx = total if end_idx is None else min(end_idx, total)
+        window = {name: column[start_idx:end_idx] for name, column in columns.items()}
+        num_frames = end_idx - start_idx
+        
+        def int_column(name):
+            column = window.get(name)
+            return np.full(num_frames, -1, dtype=np.int64) if column is None else np.asarray(column, dtype=np.int64)
+        
+        episodes = int_column('episode_index')
+        frames = int_column('frame_index')
+        task_indices = int_column('task_index')
+        frame_starts, frame_ends = _frame_episode_bounds(episodes)
         
-        merged.append(current_range)
-        return merged
+        events = []
+        for priority, rule in enumerate(self.rules):
+            missing = [c for c in rule.required_columns if c not in window]
+            if missing:
+                print(f"⚠️  事件规则 {rule.name} 缺少列 {missing}，跳过")
+                continue
+            positions, action_types, prev_values, curr_values = rule.detect(window, frame_starts, frame_ends)
+            for k in range(len(positions)):
+                events.append((int(positions[k]), priority, rule.name, str(action_types[k]),
+                               float(prev_values[k]), float(curr_values[k])))
+        
+        events.sort()
+        
+        changes = []
+        last_kept = {}  # episode -> (位置, 规则优先级)
+        for pos, priority, source, action_type, prev_value, curr_value in events:
+            episode = int(episodes[pos])
+            if self.min_separation > 0 and episode in last_kept:
+                last_pos, last_priority = last_kept[episode]
+                if pos - last_pos < self.min_separation and priority != last_priority:
+                    continue
+            last_kept[episode] = (pos, priority)
+            
+            task_idx = int(task_indices[pos])
+            changes.append({
+                'index': start_idx + pos,
+                'prev_gripper': round(prev_value, 4),
+                'curr_gripper': round(curr_value, 4),
+                'action_type': action_type,
+                'episode_index': episode,
+                'frame_index': int(frames[pos]),
+                'task': task_lookup.get(task_idx, 'unknown'),
+                'task_index': task_idx,
+                'source': source
+            })
+        
+        return changes
+    
+    def detect_dataset(self, dataset,
+                       start_idx: int = 0,
+                       end_idx: Optional[int] = None,
+                       columns: Optional[Dict[str, np.ndarray]] = None) -> List[Dict]:
+        """读取所需的低维列（不解码图像）并检测事件"""
+        if columns is None:
+            columns = load_low_dim_columns(dataset, self.required_columns)
+        if columns is None:
+            raise RuntimeError("无法读取低维列，事件检测需要Parquet/hf_dataset中的低维数据")
+        
+        print(f"🔍 开始多信号事件检测 ({start_idx} - {end_idx})，规则: {[r.name for r in self.rules]}...")
+        changes = self.detect(columns, start_idx, end_idx, build_task_lookup(dataset))
+        print(f"✓ 检测完成，找到 {len(changes)} 个事件")
+        return changes
+
+
+def split_into_shards(start_idx: int,
+                      end_idx: int,
+                      num_shards: int,
+                      episode_table: Optional[EpisodeTable] = None) -> List[Tuple[int, int]]:
+    """
+    将 [start_idx, end_idx) 切分为帧数大致相等的分片，切分点对齐到episode起点
+    
+    Args:
+        start_idx: 开始索引
+        end_idx: 结束索引
+        num_shards: 目标分片数
+        episode_table: episode偏移表（None则按帧数均分）
+        
+    Returns:
+        [(shard_start, shard_end), ...]，按全局索引排序且首尾相接
+    """
+    if end_idx <= start_idx:
+        return []
+    
+    num_shards = max(1, min(num_shards, end_idx - start_idx))
+    targets = start_idx + (end_idx - start_idx) * np.arange(1, num_shards) // num_shards
+    
+    if episode_table is not None and len(episode_table) > 0:
+        # 可选的切分点：区间内部的episode起点；取离均分目标最近的那个
+        candidates = episode_table.starts[(episode_table.starts > start_idx) &
+                                          (episode_table.starts < end_idx)]
+        if len(candidates) > 0:
+            positions = np.clip(np.searchsorted(candidates, targets), 1, len(candidates)) - 1
+            nearest_right = candidates[np.minimum(positions + 1, len(candidates) - 1)]
+            nearest_left = candidates[positions]
+            targets = np.where(np.abs(nearest_right - targets) < np.abs(targets - nearest_left),
+                               nearest_right, nearest_left)
+        else:
+            targets = np.zeros(0, dtype=np.int64)
+    
+    cuts = [start_idx] + sorted(set(int(t) for t in targets if start_idx < t < end_idx)) + [end_idx]
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+# 进程池worker使用的数据集（由initializer设置；fork时直接继承父进程对象）
+_SHARD_DATASET = None
+
+
+def _init_shard_worker(dataset):
+    global _SHARD_DATASET
+    _SHARD_DATASET = dataset
+
+
+def _detect_shard_worker(task: Tuple[float, int, int, int]) -> List[Dict]:
+    """
+    检测单个分片：从分片起点之前最后一个能读取的帧（不早于 scan_start）开始读取，只保留分片内的变化
+    
+    串行检测跳过读取失败的帧，与之前最后一个正常帧比较；这里同样向前找到该帧作为 prev_gripper。
+    """
+    threshold, shard_start, shard_end, scan_start = task
+    detector = GripperStateDetector(threshold=threshold)
+    
+    read_start = shard_start
+    for i in range(shard_start - 1, scan_start - 1, -1):
+        try:
+            detector.extract_gripper_state(_SHARD_DATASET[i]['action'])
+        except Exception:
+            continue
+        read_start = i
+        break
+    
+    changes = detector.detect_gripper_changes(_SHARD_DATASET, read_start, shard_end, verbose=False)
+    return [c for c in changes if c['index'] >= shard_start]
 
 
 def analyze_gripper_changes(dataset, 
@@ -216,7 +1289,13 @@ def analyze_gripper_changes(dataset,
                            before_frames: int = 30,
                            after_frames: int = 30,
                            merge: bool = False,
-                           min_gap: int = 50
+                           min_gap: int = 50,
+                           method: str = 'columnar',
+                           num_workers: int = 1,
+                           threshold: float = 0.5,
+                           cache_path: Optional[str] = None,
+                           event_rules: Optional[List[str]] = None,
+                           coarse_stride: int = 16
                            ) -> Tuple[List[Dict], List[Dict]]:
     """
     分析和提取夹爪状态变化
@@ -229,17 +1308,73 @@ def analyze_gripper_changes(dataset,
         after_frames: 关键帧后取的帧数
         merge: 是否合并相邻范围
         min_gap: 合并的最小间隔阈值
+        method: 检测方式 'columnar'（只读低维列，推荐）、'frame'（逐帧读取）、
+                'coarse'（粗采样+二分，无法列式读取时减少逐帧读取）或 'events'（多信号事件引擎）
+        num_workers: 逐帧检测的进程数（>1时按episode分片并行；只对 method='frame' 生效，
+                     其他方式忽略并给出警告）
+        threshold: 夹爪状态变化阈值
+        cache_path: 关键帧索引缓存文件（数据集指纹和参数一致时跳过检测）
+        event_rules: method='events' 时使用的规则名（见 EVENT_RULES，默认只有 action_flip）
+        coarse_stride: method='coarse' 时的粗扫描采样间隔
         
     Returns:
         (changes, ranges) - 关键帧列表和帧范围列表
     """
-    detector = GripperStateDetector(threshold=0.5)
+    from keyframe_cache import compute_dataset_fingerprint, load_keyframe_index, save_keyframe_index
+    
+    detector = GripperStateDetector(threshold=threshold)
+    
+    if num_workers > 1 and method != 'frame':
+        print(f"⚠️  num_workers={num_workers} 只对逐帧检测(method='frame')生效，"
+              f"method='{method}' 将单进程检测")
+    
+    # 尝试加载已缓存的关键帧索引
+    changes = None
+    fingerprint = compute_dataset_fingerprint(getattr(dataset, 'root', None)) if cache_path else None
+    event_rules = list(event_rules or [ActionGripperFlipRule.name])
+    if method == 'events':
+        detector_tag = 'events:' + ','.join(event_rules)
+    elif method == 'coarse':
+        detector_tag = f'coarse:{coarse_stride}'
+    else:
+        detector_tag = 'gripper'
+    cache_args = (threshold, start_idx, end_idx, getattr(dataset, 'episodes', None), detector_tag)
+    if fingerprint is not None:
+        changes = load_keyframe_index(cache_path, fingerprint, *cache_args)
+    
+    # 检测关键帧（episode偏移表只构建一次，检测和范围提取共用）
+    cache_hit = changes is not None
+    if cache_hit:
+        episode_table = EpisodeTable.from_dataset(dataset)
+    elif method == 'columnar':
+        columns = load_low_dim_columns(dataset)
+        episode_table = EpisodeTable.from_dataset(dataset, columns=columns)
+        changes = detector.detect_gripper_changes_columnar(dataset, start_idx, end_idx, columns=columns)
+    elif method == 'frame':
+        episode_table = EpisodeTable.from_dataset(dataset)
+        if num_workers > 1:
+            changes = detector.detect_gripper_changes_parallel(dataset, start_idx, end_idx, num_workers,
+                                                               episode_table=episode_table)
+        else:
+            changes = detector.detect_gripper_changes(dataset, start_idx, end_idx)
+    elif method == 'coarse':
+        episode_table = EpisodeTable.from_dataset(dataset)
+        changes = detector.detect_gripper_changes_coarse(dataset, start_idx, end_idx, coarse_stride,
+                                                         episode_table=episode_table)
+    elif method == 'events':
+        engine = MultiSignalEventDetector.from_names(event_rules, threshold=threshold)
+        columns = load_low_dim_columns(dataset, engine.required_columns)
+        episode_table = EpisodeTable.from_dataset(dataset, columns=columns)
+        changes = engine.detect_dataset(dataset, start_idx, end_idx, columns=columns)
+    else:
+        raise ValueError(f"Unknown method: {method}. Use 'columnar', 'frame', 'coarse' or 'events'")
     
-    # 检测关键帧
-    changes = detector.detect_gripper_changes(dataset, start_idx, end_idx)
+    if fingerprint is not None and not cache_hit:
+        save_keyframe_index(cache_path, changes, fingerprint, *cache_args)
     
     # 提取帧范围
-    ranges = detector.extract_frame_ranges(dataset, changes, before_frames, after_frames)
+    ranges = detector.extract_frame_ranges(dataset, changes, before_frames, after_frames,
+                                           episode_table=episode_table)
     
     # 合并相邻范围
     if merge:
@@ -0,0 +1,180 @@
+"""
+关键帧索引持久化：按源数据集指纹缓存检测到的夹爪状态变化
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import List, Dict, Optional
+
+import numpy as np
+
+
+# 缓存格式版本（字段变化时递增，旧缓存自动失效）
+KEYFRAME_INDEX_VERSION = 3
+
+
+def compute_dataset_fingerprint(dataset_root) -> Optional[str]:
+    """
+    计算源数据集指纹：meta/info.json 内容 + 所有数据Parquet文件的路径、大小、修改时间
+    
+    Args:
+        dataset_root: 数据集根目录
+    
+    Returns:
+        sha256十六进制字符串；目录不存在时返回None
+    """
+    if dataset_root is None:
+        return None
+    root = Path(dataset_root)
+    if not root.exists():
+        return None
+    
+    digest = hashlib.sha256()
+    
+    info_file = root / 'meta' / 'info.json'
+    if info_file.exists():
+        digest.update(info_file.read_bytes())
+    
+    for data_file in sorted((root / 'data').glob('**/*.parquet')):
+        stat = data_file.stat()
+        digest.update(f"{data_file.relative_to(root)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    
+    return digest.hexdigest()
+
+
+def _cache_key(fingerprint: str, threshold: float, start_idx: int, end_idx: Optional[int],
+               episodes: Optional[List[int]] = None, detector: str = 'gripper') -> Dict:
+    """缓存键：数据集指纹 + 检测参数"""
+    return {
+        'version': KEYFRAME_INDEX_VERSION,
+        'fingerprint': fingerprint,
+        'threshold': float(threshold),
+        'start_idx': int(start_idx),
+        'end_idx': None if end_idx is None else int(end_idx),
+        'episodes': None if episodes is None else [int(e) for e in episodes],
+        'detector': detector,
+    }
+
+
+def save_keyframe_index(path,
+                        changes: List[Dict],
+                        fingerprint: str,
+                        threshold: float,
+                        start_idx: int,
+                        end_idx: Optional[int],
+                        episodes: Optional[List[int]] = None,
+                        detector: str = 'gripper') -> Path:
+    """
+    将关键帧列表保存为紧凑的 .npz 文件
+    
+    Args:
+        path: 输出文件路径
+        changes: detect_gripper_changes 返回的关键帧列表
+        fingerprint: 源数据集指纹
+        threshold: 检测阈值
+        start_idx / end_idx: 检测范围
+        episodes: 数据集加载的episode子集（None表示全部）
+        detector: 检测器标识（例如 'gripper' 或 'events:action_flip,gripper_width'）
+    
+    Returns:
+        保存的文件路径
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    def int_column(key):
+        return np.array([int(c[key]) for c in changes], dtype=np.int64)
+    
+    tasks = sorted({str(c['task']) for c in changes})
+    task_codes = {task: i for i, task in enumerate(tasks)}
+    
+    # 动作类型按文件记录字符串表（事件规则可以产生任意类型名）
+    action_types = sorted({str(c['action_type']) for c in changes})
+    action_codes = {action_type: i for i, action_type in enumerate(action_types)}
+    
+    header = _cache_key(fingerprint, threshold, start_idx, end_idx, episodes, detector)
+    
+    # 事件引擎的关键帧带有来源规则名
+    sources = sorted({c['source'] for c in changes if 'source' in c})
+    
+    # 先写临时文件再替换，避免中断时留下损坏的缓存
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            header=np.array(json.dumps(header)),
+            index=int_column('index'),
+            prev_gripper=np.array([c['prev_gripper'] for c in changes], dtype=np.float64),
+            curr_gripper=np.array([c['curr_gripper'] for c in changes], dtype=np.float64),
+            action_type=np.array([action_codes[str(c['action_type'])] for c in changes], dtype=np.int8),
+            action_types=np.array(action_types, dtype=np.str_),
+            episode_index=int_column('episode_index'),
+            frame_index=int_column('frame_index'),
+            task_index=int_column('task_index'),
+            task_code=np.array([task_codes[str(c['task'])] for c in changes], dtype=np.int32),
+            tasks=np.array(tasks, dtype=np.str_),
+            source_code=np.array([sources.index(c['source']) if 'source' in c else -1 for c in changes],
+                                 dtype=np.int32),
+            sources=np.array(sources, dtype=np.str_),
+        )
+    tmp_path.replace(path)
+    
+    print(f"💾 保存关键帧索引: {path} ({len(changes)} 个关键帧)")
+    return path
+
+
+def load_keyframe_index(path,
+                        fingerprint: str,
+                        threshold: float,
+                        start_idx: int,
+                        end_idx: Optional[int],
+                        episodes: Optional[List[int]] = None,
+                        detector: str = 'gripper') -> Optional[List[Dict]]:
+    """
+    加载关键帧索引；仅当数据集指纹和检测参数完全一致时返回结果
+    
+    Returns:
+        关键帧列表；缓存不存在、不匹配或损坏时返回None
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            if header != _cache_key(fingerprint, threshold, start_idx, end_idx, episodes, detector):
+                print(f"ℹ️  关键帧索引已过期（数据集或参数已变化）: {path}")
+                return None
+            
+            tasks = data['tasks'].tolist()
+            sources = data['sources'].tolist()
+            action_types = data['action_types'].tolist()
+            columns = {name: data[name].tolist() for name in data.files
+                       if name not in ('header', 'tasks', 'sources', 'action_types')}
+    except Exception as e:
+        print(f"⚠️  读取关键帧索引失败: {e}")
+        return None
+    
+    changes = []
+    for i in range(len(columns['index'])):
+        change = {
+            'index': columns['index'][i],
+            'prev_gripper': columns['prev_gripper'][i],
+            'curr_gripper': columns['curr_gripper'][i],
+            'action_type': action_types[columns['action_type'][i]],
+            'episode_index': columns['episode_index'][i],
+            'frame_index': columns['frame_index'][i],
+            'task': tasks[columns['task_code'][i]],
+            'task_index': columns['task_index'][i]
+        }
+        if columns['source_code'][i] >= 0:
+            change['source'] = sources[columns['source_code'][i]]
+        changes.append(change)
+    
+    print(f"⚡ 命中关键帧索引: {path} ({len(changes)} 个关键帧，跳过检测)")
+    return changes
+
+
+if __name__ == '__main__':
+    print("Keyframe Cache Module")
@@ -140,8 +140,14 @@ class LeRobotDatasetWithPlaceholder:
         for ep_idx in range(len(episodes_meta)):
             ep_meta = episodes_meta[ep_idx]
             episode_index = ep_meta['episode_index']
-            chunk_index = ep_meta['data/chunk_index']
+            # 原始 episode：传统方法的输出记录在 original_episode_index 中
+            # （数据文件按大小滚动打包，data/chunk_index 只是文件所在的chunk；旧版本输出中两者相同）
+            if 'original_episode_index' in ep_meta:
+                chunk_index = ep_meta['original_episode_index']
+            else:
+                chunk_index = ep_meta['data/chunk_index']
             file_index = ep_meta['data/file_index']
+            data_chunk_index = ep_meta['data/chunk_index']
             from_idx = ep_meta['dataset_from_index']
             to_idx = ep_meta['dataset_to_index']
             
@@ -150,6 +156,7 @@ class LeRobotDatasetWithPlaceholder:
                 'episode_index': episode_index,
                 'file_index': file_index,
                 'chunk_index': chunk_index,
+                'data_chunk_index': data_chunk_index,
                 'from_idx': from_idx,
                 'to_idx': to_idx,
                 'length': to_idx - from_idx + 1
@@ -427,7 +434,7 @@ class LeRobotDatasetWithPlaceholder:
                 print(f"    Segment {i} (episode_index={seg['episode_index']}):")
                 print(f"      原始帧范围: {seg['from_idx']}-{seg['to_idx']}")
                 print(f"      帧数: {seg['length']}")
-                print(f"      文件: data/episode_{seg['chunk_index']}/segment_{seg['file_index']}.parquet")
+                print(f"      文件: data/chunk-{seg['data_chunk_index']:03d}/file-{seg['file_index']:03d}.parquet")
             
             if info['num_placeholders'] > 0:
                 print(f"  占位符: {info['num_placeholders']} 个")
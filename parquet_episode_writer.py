@@ -0,0 +1,227 @@
+"""
+帧Parquet写出：直接由episode的整段NumPy数组构建Arrow列，流式写入 ParquetWriter
+
+输出的schema（含huggingface元信息）与 datasets.Dataset.from_dict(..., features).to_parquet 相同，
+LeRobot / datasets 可以直接读取；但不经过逐帧的Python列表、PIL图像和HF Dataset对象。
+"""
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from PIL import Image
+
+from parquet_range_reader import EncodedImage
+
+
+IMAGE_COLUMNS = ['observation.images.image', 'observation.images.image2']
+VECTOR_COLUMNS = {'observation.state': 8, 'action': 7}
+
+# 与 datasets 的 Features 序列化结果一致（Image / List(float32) / Value）
+_HF_FEATURES = {
+    'observation.images.image': {'_type': 'Image'},
+    'observation.images.image2': {'_type': 'Image'},
+    'observation.state': {'feature': {'dtype': 'float32', '_type': 'Value'}, '_type': 'List'},
+    'action': {'feature': {'dtype': 'float32', '_type': 'Value'}, '_type': 'List'},
+    'timestamp': {'dtype': 'float32', '_type': 'Value'},
+    'episode_index': {'dtype': 'int64', '_type': 'Value'},
+    'frame_index': {'dtype': 'int64', '_type': 'Value'},
+    'index': {'dtype': 'int64', '_type': 'Value'},
+    'task_index': {'dtype': 'int64', '_type': 'Value'},
+}
+
+IMAGE_TYPE = pa.struct([('bytes', pa.binary()), ('path', pa.string())])
+
+
+
+def _frame_schema(with_images: bool) -> pa.Schema:
+    fields = [(key, IMAGE_TYPE) for key in IMAGE_COLUMNS] if with_images else []
+    fields += [(key, pa.list_(pa.float32())) for key in VECTOR_COLUMNS]
+    fields += [('timestamp', pa.float32()), ('episode_index', pa.int64()), ('frame_index', pa.int64()),
+               ('index', pa.int64()), ('task_index', pa.int64())]
+    features = {name: _HF_FEATURES[name] for name, _ in fields}
+    return pa.schema(fields, metadata={'huggingface': json.dumps({'info': {'features': features}})})
+
+
+FRAME_SCHEMA = _frame_schema(with_images=True)
+# 视频模式：图像在视频文件中，数据文件只有低维列
+VIDEO_FRAME_SCHEMA = _frame_schema(with_images=False)
+
+# 每个row group的行数（与datasets写图像数据集时的默认值相同）
+ROW_GROUP_SIZE = 100
+
+# LeRobot v3 数据文件布局：data/chunk-XXX/file-YYY.parquet，每个chunk目录最多 chunks_size 个文件
+DATA_PATH = 'data/chunk-{chunk_index:03d}/file-{file_index:03d}.parquet'
+DEFAULT_DATA_FILE_SIZE_MB = 100
+DEFAULT_CHUNKS_SIZE = 1000
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """[H, W, 3] uint8 -> PNG字节（与HF Image特征编码PIL图像的结果一致）"""
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _image_array(images: Sequence[Any]) -> pa.StructArray:
+    """图像列：EncodedImage / bytes 原样写入，像素数组编码为PNG；path 为空"""
+    data = []
+    for image in images:
+        if isinstance(image, EncodedImage):
+            data.append(image.data)
+        elif isinstance(image, (bytes, bytearray, memoryview)):
+            data.append(bytes(image))
+        else:
+            data.append(encode_png(np.asarray(image)))
+    return pa.StructArray.from_arrays([pa.array(data, type=pa.binary()), pa.nulls(len(data), type=pa.string())],
+                                      fields=list(IMAGE_TYPE))
+
+
+def _vector_array(values: np.ndarray, width: int) -> pa.Array:
+    """[T, width] 数组 -> list<float32>（值缓冲区直接来自NumPy，不逐行转换）"""
+    values = np.ascontiguousarray(values, dtype=np.float32).reshape(-1, width)
+    fixed = pa.FixedSizeListArray.from_arrays(pa.array(values.ravel()), width)
+    return fixed.cast(pa.list_(pa.float32()))
+
+
+def build_frame_table(columns: Dict[str, Any], schema: pa.Schema = FRAME_SCHEMA) -> pa.Table:
+    """
+    由整段列数据构建一个episode的帧表
+    
+    Args:
+        columns: {列名: 值}；图像列为长度T的序列（EncodedImage / bytes / [H, W, 3] uint8），
+                 observation.state / action 为 [T, D] 数组，其余为长度T的一维数组
+        schema: FRAME_SCHEMA 或 VIDEO_FRAME_SCHEMA（不含图像列）
+    
+    Returns:
+        pyarrow.Table
+    """
+    arrays = []
+    for field in schema:
+        values = columns[field.name]
+        if field.name in IMAGE_COLUMNS:
+            arrays.append(_image_array(values))
+        elif field.name in VECTOR_COLUMNS:
+            arrays.append(_vector_array(values, VECTOR_COLUMNS[field.name]))
+        else:
+            arrays.append(pa.array(np.asarray(values).astype(field.type.to_pandas_dtype(), copy=False),
+                                   type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class EpisodeParquetWriter:
+    """
+    流式写出帧Parquet文件：每次写入一个episode的表，按 ROW_GROUP_SIZE 切分row group
+    
+    用法:
+        with EpisodeParquetWriter(path) as writer:
+            writer.write(build_frame_table(columns))
+    """
+    
+    def __init__(self, path, row_group_size: int = ROW_GROUP_SIZE, schema: pa.Schema = FRAME_SCHEMA):
+        self.path = Path(path)
+        self.row_group_size = row_group_size
+        self.schema = schema
+        self.num_rows = 0
+        self._writer: Optional[pq.ParquetWriter] = None
+    
+    def write(self, table: pa.Table):
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self.num_rows += table.num_rows
+    
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+
+class RollingParquetWriter:
+    """
+    按大小滚动的帧Parquet文件（LeRobot v3 的 data_files_size_in_mb / chunk-XXX/file-YYY 约定）
+    
+    连续的episode依次追加到当前文件；当前文件加上下一个episode会超过大小上限时换到下一个文件。
+    一个episode总是完整地位于一个文件中（单个episode超过上限时独占一个文件）。
+    
+    用法:
+        writer = RollingParquetWriter(output_dir, max_file_mb=100)
+        chunk_index, file_index, row_offset = writer.write_episode(table)
+        ...
+        writer.close()
+    """
+    
+    def __init__(self, root, max_file_mb: float = DEFAULT_DATA_FILE_SIZE_MB,
+                 chunks_size: int = DEFAULT_CHUNKS_SIZE, data_path: str = DATA_PATH,
+                 row_group_size: int = ROW_GROUP_SIZE, schema: pa.Schema = FRAME_SCHEMA):
+        """
+        Args:
+            root: 数据集根目录
+            max_file_mb: 单个数据文件的大小上限（MB，按写入的Arrow数据量估计）
+            chunks_size: 每个chunk目录的最大文件数
+            data_path: 数据文件路径模板（相对root）
+            row_group_size: 每个row group的行数
+            schema: 帧表的schema
+        """
+        self.root = Path(root)
+        self.max_file_bytes = max_file_mb * 1024 ** 2
+        self.chunks_size = chunks_size
+        self.data_path = data_path
+        self.row_group_size = row_group_size
+        self.schema = schema
+        self.num_files = 0
+        self._current: Optional[EpisodeParquetWriter] = None
+        self._current_location: Tuple[int, int] = (0, 0)
+        self._current_bytes = 0
+    
+    def _open_next_file(self):
+        self.close()
+        file_number = self.num_files
+        self._current_location = (file_number // self.chunks_size, file_number % self.chunks_size)
+        chunk_index, file_index = self._current_location
+        path = self.root / self.data_path.format(chunk_index=chunk_index, file_index=file_index)
+        self._current = EpisodeParquetWriter(path, self.row_group_size, self.schema)
+        self._current_bytes = 0
+        self.num_files += 1
+    
+    def write_episode(self, table: pa.Table) -> Tuple[int, int, int]:
+        """
+        追加一个episode的帧表
+        
+        Returns:
+            (chunk_index, file_index, 该episode在文件中的起始行)
+        """
+        if (self._current is None or
+                (self._current.num_rows > 0 and self._current_bytes + table.nbytes > self.max_file_bytes)):
+            self._open_next_file()
+        
+        row_offset = self._current.num_rows
+        self._current.write(table)
+        self._current_bytes += table.nbytes
+        return self._current_location + (row_offset,)
+    
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    print("Parquet Episode Writer Module")
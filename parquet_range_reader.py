@@ -0,0 +1,422 @@
+"""
+源Parquet范围读取：按 [frame_start, frame_end) 直接从数据文件顺序读取整段列数据
+
+绕过 LeRobotDataset 的逐帧 __getitem__（delta timestamps、transforms、float转换、task查找），
+一个范围只需要对覆盖它的 row group 做几次顺序读取。
+"""
+import io
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class DataFileSpan:
+    """一个数据文件覆盖的全局索引区间 [start, end) 及其 row group 偏移"""
+    
+    def __init__(self, path: Path, start: int, end: int, row_group_offsets: np.ndarray):
+        self.path = path
+        self.start = start
+        self.end = end
+        # row_group_offsets[k] 为第k个row group在文件内的起始行，最后一项为总行数
+        self.row_group_offsets = row_group_offsets
+    
+    def __len__(self) -> int:
+        return self.end - self.start
+    
+    def row_groups_for(self, lo: int, hi: int) -> List[int]:
+        """覆盖文件内行区间 [lo, hi) 的 row group 编号"""
+        first = int(np.searchsorted(self.row_group_offsets, lo, side='right')) - 1
+        last = int(np.searchsorted(self.row_group_offsets, hi, side='left'))
+        return list(range(first, last))
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """将PNG/JPEG字节解码为 uint8 HWC 数组"""
+    from PIL import Image
+    
+    return np.asarray(Image.open(io.BytesIO(data)).convert('RGB'))
+
+
+class EncodedImage:
+    """
+    未解码的源图像字节（PNG/JPEG），用于直通写出：纯裁剪时像素不变，不需要解码再编码
+    
+    只在必须得到像素时（例如官方API的 add_frame）才调用 decode()。
+    """
+    
+    __slots__ = ('data',)
+    
+    def __init__(self, data: bytes):
+        self.data = data
+    
+    @property
+    def format(self) -> str:
+        """由文件头判断编码格式：'png' / 'jpeg' / 'unknown'"""
+        if self.data[:8] == b'\x89PNG\r\n\x1a\n':
+            return 'png'
+        if self.data[:3] == b'\xff\xd8\xff':
+            return 'jpeg'
+        return 'unknown'
+    
+    @property
+    def extension(self) -> str:
+        return {'png': '.png', 'jpeg': '.jpg'}.get(self.format, '.bin')
+    
+    def decode(self) -> np.ndarray:
+        """解码为 uint8 HWC 数组"""
+        return decode_image(self.data)
+    
+    def clone(self) -> 'EncodedImage':
+        # 字节不可变，直接共享
+        return self
+    
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+def is_image_column(field) -> bool:
+    """LeRobot的image特征在Parquet中存为 struct{bytes, path}"""
+    import pyarrow as pa
+    
+    return pa.types.is_struct(field.type) and field.type.get_field_index('bytes') >= 0
+
+
+class RowGroupCache:
+    """
+    已读取row group的LRU缓存，键为 (数据文件, row group编号)，按列数据的字节数限制总大小
+    
+    连续范围、任务描述生成时的首/尾/关键帧读取会反复命中相同的row group；缓存后不必
+    重新读取和解码。默认只缓存低维列（action、state、索引等），图像列可选。
+    线程安全（流水线中的多个读取线程共享）。
+    """
+    
+    def __init__(self, max_mb: float = 256, cache_images: bool = False):
+        """
+        Args:
+            max_mb: 缓存上限（MB，0 表示禁用）
+            cache_images: 是否同时缓存图像列（字节较大，会挤占低维列的空间）
+        """
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        self.cache_images = cache_images
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries: 'OrderedDict[Tuple[str, int], Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+    
+    def get(self, key: Tuple[str, int], columns: List[str]) -> Tuple[Dict, List[str]]:
+        """
+        查找row group中的列
+        
+        Returns:
+            (已缓存的 {列名: ChunkedArray}, 缺失的列名)；缺失列为空时记为命中
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            found = {c: entry[c] for c in columns if c in entry} if entry is not None else {}
+            missing = [c for c in columns if c not in found]
+            if missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return found, missing
+    
+    def put(self, key: Tuple[str, int], arrays: Dict):
+        """加入row group的列（与已缓存的列合并），超出上限时淘汰最久未使用的row group"""
+        with self._lock:
+            entry = self._entries.setdefault(key, {})
+            self._entries.move_to_end(key)
+            for name, array in arrays.items():
+                if name not in entry:
+                    entry[name] = array
+                    self.nbytes += array.nbytes
+            while self.nbytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= sum(array.nbytes for array in evicted.values())
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+    
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+            'row_groups': len(self._entries), 'size_mb': self.nbytes / 1024 ** 2,
+        }
+    
+    def print_stats(self):
+        stats = self.stats()
+        print(f"  📦 Row group缓存: 命中 {stats['hits']} / 未命中 {stats['misses']} "
+              f"(命中率 {stats['hit_rate']:.1%}), 淘汰 {stats['evictions']}, "
+              f"占用 {stats['size_mb']:.1f}/{self.max_bytes / 1024 ** 2:.0f} MB")
+
+
+_shared_cache: Optional[RowGroupCache] = None
+
+
+def shared_row_group_cache() -> RowGroupCache:
+    """进程内共享的row group缓存（裁剪与任务描述生成使用同一个实例）"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = RowGroupCache()
+    return _shared_cache
+
+
+def configure_row_group_cache(max_mb: float, cache_images: bool = False) -> RowGroupCache:
+    """替换进程内共享的row group缓存"""
+    global _shared_cache
+    _shared_cache = RowGroupCache(max_mb, cache_images)
+    return _shared_cache
+
+
+class ParquetRangeReader:
+    """
+    源数据集的Parquet范围读取器
+    
+    文件索引优先由 meta/episodes 中每个episode的 data/chunk_index、data/file_index、
+    dataset_from_index、dataset_to_index 构建（按 info.json 的 data_path 模板定位文件），
+    并用Parquet footer中的行数校验；meta不可用时退回读取各文件的 index 列。
+    读取的row group经过 RowGroupCache 缓存（默认使用进程内共享的缓存）。
+    """
+    
+    def __init__(self, dataset_root, cache: Optional[RowGroupCache] = None):
+        """
+        Args:
+            dataset_root: 数据集根目录
+            cache: row group缓存（None表示使用 shared_row_group_cache()）
+        """
+        self.root = Path(dataset_root)
+        self.cache = cache if cache is not None else shared_row_group_cache()
+        # ParquetFile 句柄按线程缓存（流水线中多个读取线程共享同一个读取器）
+        self._local = threading.local()
+        
+        spans = self._spans_from_meta()
+        if spans is None:
+            spans = self._spans_from_index_column()
+        if not spans:
+            raise FileNotFoundError(f"未找到Parquet数据文件: {self.root / 'data'}")
+        
+        self.spans = sorted(spans, key=lambda s: s.start)
+        self._span_starts = np.array([s.start for s in self.spans], dtype=np.int64)
+        
+        schema = self._parquet_file(self.spans[0].path).schema_arrow
+        self.column_names = list(schema.names)
+        self.image_columns = [field.name for field in schema if is_image_column(field)]
+    
+    @classmethod
+    def for_dataset(cls, dataset, cache: Optional[RowGroupCache] = None) -> Optional['ParquetRangeReader']:
+        """
+        为LeRobot数据集创建读取器；数据集的逐帧结果与源Parquet不一致时返回None
+        （按episode子集加载、配置了delta_timestamps或图像transforms）
+        
+        Args:
+            dataset: LeRobot数据集
+            cache: row group缓存（None表示使用 shared_row_group_cache()）
+        """
+        root = getattr(dataset, 'root', None)
+        if root is None or getattr(dataset, 'episodes', None) is not None:
+            return None
+        if getattr(dataset, 'delta_timestamps', None) or getattr(dataset, 'image_transforms', None):
+            return None
+        
+        try:
+            reader = cls(root, cache=cache)
+        except Exception as e:
+            print(f"⚠️  无法直接读取源Parquet，使用逐帧读取: {e}")
+            return None
+        
+        if reader.spans[0].start != 0 or reader.spans[-1].end != len(dataset):
+            print(f"⚠️  源Parquet覆盖的索引范围与数据集长度({len(dataset)})不一致，使用逐帧读取")
+            return None
+        return reader
+    
+    def _parquet_file(self, path: Path):
+        import pyarrow.parquet as pq
+        
+        files = getattr(self._local, 'files', None)
+        if files is None:
+            files = self._local.files = {}
+        if path not in files:
+            files[path] = pq.ParquetFile(path)
+        return files[path]
+    
+    def _make_span(self, path: Path, start: int) -> DataFileSpan:
+        metadata = self._parquet_file(path).metadata
+        offsets = np.zeros(metadata.num_row_groups + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([metadata.row_group(k).num_rows for k in range(metadata.num_row_groups)])
+        return DataFileSpan(path, start, start + int(offsets[-1]), offsets)
+    
+    def _spans_from_meta(self) -> Optional[List[DataFileSpan]]:
+        """由 meta/episodes 的文件偏移构建文件索引"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        info_file = self.root / 'meta' / 'info.json'
+        episode_files = sorted((self.root / 'meta' / 'episodes').glob('**/*.parquet'))
+        if not info_file.exists() or not episode_files:
+            return None
+        
+        try:
+            with open(info_file, 'r', encoding='utf-8') as f:
+                data_path = json.load(f)['data_path']
+            
+            columns = ['data/chunk_index', 'data/file_index', 'dataset_from_index', 'dataset_to_index']
+            episodes = pa.concat_tables([pq.read_table(p, columns=columns) for p in episode_files]).to_pydict()
+            
+            # 每个文件覆盖其中所有episode的 [min(from), max(to))
+            file_bounds: Dict[Tuple[int, int], List[int]] = {}
+            for chunk, file, start, end in zip(*(episodes[c] for c in columns)):
+                bounds = file_bounds.setdefault((chunk, file), [start, end])
+                bounds[0], bounds[1] = min(bounds[0], start), max(bounds[1], end)
+            
+            spans = []
+            for (chunk, file), (start, end) in file_bounds.items():
+                path = self.root / data_path.format(chunk_index=chunk, file_index=file)
+                span = self._make_span(path, int(start))
+                if span.end != end:
+                    print(f"⚠️  meta/episodes 与数据文件行数不一致: {path}")
+                    return None
+                spans.append(span)
+            return spans
+        except Exception as e:
+            print(f"⚠️  从meta/episodes构建文件索引失败: {e}")
+            return None
+    
+    def _spans_from_index_column(self) -> List[DataFileSpan]:
+        """读取各数据文件的 index 列构建文件索引（要求文件内索引连续）"""
+        from gripper_detector import find_parquet_data_files
+        
+        spans = []
+        for path in find_parquet_data_files(self.root):
+            index = self._parquet_file(path).read(columns=['index']).column('index').to_numpy()
+            if len(index) == 0:
+                continue
+            if not np.array_equal(index, np.arange(index[0], index[0] + len(index))):
+                raise ValueError(f"数据文件内的index不连续: {path}")
+            spans.append(self._make_span(path, int(index[0])))
+        return spans
+    
+    def __len__(self) -> int:
+        return self.spans[-1].end
+    
+    def locate(self, index: int) -> Tuple[int, int]:
+        """
+        全局索引所在的 (文件编号, row group编号)
+        """
+        position = int(np.searchsorted(self._span_starts, index, side='right')) - 1
+        if position < 0 or index >= self.spans[position].end:
+            raise IndexError(f"索引超出源数据范围: {index}")
+        span = self.spans[position]
+        row_group = int(np.searchsorted(span.row_group_offsets, index - span.start, side='right')) - 1
+        return position, row_group
+    
+    def plan_reads(self, intervals: List[Tuple[int, int]]) -> List[Tuple[int, int, List[int]]]:
+        """
+        按I/O顺序规划一组区间的读取
+        
+        区间按 (数据文件, 起始row group, 起点) 排序；同一文件内与前一次读取共享row group的
+        区间合并为一次读取，使每个row group最多读取一次、文件内按偏移顺序访问。
+        
+        Args:
+            intervals: [(start, end), ...] 全局索引区间（左闭右开）
+        
+        Returns:
+            [(read_start, read_end, [区间下标, ...]), ...]，按读取顺序排列
+        """
+        keyed = []
+        for k, (start, end) in enumerate(intervals):
+            first_file, first_group = self.locate(start)
+            last_file, last_group = self.locate(end - 1)
+            keyed.append((str(self.spans[first_file].path), first_group, start, end,
+                          first_file, last_file, last_group, k))
+        keyed.sort()
+        
+        plan = []
+        previous = None
+        for _, first_group, start, end, first_file, last_file, last_group, k in keyed:
+            if (previous is not None and first_file == last_file == previous['file']
+                    and first_group <= previous['last_group']):
+                read = plan[-1]
+                plan[-1] = (read[0], max(read[1], end), read[2] + [k])
+                previous['last_group'] = max(previous['last_group'], last_group)
+            else:
+                plan.append((start, end, [k]))
+                previous = {'file': first_file if first_file == last_file else None, 'last_group': last_group}
+        return plan
+    
+    def _read_row_groups(self, span: DataFileSpan, row_groups: List[int], columns: Optional[List[str]]):
+        """读取一个文件中的若干row group，可缓存的列优先取自缓存"""
+        import pyarrow as pa
+        
+        parquet_file = self._parquet_file(span.path)
+        if not self.cache.enabled:
+            return parquet_file.read_row_groups(row_groups, columns=columns)
+        
+        columns = list(self.column_names) if columns is None else columns
+        cacheable = [c for c in columns if self.cache.cache_images or c not in self.image_columns]
+        uncached = [c for c in columns if c not in cacheable]
+        
+        tables = []
+        for row_group in row_groups:
+            key = (str(span.path), row_group)
+            arrays, missing = self.cache.get(key, cacheable) if cacheable else ({}, [])
+            if missing or uncached:
+                table = parquet_file.read_row_group(row_group, columns=missing + uncached)
+                if missing:
+                    self.cache.put(key, {name: table.column(name) for name in missing})
+                arrays.update({name: table.column(name) for name in table.column_names})
+            tables.append(pa.table({name: arrays[name] for name in columns}))
+        return tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+    
+    def read_range(self, start: int, end: int, columns: Optional[List[str]] = None):
+        """
+        读取全局索引 [start, end) 的整段列数据
+        
+        Args:
+            start: 起始全局索引
+            end: 结束全局索引（不包含）
+            columns: 需要读取的列（None表示全部）
+        
+        Returns:
+            pyarrow.Table，行顺序与全局索引一致
+        """
+        import pyarrow as pa
+        
+        if columns is not None:
+            columns = [c for c in columns if c in self.column_names]
+        
+        tables = []
+        position = int(np.searchsorted(self._span_starts, start, side='right')) - 1
+        if position < 0 or end > len(self):
+            raise IndexError(f"范围超出源数据: [{start}, {end})")
+        
+        while start < end:
+            span = self.spans[position]
+            lo, hi = start - span.start, min(end, span.end) - span.start
+            row_groups = span.row_groups_for(lo, hi)
+            table = self._read_row_groups(span, row_groups, columns)
+            first_row = int(span.row_group_offsets[row_groups[0]])
+            tables.append(table.slice(lo - first_row, hi - lo))
+            start = span.start + hi
+            position += 1
+        
+        return tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+
+
+if __name__ == '__main__':
+    print("Parquet Range Reader Module")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+检测器基准测试：在合成LeRobot v3数据集上计时关键帧检测、帧范围提取和范围合并
+
+对每个规模（默认 10k / 100k / 1M 帧）报告：
+- 耗时与吞吐（帧/秒，按数据集帧数计）
+- 阶段内的进程峰值RSS
+- 与参考实现（逐帧检测 / 逐帧查找episode边界 / 逐个比较相邻范围）的结果差异
+
+用法:
+    python scripts/benchmark_detector.py --sizes 10000 100000 --work-dir /tmp/bench
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+# 添加模块路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from gripper_detector import GripperStateDetector, EpisodeTable, MultiSignalEventDetector
+from synthetic_dataset import generate_synthetic_dataset, SyntheticLeRobotDataset
+
+
+class PeakRSSMonitor:
+    """后台线程采样进程RSS，记录阶段内的峰值"""
+    
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def measure(fn: Callable, *args, **kwargs):
+    """执行fn并返回 (结果, 耗时秒, 峰值RSS MB)"""
+    with PeakRSSMonitor() as monitor:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    return result, elapsed, monitor.peak / (1024 ** 2)
+
+
+def _plain(value):
+    """Tensor/numpy标量 -> Python值"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+def diff_records(expected: List[Dict], actual: List[Dict]) -> Dict[str, int]:
+    """
+    逐条比较两组关键帧/帧范围
+    
+    Returns:
+        {'expected': 参考条数, 'missing': 参考中有而结果中没有, 'extra': 多出的, 'mismatched': 字段不一致}
+    """
+    def key(record):
+        return (_plain(record.get('index', record.get('frame_start'))), _plain(record.get('frame_end', -1)))
+    
+    expected_by_key = {key(r): {k: _plain(v) for k, v in r.items()} for r in expected}
+    actual_by_key = {key(r): {k: _plain(v) for k, v in r.items() if k != 'source'} for r in actual}
+    shared = expected_by_key.keys() & actual_by_key.keys()
+    return {
+        'expected': len(expected),
+        'missing': len(expected_by_key.keys() - actual_by_key.keys()),
+        'extra': len(actual_by_key.keys() - expected_by_key.keys()),
+        'mismatched': sum(1 for k in shared if expected_by_key[k] != actual_by_key[k]),
+    }
+
+
+def reference_merge(ranges: List[Dict], min_gap: int) -> List[Dict]:
+    """参考实现：逐个比较相邻范围（与最初的 merge_adjacent_ranges 相同，要求输入有序）"""
+    if not ranges:
+        return ranges
+    merged = []
+    current_range = ranges[0].copy()
+    for next_range in ranges[1:]:
+        if (current_range['episode_index'] == next_range['episode_index'] and
+                next_range['frame_start'] - current_range['frame_end'] < min_gap):
+            current_range['frame_end'] = max(current_range['frame_end'], next_range['frame_end'])
+            current_range['num_frames'] = current_range['frame_end'] - current_range['frame_start']
+        else:
+            merged.append(current_range)
+            current_range = next_range.copy()
+    merged.append(current_range)
+    return merged
+
+
+def prepare_dataset(work_dir: Path, num_frames: int, args) -> SyntheticLeRobotDataset:
+    """生成（或复用已生成的）指定规模的合成数据集"""
+    root = work_dir / (f"synthetic_{num_frames}_len{args.episode_length}_p{args.pick_place_period}"
+                       f"_img{args.image_size}x{args.num_cameras}_s{args.seed}")
+    if not (root / 'meta' / 'info.json').exists():
+        num_episodes = max(1, num_frames // args.episode_length)
+        print(f"📦 生成合成数据集: {root} ({num_episodes} 个episode)")
+        generate_synthetic_dataset(root, num_episodes, args.episode_length, args.pick_place_period,
+                                   args.image_size, args.num_cameras, seed=args.seed, overwrite=True)
+    return SyntheticLeRobotDataset(root)
+
+
+def run_benchmark(dataset, methods: List[str], before_frames: int = 30, after_frames: int = 30,
+                  min_gap: int = 50, reference_max_frames: Optional[int] = None,
+                  coarse_stride: int = 16) -> List[Dict]:
+    """
+    在一个数据集上运行所有阶段
+    
+    Returns:
+        结果行列表：{'stage', 'impl', 'frames', 'seconds', 'frames_per_s', 'peak_rss_mb', 'diff'}
+    """
+    detector = GripperStateDetector(threshold=0.5)
+    num_frames = len(dataset)
+    rows = []
+    
+    def record(stage, impl, seconds, peak, diff=None):
+        rows.append({
+            'stage': stage, 'impl': impl, 'frames': num_frames,
+            'seconds': round(seconds, 4),
+            'frames_per_s': round(num_frames / seconds) if seconds > 0 else None,
+            'peak_rss_mb': round(peak, 1),
+            'diff': diff,
+        })
+    
+    # 检测：逐帧 detect_gripper_changes 为参考实现
+    run_reference = reference_max_frames is None or num_frames <= reference_max_frames
+    reference = None
+    if run_reference:
+        reference, seconds, peak = measure(detector.detect_gripper_changes, dataset, 0, None, verbose=False)
+        record('detect', 'frame (reference)', seconds, peak)
+    
+    detect_impls = {
+        'columnar': lambda: detector.detect_gripper_changes_columnar(dataset, 0, None),
+        'coarse': lambda: detector.detect_gripper_changes_coarse(dataset, 0, None, coarse_stride, verbose=False),
+        'events': lambda: MultiSignalEventDetector.from_names(['action_flip']).detect_dataset(dataset),
+    }
+    changes = None
+    for method in methods:
+        result, seconds, peak = measure(detect_impls[method])
+        record('detect', method, seconds, peak, diff_records(reference, result) if reference is not None else None)
+        if method == 'columnar':
+            changes = result
+    if changes is None:
+        changes = reference if reference is not None else detector.detect_gripper_changes_columnar(dataset)
+    
+    # 帧范围提取：逐帧查找episode边界为参考实现
+    table, seconds, peak = measure(EpisodeTable.from_dataset, dataset)
+    record('episode_table', 'from_dataset', seconds, peak)
+    
+    expected_ranges = None
+    if run_reference:
+        expected_ranges, seconds, peak = measure(detector._extract_frame_ranges_by_lookup,
+                                                 dataset, changes, before_frames, after_frames)
+        record('extract', 'lookup (reference)', seconds, peak)
+    ranges, seconds, peak = measure(detector.extract_frame_ranges, dataset, changes, before_frames,
+                                    after_frames, episode_table=table)
+    record('extract', 'episode_table', seconds, peak,
+           diff_records(expected_ranges, ranges) if expected_ranges is not None else None)
+    
+    # 范围合并：逐个比较相邻范围为参考实现
+    expected_merged, seconds, peak = measure(reference_merge, ranges, min_gap)
+    record('merge', 'neighbour (reference)', seconds, peak)
+    merged, seconds, peak = measure(detector.merge_adjacent_ranges, ranges, min_gap)
+    record('merge', 'interval_index', seconds, peak, diff_records(expected_merged, merged))
+    
+    return rows
+
+
+def print_rows(rows: List[Dict]):
+    print(f"{'stage':<14}{'impl':<22}{'frames':>10}{'seconds':>11}{'frames/s':>14}{'peak RSS MB':>13}  diff")
+    print("-" * 100)
+    for row in rows:
+        diff = row['diff']
+        if diff is None:
+            diff_text = '-'
+        elif diff['missing'] == diff['extra'] == diff['mismatched'] == 0:
+            diff_text = f"✓ 一致 ({diff['expected']})"
+        else:
+            diff_text = f"✗ 缺失{diff['missing']} 多出{diff['extra']} 不一致{diff['mismatched']}"
+        fps = f"{row['frames_per_s']:,}" if row['frames_per_s'] is not None else '-'
+        print(f"{row['stage']:<14}{row['impl']:<22}{row['frames']:>10,}{row['seconds']:>11.3f}"
+              f"{fps:>14}{row['peak_rss_mb']:>13.1f}  {diff_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='关键帧检测基准测试（合成LeRobot v3数据集）')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='数据集规模（帧数）')
+    parser.add_argument('--work-dir', type=str, default='./bench_datasets',
+                        help='合成数据集存放目录（已生成的会复用）')
+    parser.add_argument('--methods', type=str, default='columnar,coarse,events',
+                        help='参与对比的检测方式，逗号分隔: columnar, coarse, events')
+    parser.add_argument('--episode-length', type=int, default=200, help='平均episode长度')
+    parser.add_argument('--pick-place-period', type=int, default=40, help='夹爪开合的平均间隔（帧）')
+    parser.add_argument('--image-size', type=int, default=224,
+                        help='图像边长（默认224，逐帧检测包含真实的图像解码开销；0 表示只生成低维列）')
+    parser.add_argument('--num-cameras', type=int, default=2, help='相机数量')
+    parser.add_argument('--coarse-stride', type=int, default=16, help='coarse检测的采样间隔')
+    parser.add_argument('--reference-max-frames', type=int, default=None,
+                        help='超过该帧数时跳过参考实现（不报告差异）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help='结果JSON文件')
+    args = parser.parse_args()
+    
+    work_dir = Path(args.work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    methods = [m.strip() for m in args.methods.split(',') if m.strip()]
+    
+    results = {}
+    for num_frames in args.sizes:
+        print("\n" + "=" * 100)
+        print(f"📊 规模: {num_frames:,} 帧")
+        print("=" * 100)
+        dataset = prepare_dataset(work_dir, num_frames, args)
+        rows = run_benchmark(dataset, methods, reference_max_frames=args.reference_max_frames,
+                             coarse_stride=args.coarse_stride)
+        print()
+        print_rows(rows)
+        results[str(num_frames)] = rows
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 结果已保存: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
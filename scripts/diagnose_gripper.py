@@ -3,79 +3,51 @@
 诊断脚本：检查夹爪状态变化的详细情况
 """
 
+import sys
 from pathlib import Path
-import pandas as pd
 import numpy as np
 
+# 添加模块路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from signal_store import SignalStore
+
+
 def diagnose_gripper_states(dataset_path, max_frames=2000):
     """诊断夹爪状态"""
     
     print("=" * 80)
-    print("🔬 夹爪状态诊断 (直接读取Parquet)")
+    print("🔬 夹爪状态诊断 (读取低维信号存储)")
     print("=" * 80)
     
-    # 直接读取Parquet文件
-    data_dir = Path(dataset_path) / "data" / "chunk-000"
-    parquet_files = sorted(data_dir.glob("*.parquet"))
-    
-    if not parquet_files:
-        print(f"❌ 未找到Parquet文件在: {data_dir}")
+    # 物化低维信号（已是最新时直接打开，不再解码Parquet）
+    try:
+        store = SignalStore.materialize(dataset_path)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
         return
     
-    print(f"📂 读取Parquet文件: {len(parquet_files)} 个")
     print(f"📊 采样上限: {max_frames} 帧\n")
+    num_frames = min(len(store), max_frames)
     
-    # 读取所有帧（直到达到上限）
-    all_frames = []
-    total_rows = 0
-    
-    for pf in parquet_files:
-        df = pd.read_parquet(pf)
-        print(f"  ✓ {pf.name}: {len(df)} 行")
-        all_frames.append(df)
-        total_rows += len(df)
-        
-        if total_rows >= max_frames:
-            break
-    
-    df_all = pd.concat(all_frames, ignore_index=True)
-    if len(df_all) > max_frames:
-        df_all = df_all.iloc[:max_frames]
-    
-    print(f"\n✓ 总加载帧数: {len(df_all)}\n")
+    print(f"\n✓ 总加载帧数: {num_frames}\n")
     
     # 提取夹爪状态
     print("=" * 80)
     print("📈 分析结果")
     print("=" * 80)
     
-    print(f"\n1️⃣  Parquet文件结构:")
-    print(f"   列名: {list(df_all.columns)}")
+    print(f"\n1️⃣  信号存储结构:")
+    print(f"   列名: {store.columns}")
     
     # 查找action列
-    action_cols = [c for c in df_all.columns if 'action' in c.lower()]
+    action_cols = [c for c in store.columns if 'action' in c.lower()]
     print(f"\n   Action相关列: {action_cols}")
     
     # 提取夹爪状态
-    if 'action' in df_all.columns:
-        actions = df_all['action'].values
-        gripper_states = []
-        
-        for action in actions:
-            if isinstance(action, np.ndarray):
-                if len(action) >= 7:
-                    gripper_states.append(float(action[-1]))
-                else:
-                    gripper_states.append(None)
-            elif isinstance(action, (list, tuple)):
-                if len(action) >= 7:
-                    gripper_states.append(float(action[-1]))
-                else:
-                    gripper_states.append(None)
-            else:
-                gripper_states.append(None)
-        
-        gripper_states = [g for g in gripper_states if g is not None]
+    if 'action' in store:
+        actions = store.slice('action', 0, num_frames)
+        gripper_states = [float(g) for g in actions[:, -1]] if actions.shape[1] >= 7 else []
         
         print(f"\n2️⃣  采样数据统计:")
         print(f"   - 总采样数: {len(gripper_states)}")
@@ -146,18 +118,17 @@ def diagnose_gripper_states(dataset_path, max_frames=2000):
             print(f"   - 中位数差值: {np.median(diffs):.4f}")
         
         # 查看task信息
-        if 'task' in df_all.columns:
+        if 'task_index' in store:
             print(f"\n6️⃣  Task信息:")
-            tasks = df_all['task'].unique()
-            print(f"   - 不同任务数: {len(tasks)}")
+            task_indices, counts = np.unique(store.slice('task_index', 0, num_frames), return_counts=True)
+            print(f"   - 不同任务数: {len(task_indices)}")
             print(f"   - 前5个任务:")
-            for task in tasks[:5]:
-                count = (df_all['task'] == task).sum()
-                print(f"     - '{task[:40]}' ({count} 帧)")
+            for task_index, count in list(zip(task_indices, counts))[:5]:
+                print(f"     - task_index {int(task_index)} ({count} 帧)")
     
     else:
         print(f"\n❌ 未找到'action'列")
-        print(f"   可用列: {list(df_all.columns)}")
+        print(f"   可用列: {store.columns}")
     
     print("\n" + "=" * 80)
 
@@ -13,32 +13,48 @@ def get_available_memory_gb():
     return mem.available / (1024 ** 3)
 
 
-def estimate_batch_size(total_frames, avg_frames_per_episode=60):
+# 流水线中同时在内存中的批次数：读取线程1 + 转换线程2 + 2个队列各1 + 写入1（默认参数）
+BATCHES_IN_FLIGHT = 6
+
+
+def frame_memory_mb(image_size=256, num_cameras=2):
+    """
+    每帧在批次中的内存占用（MB）
+    
+    图像以 uint8 HWC 保存（以前是 float32 CHW，每帧约1.5MB，是现在的4倍）；
+    低维数据（state/action/索引）只有几十字节，忽略不计。
+    """
+    return image_size * image_size * 3 * num_cameras / (1024 ** 2)
+
+
+def estimate_batch_size(total_frames, avg_frames_per_episode=60, image_size=256, num_cameras=2):
     """
     估算合适的batch_size
     
     Args:
         total_frames: 数据集总帧数
         avg_frames_per_episode: 平均每个episode的帧数
+        image_size: 图像边长
+        num_cameras: 相机数量
     
     Returns:
         推荐的batch_size
     """
     available_memory = get_available_memory_gb()
     
-    # 每帧大约占用1.5MB（包含2个摄像头图像）
-    memory_per_frame_mb = 1.5
+    # 每帧约0.375MB（2个256×256摄像头的uint8图像）
+    memory_per_frame_mb = frame_memory_mb(image_size, num_cameras)
     
     # 保留40%的内存用于系统和其他开销
     usable_memory_gb = available_memory * 0.6
     
-    # 计算可以同时处理的帧数
-    max_frames_in_memory = (usable_memory_gb * 1024) / memory_per_frame_mb
+    # 计算可以同时处理的帧数（流水线中同时有多个批次）
+    max_frames_in_memory = (usable_memory_gb * 1024) / memory_per_frame_mb / BATCHES_IN_FLIGHT
     
     # 计算batch_size
     batch_size = int(max_frames_in_memory / avg_frames_per_episode)
     
-    return max(10, min(batch_size, 300))  # 限制在10-300之间
+    return max(10, min(batch_size, 1200))  # 限制在10-1200之间
 
 
 def print_recommendations(total_frames):
@@ -67,7 +83,7 @@ def print_recommendations(total_frames):
     
     for scenario_name, avg_frames in scenarios:
         batch_size = estimate_batch_size(total_frames, avg_frames)
-        memory_usage = (batch_size * avg_frames * 1.5) / 1024  # GB
+        memory_usage = (batch_size * avg_frames * frame_memory_mb() * BATCHES_IN_FLIGHT) / 1024  # GB
         
         print(f"\n{scenario_name}:")
         print(f"  推荐 batch_size: {batch_size}")
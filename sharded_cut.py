@@ -0,0 +1,235 @@
+"""
+多进程分片裁剪：把帧范围切成N个分片，每个分片在独立进程中裁剪为临时数据集，最后合并为一个数据集
+"""
+import json
+import multiprocessing
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from parquet_episode_writer import DEFAULT_DATA_FILE_SIZE_MB, RollingParquetWriter
+
+
+# fork出的子进程从这里取得数据集和帧范围（不经过pickle）
+_SHARD_STATE: Dict = {}
+
+
+def split_into_shards(frame_ranges: List[Dict], num_shards: int) -> List[Tuple[int, int]]:
+    """
+    按帧数均衡地把帧范围切成连续的分片
+    
+    分片边界只落在原始episode变化处：同一原始episode的范围总在同一分片内，
+    placeholder的判断（下一个范围是否属于同一episode）与不分片时完全相同。
+    
+    Args:
+        frame_ranges: 帧范围列表
+        num_shards: 目标分片数（原始episode不足时分片会更少）
+    
+    Returns:
+        [(起始范围索引, 结束范围索引), ...]
+    """
+    total = len(frame_ranges)
+    if total == 0:
+        return []
+    
+    counts = np.array([max(1, int(r['frame_end']) - int(r['frame_start'])) for r in frame_ranges])
+    cumulative = np.cumsum(counts)
+    episodes = [int(r.get('episode_index', -1)) for r in frame_ranges]
+    # 可选边界：范围i与i-1属于不同的原始episode
+    candidates = np.array([i for i in range(1, total) if episodes[i] != episodes[i - 1]], dtype=np.int64)
+    
+    boundaries = []
+    if len(candidates) > 0:
+        for k in range(1, max(1, int(num_shards))):
+            target = cumulative[-1] * k / num_shards
+            # 边界i之前的帧数为 cumulative[i-1]，取最接近目标的候选
+            boundary = int(candidates[np.argmin(np.abs(cumulative[candidates - 1] - target))])
+            if not boundaries or boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    
+    edges = [0] + boundaries + [total]
+    return [(edges[k], edges[k + 1]) for k in range(len(edges) - 1)]
+
+
+def _cut_shard(spec: Tuple[int, int, int, str]) -> str:
+    """子进程：裁剪一个分片到临时目录（传统方法写出）"""
+    from dataset_cutter import DatasetCutter
+    
+    shard_id, range_start, range_end, shard_dir = spec
+    state = _SHARD_STATE
+    print(f"\n⚡ 分片 {shard_id}: 范围 [{range_start}:{range_end}] -> {shard_dir}")
+    
+    cutter = DatasetCutter(shard_dir, save_mode='lerobot', use_official_api=False, **state['cutter_kwargs'])
+    cutter.save_as_lerobot_format_streaming(state['dataset'], state['frame_ranges'][range_start:range_end])
+    return shard_dir
+
+
+def _replace_column(table: pa.Table, name: str, values: np.ndarray) -> pa.Table:
+    """替换一列（保持原字段类型与schema元信息）"""
+    position = table.schema.get_field_index(name)
+    field = table.schema.field(position)
+    return table.set_column(position, field, pa.array(values, type=field.type))
+
+
+def merge_shards(shard_dirs: List[Path], shard_bounds: List[Tuple[int, int]], frame_ranges: List[Dict],
+                 output_dir: Path, data_files_size_in_mb: float = DEFAULT_DATA_FILE_SIZE_MB) -> Path:
+    """
+    按分片顺序合并临时数据集
+    
+    - 各分片的episode按顺序重新打包进按大小滚动的数据文件（更新 data/chunk_index、data/file_index、data/row_offset）
+    - episode_index 加上前面分片的episode数
+    - 全局 index、dataset_from_index / dataset_to_index 加上前面分片的帧数
+    - cut_range_id 加上分片的起始范围索引
+    - task_index 按全部帧范围重新构建的任务映射表重写（与不分片时相同）
+    
+    Args:
+        shard_dirs: 各分片的临时数据集目录（按分片顺序）
+        shard_bounds: 各分片的 (起始范围索引, 结束范围索引)
+        frame_ranges: 完整的帧范围列表
+        output_dir: 合并后的数据集目录
+        data_files_size_in_mb: 合并后每个数据文件的大小上限（MB）
+    
+    Returns:
+        合并后的数据集目录
+    """
+    from dataset_cutter import DatasetCutter
+    
+    print(f"\n🔗 合并 {len(shard_dirs)} 个分片 -> {output_dir}")
+    
+    # 与传统方法相同：按首次出现的顺序构建任务映射表
+    task_to_index = {}
+    for frame_range in frame_ranges:
+        task_desc = frame_range.get('new_task', frame_range.get('task', ''))
+        if task_desc not in task_to_index:
+            task_to_index[task_desc] = len(task_to_index)
+    
+    meta_dir = output_dir / 'meta' / 'episodes' / 'chunk-000'
+    meta_dir.mkdir(parents=True, exist_ok=True)
+    writer = RollingParquetWriter(output_dir, max_file_mb=data_files_size_in_mb)
+    
+    merged_episodes = []
+    episode_offset = 0
+    frame_offset = 0
+    for shard_dir, (range_start, _) in zip(shard_dirs, shard_bounds):
+        shard_dir = Path(shard_dir)
+        episodes_file = shard_dir / 'meta' / 'episodes' / 'chunk-000' / 'file-000.parquet'
+        if not episodes_file.exists():
+            print(f"  ⚠️  分片 {shard_dir.name} 没有输出任何episode，跳过")
+            continue
+        
+        episodes_df = pd.read_parquet(episodes_file)
+        shard_tasks = pd.read_parquet(shard_dir / 'meta' / 'tasks.parquet')
+        # 分片内task_index -> 全局task_index
+        task_map = np.zeros(int(shard_tasks['task_index'].max()) + 1, dtype=np.int64)
+        for task, task_idx in zip(shard_tasks.index, shard_tasks['task_index']):
+            task_map[int(task_idx)] = task_to_index[task]
+        
+        with open(shard_dir / 'meta' / 'info.json', 'r') as f:
+            data_path = json.load(f)['data_path']
+        
+        locations = []
+        source_path, source_table = None, None
+        for episode in episodes_df.to_dict('records'):
+            path = shard_dir / data_path.format(chunk_index=int(episode['data/chunk_index']),
+                                                file_index=int(episode['data/file_index']))
+            # 分片内的episode按文件顺序排列，每个数据文件只读取一次
+            if path != source_path:
+                source_path, source_table = path, pq.read_table(path)
+            table = source_table.slice(int(episode['data/row_offset']), int(episode['length']))
+            
+            new_episode_idx = episode_offset + int(episode['episode_index'])
+            table = _replace_column(table, 'episode_index', np.full(table.num_rows, new_episode_idx, dtype=np.int64))
+            table = _replace_column(table, 'index', table.column('index').to_numpy() + frame_offset)
+            table = _replace_column(table, 'task_index', task_map[table.column('task_index').to_numpy()])
+            locations.append(writer.write_episode(table))
+        source_table = None
+        
+        episodes_df[['data/chunk_index', 'data/file_index', 'data/row_offset']] = np.array(locations, dtype=np.int64)
+        episodes_df['episode_index'] += episode_offset
+        episodes_df['dataset_from_index'] += frame_offset
+        episodes_df['dataset_to_index'] += frame_offset
+        episodes_df['cut_range_id'] += range_start
+        merged_episodes.append(episodes_df)
+        
+        print(f"  ✓ 分片 {shard_dir.name}: {len(episodes_df)} episodes, {int(episodes_df['length'].sum())} 帧")
+        episode_offset += len(episodes_df)
+        frame_offset += int(episodes_df['length'].sum())
+    
+    writer.close()
+    if not merged_episodes:
+        raise RuntimeError("所有分片都没有输出episode")
+    
+    episodes_df = pd.concat(merged_episodes, ignore_index=True)
+    episodes_df.to_parquet(meta_dir / 'file-000.parquet', index=False)
+    
+    tasks_df = pd.DataFrame([{'task': task, 'task_index': task_idx}
+                             for task, task_idx in sorted(task_to_index.items(), key=lambda x: x[1])])
+    tasks_df = tasks_df.set_index('task')
+    tasks_df.to_parquet(output_dir / 'meta' / 'tasks.parquet', index=True)
+    
+    DatasetCutter._save_metadata(output_dir / 'meta', episodes_df, tasks_df, data_files_size_in_mb)
+    
+    print(f"  ✓ 合并完成: {episode_offset} episodes, {frame_offset} 帧, {len(tasks_df)} tasks, "
+          f"{writer.num_files} 个数据文件")
+    return output_dir
+
+
+def cut_and_convert_sharded(dataset, frame_ranges: List[Dict], output_dir, num_workers: int,
+                            max_episodes: Optional[int] = None, **cutter_kwargs) -> Path:
+    """
+    多进程分片裁剪（传统方法写出）
+    
+    Args:
+        dataset: 原始LeRobot数据集
+        frame_ranges: 帧范围列表
+        output_dir: 输出目录
+        num_workers: 进程数（即分片数）
+        max_episodes: 最多保存的episode数量
+        **cutter_kwargs: 传给每个分片的 DatasetCutter 参数
+    
+    Returns:
+        合并后的数据集目录
+    """
+    output_dir = Path(output_dir)
+    if max_episodes:
+        frame_ranges_to_cut = frame_ranges[:max_episodes]
+    else:
+        frame_ranges_to_cut = frame_ranges
+    
+    shard_bounds = split_into_shards(frame_ranges_to_cut, num_workers)
+    shards_root = output_dir / '_shards'
+    specs = [(k, start, end, str(shards_root / f'shard_{k:03d}')) for k, (start, end) in enumerate(shard_bounds)]
+    
+    print(f"\n⚡ 多进程分片裁剪: {len(specs)} 个分片, {num_workers} 个进程")
+    for k, start, end, _ in specs:
+        frames = sum(int(r['frame_end']) - int(r['frame_start']) for r in frame_ranges_to_cut[start:end])
+        print(f"  - 分片 {k}: 范围 [{start}:{end}], 约 {frames} 帧")
+    
+    _SHARD_STATE.update(dataset=dataset, frame_ranges=frame_ranges_to_cut, cutter_kwargs=cutter_kwargs)
+    try:
+        if 'fork' in multiprocessing.get_all_start_methods() and len(specs) > 1:
+            with multiprocessing.get_context('fork').Pool(min(num_workers, len(specs))) as pool:
+                shard_dirs = pool.map(_cut_shard, specs, chunksize=1)
+        else:
+            if len(specs) > 1:
+                print("⚠️  当前平台不支持fork，分片在本进程中依次处理")
+            shard_dirs = [_cut_shard(spec) for spec in specs]
+    finally:
+        _SHARD_STATE.clear()
+    
+    try:
+        merge_shards([Path(d) for d in shard_dirs], shard_bounds, frame_ranges, output_dir,
+                     cutter_kwargs.get('data_files_size_in_mb', DEFAULT_DATA_FILE_SIZE_MB))
+    finally:
+        shutil.rmtree(shards_root, ignore_errors=True)
+    
+    return output_dir
+
+
+if __name__ == '__main__':
+    print("Sharded Cut Module")
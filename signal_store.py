@@ -0,0 +1,201 @@
+"""
+低维信号存储：一次性物化 action / state / 索引列为内存映射的 .npy 文件
+
+检测、范围提取、诊断脚本和裁剪器都可以通过 SignalStore 零拷贝地切片读取，
+不再需要反复解码Parquet。
+"""
+import json
+import shutil
+from pathlib import Path
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from keyframe_cache import compute_dataset_fingerprint
+
+
+# 需要物化的低维列
+SIGNAL_COLUMNS = ['action', 'observation.state', 'episode_index', 'frame_index', 'timestamp', 'task_index']
+
+# 存储格式版本（字段变化时递增，旧存储自动失效）
+SIGNAL_STORE_VERSION = 1
+
+# 默认存放在数据集根目录下
+DEFAULT_STORE_NAME = 'signal_store'
+
+
+class SignalStore:
+    """
+    内存映射的低维信号存储
+    
+    目录结构：
+        signal_store/
+        ├── manifest.json          # 版本、源数据集指纹、帧数、列信息
+        ├── action.npy             # [N, 7] float32
+        ├── observation.state.npy  # [N, 8] float32
+        ├── episode_index.npy      # [N] int64
+        └── ...
+    """
+    
+    def __init__(self, store_dir):
+        """
+        打开已存在的信号存储（列在首次访问时以 mmap_mode='r' 映射）
+        
+        Args:
+            store_dir: 存储目录
+        """
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / 'manifest.json', 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self._arrays: Dict[str, np.ndarray] = {}
+    
+    @staticmethod
+    def default_dir(dataset_root) -> Path:
+        """数据集对应的默认存储目录"""
+        return Path(dataset_root) / DEFAULT_STORE_NAME
+    
+    @classmethod
+    def open(cls, store_dir, fingerprint: Optional[str] = None) -> Optional['SignalStore']:
+        """
+        打开信号存储；指定fingerprint时要求与物化时的源数据集指纹一致
+        
+        Returns:
+            SignalStore；不存在、版本不符或已过期时返回None
+        """
+        store_dir = Path(store_dir)
+        if not (store_dir / 'manifest.json').exists():
+            return None
+        try:
+            store = cls(store_dir)
+        except Exception as e:
+            print(f"⚠️  读取信号存储失败: {e}")
+            return None
+        
+        if store.manifest.get('version') != SIGNAL_STORE_VERSION:
+            return None
+        if fingerprint is not None and store.manifest.get('fingerprint') != fingerprint:
+            return None
+        return store
+    
+    @classmethod
+    def open_for_dataset(cls, dataset_root) -> Optional['SignalStore']:
+        """打开数据集旁的默认存储（校验源数据集指纹）"""
+        store_dir = cls.default_dir(dataset_root)
+        if not (store_dir / 'manifest.json').exists():
+            return None
+        return cls.open(store_dir, fingerprint=compute_dataset_fingerprint(dataset_root))
+    
+    @classmethod
+    def materialize(cls,
+                    dataset_root,
+                    store_dir=None,
+                    columns: Optional[List[str]] = None,
+                    force: bool = False) -> 'SignalStore':
+        """
+        从源Parquet读取低维列并写入内存映射存储（已是最新时直接打开）
+        
+        Args:
+            dataset_root: 数据集根目录（LeRobot数据集对象也可以，使用其 root）
+            store_dir: 存储目录（默认 dataset_root/signal_store）
+            columns: 需要物化的列（默认 SIGNAL_COLUMNS）
+            force: 是否强制重建
+        
+        Returns:
+            SignalStore
+        """
+        from gripper_detector import read_parquet_columns
+        
+        if not isinstance(dataset_root, (str, Path)):
+            dataset_root = dataset_root.root
+        dataset_root = Path(dataset_root)
+        store_dir = Path(store_dir) if store_dir else cls.default_dir(dataset_root)
+        columns = list(columns or SIGNAL_COLUMNS)
+        fingerprint = compute_dataset_fingerprint(dataset_root)
+        
+        if not force:
+            store = cls.open(store_dir, fingerprint=fingerprint)
+            if store is not None and store.covers(columns):
+                print(f"⚡ 使用已物化的信号存储: {store_dir}")
+                return store
+        
+        print(f"📦 物化低维信号: {dataset_root} -> {store_dir}")
+        arrays = read_parquet_columns(dataset_root, columns)
+        if arrays is None:
+            raise FileNotFoundError(f"未找到Parquet数据文件: {dataset_root / 'data'}")
+        
+        # 先写入临时目录，完成后再替换，避免中断时留下不完整的存储
+        tmp_dir = store_dir.with_name(store_dir.name + '.tmp')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+        
+        column_info = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            np.save(tmp_dir / f'{name}.npy', array)
+            column_info[name] = {'dtype': str(array.dtype), 'shape': list(array.shape)}
+            print(f"  ✓ {name}: {array.shape} {array.dtype}")
+        
+        num_frames = len(next(iter(arrays.values()))) if arrays else 0
+        manifest = {
+            'version': SIGNAL_STORE_VERSION,
+            'fingerprint': fingerprint,
+            'num_frames': num_frames,
+            'requested_columns': columns,
+            'columns': column_info,
+        }
+        with open(tmp_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        
+        if store_dir.exists():
+            shutil.rmtree(store_dir)
+        tmp_dir.rename(store_dir)
+        
+        print(f"✓ 信号存储完成，共 {num_frames} 帧")
+        return cls(store_dir)
+    
+    def __len__(self) -> int:
+        return int(self.manifest['num_frames'])
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.manifest['columns']
+    
+    @property
+    def columns(self) -> List[str]:
+        return list(self.manifest['columns'].keys())
+    
+    def covers(self, columns: List[str]) -> bool:
+        """物化时是否请求过这些列（源数据中不存在的列也算已覆盖）"""
+        return set(columns) <= set(self.manifest.get('requested_columns', []))
+    
+    def column(self, name: str) -> np.ndarray:
+        """返回整列（只读内存映射，零拷贝）"""
+        if name not in self._arrays:
+            if name not in self:
+                raise KeyError(f"信号存储中没有列: {name}")
+            self._arrays[name] = np.load(self.store_dir / f'{name}.npy', mmap_mode='r')
+        return self._arrays[name]
+    
+    def slice(self, name: str, start: int, end: int) -> np.ndarray:
+        """返回 [start, end) 的切片（内存映射视图，零拷贝）"""
+        return self.column(name)[start:end]
+    
+    def as_columns(self, columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """以 {列名: 数组} 形式返回（与 load_low_dim_columns 的返回值兼容）"""
+        names = self.columns if columns is None else [c for c in columns if c in self]
+        return {name: self.column(name) for name in names}
+    
+    def episode_table(self):
+        """由 episode_index 列构建episode偏移表"""
+        from gripper_detector import EpisodeTable
+        return EpisodeTable.from_episode_column(self.column('episode_index'))
+
+
+if __name__ == '__main__':
+    import sys
+    
+    if len(sys.argv) < 2:
+        print("用法: python signal_store.py <数据集路径> [存储目录]")
+        sys.exit(1)
+    
+    SignalStore.materialize(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
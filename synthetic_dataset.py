@@ -0,0 +1,329 @@
+"""
+合成LeRobot v3数据集：在本地生成可配置规模的数据集（不依赖私有数据），
+用于基准测试和单元测试
+"""
+import io
+import json
+import shutil
+from pathlib import Path
+from typing import List, Dict, Optional
+
+import numpy as np
+import torch
+
+
+DATA_PATH_TEMPLATE = 'data/chunk-{chunk_index:03d}/file-{file_index:03d}.parquet'
+VIDEO_PATH_TEMPLATE = 'videos/{video_key}/chunk-{chunk_index:03d}/file-{file_index:03d}.mp4'
+EPISODES_PATH = 'meta/episodes/chunk-000/file-000.parquet'
+
+DEFAULT_TASKS = [
+    'put the bowl on the plate',
+    'pick up the black bowl and place it in the basket',
+    'open the top drawer and put the bowl inside',
+    'put the cream cheese in the bowl',
+]
+
+# 手指位置（单侧）：张开 / 闭合，宽度 = 两侧之和（与 GripperWidthRule 的默认阈值对应）
+FINGER_OPEN = 0.04
+FINGER_CLOSED = 0.01
+
+
+def camera_keys(num_cameras: int) -> List[str]:
+    """相机特征名：observation.images.image, observation.images.image2, ..."""
+    return ['observation.images.image' + ('' if i == 0 else str(i + 1)) for i in range(num_cameras)]
+
+
+def _gripper_commands(length: int, period: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    分段常值的夹爪指令：-1（张开）/ 1（闭合）交替，每段长度在 period 附近随机抖动
+    """
+    commands = np.empty(length, dtype=np.float32)
+    position, closed = 0, False
+    while position < length:
+        segment = max(1, int(rng.integers(max(1, period * 3 // 4), period * 5 // 4 + 1)))
+        commands[position:position + segment] = 1.0 if closed else -1.0
+        position += segment
+        closed = not closed
+    return commands
+
+
+def _encode_image(pixels: np.ndarray, image_format: str) -> bytes:
+    from PIL import Image
+    
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def _episode_images(length: int, image_size: int, episode_index: int, camera: int,
+                    image_format: str) -> List[bytes]:
+    """每帧不同的简单图案（水平渐变 + 随帧号变化的色块），便于校验帧顺序"""
+    gradient = np.linspace(0, 255, image_size, dtype=np.float32)[None, :].repeat(image_size, axis=0)
+    images = []
+    for frame_index in range(length):
+        pixels = np.empty((image_size, image_size, 3), dtype=np.uint8)
+        pixels[..., 0] = gradient.astype(np.uint8)
+        pixels[..., 1] = (frame_index * 7 + camera * 50) % 256
+        pixels[..., 2] = (episode_index * 13) % 256
+        images.append(_encode_image(pixels, image_format))
+    return images
+
+
+def generate_synthetic_dataset(root,
+                               num_episodes: int = 10,
+                               episode_length: int = 200,
+                               pick_place_period: int = 40,
+                               image_size: int = 64,
+                               num_cameras: int = 2,
+                               fps: int = 10,
+                               max_frames_per_file: int = 100_000,
+                               chunks_size: int = 1000,
+                               num_tasks: int = len(DEFAULT_TASKS),
+                               image_format: str = 'PNG',
+                               row_group_size: Optional[int] = None,
+                               seed: int = 0,
+                               overwrite: bool = False) -> Path:
+    """
+    生成合成LeRobot v3数据集
+    
+    目录结构：
+        root/
+        ├── meta/info.json
+        ├── meta/tasks.parquet
+        ├── meta/episodes/chunk-000/file-000.parquet
+        └── data/chunk-XXX/file-YYY.parquet   # 多个episode打包，episode不跨文件
+    
+    Args:
+        root: 输出目录
+        num_episodes: episode数量
+        episode_length: 每个episode的平均帧数（±20%随机）
+        pick_place_period: 夹爪开合的平均间隔（帧）
+        image_size: 图像边长（0 表示不生成图像）
+        num_cameras: 相机数量（0 表示不生成图像）
+        fps: 帧率
+        max_frames_per_file: 每个数据文件的最大帧数
+        chunks_size: 每个chunk目录的最大文件数
+        num_tasks: 任务数量（episode轮流使用）
+        image_format: 图像编码格式（PNG / JPEG）
+        row_group_size: 数据文件的row group行数（None表示pyarrow默认）
+        seed: 随机种子
+        overwrite: 目录已存在时是否覆盖
+    
+    Returns:
+        数据集根目录
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pandas as pd
+    
+    root = Path(root)
+    if root.exists():
+        if not overwrite:
+            raise FileExistsError(f"输出目录已存在: {root}")
+        shutil.rmtree(root)
+    
+    rng = np.random.default_rng(seed)
+    cameras = camera_keys(num_cameras) if image_size > 0 else []
+    tasks = [DEFAULT_TASKS[i % len(DEFAULT_TASKS)] + ('' if i < len(DEFAULT_TASKS) else f' #{i}')
+             for i in range(max(1, num_tasks))]
+    
+    lengths = np.maximum(1, rng.integers(episode_length * 4 // 5, episode_length * 6 // 5 + 1,
+                                         size=num_episodes))
+    
+    episodes_meta = {
+        'episode_index': [], 'tasks': [], 'length': [],
+        'dataset_from_index': [], 'dataset_to_index': [],
+        'data/chunk_index': [], 'data/file_index': [],
+    }
+    
+    pending: Dict[str, list] = {}
+    pending_frames = 0
+    file_number = 0
+    global_index = 0
+    
+    def flush():
+        nonlocal pending, pending_frames, file_number
+        if pending_frames == 0:
+            return
+        columns = {}
+        for key in cameras:
+            columns[key] = pa.array(
+                [{'bytes': b, 'path': None} for b in pending[key]],
+                type=pa.struct([('bytes', pa.binary()), ('path', pa.string())]))
+        state = np.concatenate(pending['observation.state'])
+        action = np.concatenate(pending['action'])
+        columns['observation.state'] = pa.FixedSizeListArray.from_arrays(pa.array(state.ravel()), 8)
+        columns['action'] = pa.FixedSizeListArray.from_arrays(pa.array(action.ravel()), 7)
+        for key in ['timestamp', 'frame_index', 'episode_index', 'index', 'task_index']:
+            columns[key] = pa.array(np.concatenate(pending[key]))
+        
+        path = root / DATA_PATH_TEMPLATE.format(chunk_index=file_number // chunks_size,
+                                                file_index=file_number % chunks_size)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(pa.table(columns), path, row_group_size=row_group_size)
+        
+        pending, pending_frames = {}, 0
+        file_number += 1
+    
+    for ep, length in enumerate(lengths.tolist()):
+        if pending_frames and pending_frames + length > max_frames_per_file:
+            flush()
+        
+        task_index = ep % len(tasks)
+        commands = _gripper_commands(length, max(1, pick_place_period), rng)
+        
+        action = rng.normal(0, 0.3, size=(length, 7)).astype(np.float32)
+        action[:, -1] = commands
+        
+        # 末端位置为动作积分；手指位置滞后指令2帧
+        state = np.zeros((length, 8), dtype=np.float32)
+        state[:, :3] = np.cumsum(action[:, :3] * 0.01, axis=0)
+        state[:, 3:6] = rng.normal(0, 0.1, size=(length, 3))
+        lagged = commands[np.maximum(np.arange(length) - 2, 0)]
+        finger = np.where(lagged > 0, FINGER_CLOSED, FINGER_OPEN).astype(np.float32)
+        state[:, 6], state[:, 7] = finger, -finger
+        
+        pending.setdefault('observation.state', []).append(state)
+        pending.setdefault('action', []).append(action)
+        pending.setdefault('timestamp', []).append((np.arange(length) / fps).astype(np.float32))
+        pending.setdefault('frame_index', []).append(np.arange(length, dtype=np.int64))
+        pending.setdefault('episode_index', []).append(np.full(length, ep, dtype=np.int64))
+        pending.setdefault('index', []).append(np.arange(global_index, global_index + length, dtype=np.int64))
+        pending.setdefault('task_index', []).append(np.full(length, task_index, dtype=np.int64))
+        for camera, key in enumerate(cameras):
+            pending.setdefault(key, []).extend(_episode_images(length, image_size, ep, camera, image_format))
+        pending_frames += length
+        
+        episodes_meta['episode_index'].append(ep)
+        episodes_meta['tasks'].append([tasks[task_index]])
+        episodes_meta['length'].append(length)
+        episodes_meta['dataset_from_index'].append(global_index)
+        episodes_meta['dataset_to_index'].append(global_index + length)
+        episodes_meta['data/chunk_index'].append(file_number // chunks_size)
+        episodes_meta['data/file_index'].append(file_number % chunks_size)
+        global_index += length
+    
+    flush()
+    
+    # 元数据
+    meta_dir = root / 'meta'
+    (root / EPISODES_PATH).parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.table(episodes_meta), root / EPISODES_PATH)
+    pd.DataFrame({'task_index': range(len(tasks))}, index=pd.Index(tasks, name='task')).to_parquet(
+        meta_dir / 'tasks.parquet')
+    
+    features = {}
+    for key in cameras:
+        features[key] = {'dtype': 'image', 'shape': [image_size, image_size, 3],
+                         'names': ['height', 'width', 'channel']}
+    features.update({
+        'observation.state': {'dtype': 'float32', 'shape': [8], 'names': ['state']},
+        'action': {'dtype': 'float32', 'shape': [7], 'names': ['actions']},
+        'timestamp': {'dtype': 'float32', 'shape': [1], 'names': None},
+        'frame_index': {'dtype': 'int64', 'shape': [1], 'names': None},
+        'episode_index': {'dtype': 'int64', 'shape': [1], 'names': None},
+        'index': {'dtype': 'int64', 'shape': [1], 'names': None},
+        'task_index': {'dtype': 'int64', 'shape': [1], 'names': None},
+    })
+    info = {
+        'codebase_version': 'v3.0',
+        'robot_type': 'panda',
+        'total_episodes': int(num_episodes),
+        'total_frames': int(global_index),
+        'total_tasks': len(tasks),
+        'chunks_size': chunks_size,
+        'data_files_size_in_mb': 100,
+        'video_files_size_in_mb': 500,
+        'fps': fps,
+        'splits': {'train': f'0:{num_episodes}'},
+        'data_path': DATA_PATH_TEMPLATE,
+        'video_path': VIDEO_PATH_TEMPLATE,
+        'features': features,
+    }
+    with open(meta_dir / 'info.json', 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=4, ensure_ascii=False)
+    
+    return root
+
+
+class _SyntheticMeta:
+    """与 LeRobotDatasetMetadata 对应的最小元数据（info / tasks / episodes）"""
+    
+    def __init__(self, root: Path):
+        import pandas as pd
+        import pyarrow.parquet as pq
+        
+        with open(root / 'meta' / 'info.json', 'r', encoding='utf-8') as f:
+            self.info = json.load(f)
+        self.tasks = pd.read_parquet(root / 'meta' / 'tasks.parquet')
+        self.episodes = pq.read_table(root / EPISODES_PATH).to_pydict()
+        self.features = self.info['features']
+        self.fps = self.info['fps']
+        self.robot_type = self.info.get('robot_type')
+        self.camera_keys = [k for k, v in self.features.items() if v['dtype'] in ('image', 'video')]
+        self.total_episodes = self.info['total_episodes']
+        self.total_frames = self.info['total_frames']
+
+
+class SyntheticLeRobotDataset:
+    """
+    不依赖lerobot的本地v3数据集读取器（仅支持Parquet内嵌图像）
+    
+    dataset[i] 的返回值与 LeRobotDataset 一致：图像为 float32 CHW [0,1] Tensor，
+    低维列为Tensor，'task' 为任务描述。
+    """
+    
+    def __init__(self, root):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from gripper_detector import find_parquet_data_files, _column_to_numpy
+        
+        self.root = Path(root)
+        self.repo_id = self.root.name
+        self.episodes = None
+        self.hf_dataset = None
+        self.meta = _SyntheticMeta(self.root)
+        self.fps = self.meta.fps
+        
+        table = pa.concat_tables([pq.read_table(p) for p in find_parquet_data_files(self.root)])
+        self._images = {key: table.column(key).combine_chunks().field('bytes')
+                        for key in self.meta.camera_keys if key in table.column_names}
+        self._columns = {name: _column_to_numpy(table.column(name))
+                         for name in table.column_names if name not in self._images}
+        self._task_names = [str(name) for name in self.meta.tasks.index]
+    
+    def __len__(self) -> int:
+        return len(self._columns['index'])
+    
+    def __getitem__(self, idx) -> Dict:
+        from PIL import Image
+        
+        idx = int(idx)
+        item = {}
+        for key, images in self._images.items():
+            pixels = np.asarray(Image.open(io.BytesIO(images[idx].as_py())).convert('RGB'))
+            item[key] = torch.from_numpy(pixels).permute(2, 0, 1).float() / 255.0
+        for name, column in self._columns.items():
+            item[name] = torch.as_tensor(column[idx])
+        item['task'] = self._task_names[int(self._columns['task_index'][idx])]
+        return item
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='生成合成LeRobot v3数据集')
+    parser.add_argument('output', type=str, help='输出目录')
+    parser.add_argument('--num-episodes', type=int, default=10)
+    parser.add_argument('--episode-length', type=int, default=200)
+    parser.add_argument('--pick-place-period', type=int, default=40)
+    parser.add_argument('--image-size', type=int, default=64)
+    parser.add_argument('--num-cameras', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--overwrite', action='store_true')
+    args = parser.parse_args()
+    
+    root = generate_synthetic_dataset(args.output, args.num_episodes, args.episode_length,
+                                      args.pick_place_period, args.image_size, args.num_cameras,
+                                      seed=args.seed, overwrite=args.overwrite)
+    print(f"✓ 合成数据集已生成: {root}")
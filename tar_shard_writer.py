@@ -0,0 +1,132 @@
+"""
+图片模式的tar分片写出（WebDataset风格）：每个episode的图像和元数据依次追加到按大小滚动的tar文件
+
+分片中的成员名为 episode_XXXX/frame_YYYY.cam1.jpg、episode_XXXX/frame_YYYY.cam2.jpg、
+episode_XXXX/frame_YYYY.json（WebDataset按第一个点之前的部分把同一帧的两路相机和json归为一个样本）。
+分片中只有帧样本；episode级元数据和每个episode在分片中的字节范围记录在 shards/index.json。
+"""
+import io
+import json
+import tarfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+SHARD_PATH = 'shards/shard-{shard_index:06d}.tar'
+SHARD_INDEX_PATH = 'shards/index.json'
+DEFAULT_SHARD_SIZE_MB = 1000
+
+
+def _member_bytes(size: int) -> int:
+    """一个成员在tar中占用的字节数（512字节头 + 按512字节对齐的数据）"""
+    return tarfile.BLOCKSIZE + (size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+
+
+def _closed_size(offset: int) -> int:
+    """写到 offset 处的tar关闭后的文件大小（两个512字节的结束块，再按 RECORDSIZE 补齐）"""
+    end = offset + 2 * tarfile.BLOCKSIZE
+    return (end + tarfile.RECORDSIZE - 1) // tarfile.RECORDSIZE * tarfile.RECORDSIZE
+
+
+class TarShardWriter:
+    """
+    按大小滚动的tar分片：连续episode的成员顺序写入当前分片，
+    加上下一个episode会超过大小上限时换到下一个分片（episode不跨分片，单个episode超过上限时独占一个分片）
+    
+    大小上限按分片关闭后的文件大小判断：当前写入位置、新成员的头和对齐填充，以及tar结尾的结束块和记录填充
+    
+    用法:
+        writer = TarShardWriter(output_dir, max_shard_mb=1000)
+        writer.write_episode('episode_0000', [('frame_0000.cam1.jpg', data), ...], episode_info)
+        ...
+        writer.close()  # 写出 shards/index.json
+    """
+    
+    def __init__(self, root, max_shard_mb: float = DEFAULT_SHARD_SIZE_MB):
+        """
+        Args:
+            root: 数据集根目录
+            max_shard_mb: 单个分片的大小上限（MB）
+        """
+        self.root = Path(root)
+        self.max_shard_bytes = max_shard_mb * 1024 ** 2
+        self.shards: List[Dict] = []
+        self.episodes: List[Dict] = []
+        self._tar: Optional[tarfile.TarFile] = None
+        self._mtime = int(time.time())
+    
+    def _open_next_shard(self):
+        self._close_shard()
+        path = self.root / SHARD_PATH.format(shard_index=len(self.shards))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._tar = tarfile.open(path, 'w', format=tarfile.USTAR_FORMAT)
+        self.shards.append({'shard': path.name, 'num_episodes': 0, 'num_frames': 0, 'num_bytes': 0})
+    
+    def _close_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+            shard = self.shards[-1]
+            shard['num_bytes'] = (self.root / SHARD_PATH.format(shard_index=len(self.shards) - 1)).stat().st_size
+    
+    def _add_member(self, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = self._mtime
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(data))
+    
+    def write_episode(self, key: str, members: List[Tuple[str, bytes]], record: Dict) -> Dict:
+        """
+        追加一个episode
+        
+        Args:
+            key: episode目录名（成员名前缀），如 episode_0000
+            members: [(相对key的成员名, 数据), ...]（同一样本的成员需连续排列）
+            record: episode元数据，去掉逐帧列表 'frames' 后记录在索引项的 'metadata' 中
+                    （不写入分片，分片中只有帧样本）
+        
+        Returns:
+            该episode的索引项 {key, shard, offset, num_bytes, num_frames, metadata}
+        """
+        size = sum(_member_bytes(len(data)) for _, data in members)
+        if self._tar is None or (self.shards[-1]['num_episodes'] > 0 and
+                                 _closed_size(self._tar.fileobj.tell() + size) > self.max_shard_bytes):
+            self._open_next_shard()
+        
+        offset = self._tar.fileobj.tell()
+        for name, data in members:
+            self._add_member(f'{key}/{name}', data)
+        
+        shard = self.shards[-1]
+        entry = {
+            'key': key,
+            'shard': shard['shard'],
+            'offset': offset,
+            'num_bytes': self._tar.fileobj.tell() - offset,
+            'num_frames': record.get('num_frames', 0),
+            'metadata': {k: v for k, v in record.items() if k != 'frames'},
+        }
+        shard['num_episodes'] += 1
+        shard['num_frames'] += entry['num_frames']
+        self.episodes.append(entry)
+        return entry
+    
+    def close(self) -> Path:
+        """结束当前分片并写出索引文件"""
+        self._close_shard()
+        index_path = self.root / SHARD_INDEX_PATH
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'total_shards': len(self.shards),
+                'total_episodes': len(self.episodes),
+                'shards': self.shards,
+                'episodes': self.episodes,
+            }, f, indent=2, ensure_ascii=False)
+        return index_path
+
+
+if __name__ == '__main__':
+    print("Tar Shard Writer Module")
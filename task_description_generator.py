@@ -18,6 +18,12 @@ except ImportError:
 import numpy as np
 import torch
 
+# VLM上下文使用的两路相机
+FRAME_IMAGE_KEYS = ['observation.images.image', 'observation.images.image2']
+
+# VLM读帧的独立row group缓存上限（MB，共享缓存未开启图像缓存时使用）
+FRAME_IMAGE_CACHE_MB = 64
+
 
 class LLMProvider(ABC):
     """LLM提供者基类"""
@@ -572,6 +578,11 @@ class TaskDescriptionGenerator:
         
         total = len(frame_ranges)
         
+        # VLM需要的首/尾/关键帧图像优先从源Parquet读取（经过row group缓存，同一row group只读取一次）
+        frame_reader = None
+        if isinstance(self.llm, GPTVLM) and dataset is not None:
+            frame_reader = self._get_frame_reader(dataset)
+        
         for i in range(start_index, total):
             frame_range = frame_ranges[i]
             
@@ -598,9 +609,9 @@ class TaskDescriptionGenerator:
                             end_idx = int(frame_range['frame_end']) - 1
                             key_idx = int(frame_range['keyframe_index'])
                             
-                            first_item = dataset[start_idx]
-                            last_item = dataset[end_idx]
-                            key_item = dataset[key_idx]
+                            first_item = self._fetch_frame_images(dataset, frame_reader, start_idx)
+                            last_item = self._fetch_frame_images(dataset, frame_reader, end_idx)
+                            key_item = self._fetch_frame_images(dataset, frame_reader, key_idx)
                             
                             # Cam1 图像
                             context['first_frame_cam1'] = first_item['observation.images.image']
@@ -648,6 +659,8 @@ class TaskDescriptionGenerator:
                 raise
         
         print(f"✓ 任务描述生成完成")
+        if frame_reader is not None:
+            frame_reader.cache.print_stats()
         
         # 保存最终检查点
         if checkpoint_dir:
@@ -655,6 +668,37 @@ class TaskDescriptionGenerator:
         
         return result
     
+    @staticmethod
+    def _get_frame_reader(dataset):
+        """
+        源Parquet读取器（包含两路相机的图像列时才使用），不可用时返回None
+        
+        共享缓存不缓存图像列时使用独立的小缓存：同一范围的首/尾/关键帧通常落在相同的row group，
+        只需读取一次
+        """
+        from parquet_range_reader import ParquetRangeReader, RowGroupCache, shared_row_group_cache
+        
+        cache = shared_row_group_cache()
+        if cache.enabled and not cache.cache_images:
+            cache = RowGroupCache(FRAME_IMAGE_CACHE_MB, cache_images=True)
+        reader = ParquetRangeReader.for_dataset(dataset, cache=cache)
+        if reader is not None and not set(FRAME_IMAGE_KEYS) <= set(reader.column_names):
+            return None
+        return reader
+    
+    @staticmethod
+    def _fetch_frame_images(dataset, reader, index: int) -> Dict:
+        """读取一帧的两路相机图像（优先经过row group缓存读取源Parquet，失败时使用 dataset[index]）"""
+        if reader is not None:
+            try:
+                from parquet_range_reader import decode_image
+                
+                table = reader.read_range(index, index + 1, columns=FRAME_IMAGE_KEYS)
+                return {key: decode_image(table.column(key)[0]['bytes'].as_py()) for key in FRAME_IMAGE_KEYS}
+            except Exception as e:
+                print(f"⚠️  从源Parquet读取帧 {index} 失败，改用 dataset[{index}]: {e}")
+        return dataset[index]
+    
     def _save_checkpoint(self, checkpoint_dir, completed_ranges, last_index, total, error=False, final=False):
         """保存检查点"""
         from pathlib import Path
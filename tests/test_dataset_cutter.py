@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+测试数据集裁剪：源Parquet按范围直接读取与逐帧读取结果一致，批处理流水线保持顺序
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# 添加路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cut_pipeline import AsyncWriterPool, StagedPipeline, MemoryBudgetBatcher
+from dataset_cutter import DatasetCutter
+from synthetic_dataset import generate_synthetic_dataset, SyntheticLeRobotDataset
+
+
+def _make_dataset(tmp: str, **kwargs) -> SyntheticLeRobotDataset:
+    options = dict(num_episodes=6, episode_length=40, pick_place_period=10, image_size=16,
+                   num_cameras=2, max_frames_per_file=90)
+    options.update(kwargs)
+    return SyntheticLeRobotDataset(generate_synthetic_dataset(Path(tmp) / 'source', **options))
+
+
+def _frame_ranges(dataset):
+    """每个episode取两个范围（跨文件的episode也包含在内）"""
+    table = dataset.meta.episodes
+    ranges = []
+    for ep, start, end in zip(table['episode_index'], table['dataset_from_index'], table['dataset_to_index']):
+        for frame_start, frame_end in [(start + 2, start + 15), (end - 12, end)]:
+            ranges.append({'frame_start': frame_start, 'frame_end': frame_end, 'episode_index': ep,
+                           'action_type': 'pick', 'keyframe_index': frame_start + 5,
+                           'task': 'put the bowl on the plate', 'new_task': f'segment of {ep}'})
+    return ranges
+
+
+def _assert_frames_equal(expected, actual):
+    assert len(expected) == len(actual)
+    for a, b in zip(expected, actual):
+        assert a.keys() == b.keys()
+        for key in a:
+            assert np.array_equal(np.asarray(a[key]), np.asarray(b[key])), key
+
+
+def test_direct_read_matches_frame_read():
+    """整段读取源Parquet与逐帧 dataset[i] 提取的帧完全一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)
+        
+        direct = DatasetCutter(Path(tmp) / 'out', save_mode='image', direct_read=True)
+        reader = direct._get_range_reader(dataset)
+        assert len(reader.spans) > 1
+        # 跨文件的范围按全局索引顺序拼接
+        assert reader.read_range(50, 200, ['index']).column('index').to_pylist() == list(range(50, 200))
+        
+        per_frame = DatasetCutter(Path(tmp) / 'out', save_mode='image', direct_read=False)
+        
+        _assert_frames_equal(per_frame.extract_frames_batch(dataset, frame_ranges, verbose=False),
+                             direct.extract_frames_batch(dataset, frame_ranges, verbose=False))
+
+
+def test_signal_store_serves_low_dim_columns():
+    """已物化信号存储时，低维列从存储切片读取，结果与逐帧读取一致"""
+    from signal_store import SignalStore
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)
+        expected = DatasetCutter(Path(tmp) / 'out', save_mode='image', direct_read=False).extract_frames_batch(
+            dataset, frame_ranges, verbose=False)
+        
+        SignalStore.materialize(dataset.root)
+        cutter = DatasetCutter(Path(tmp) / 'out', save_mode='image', direct_read=True)
+        cutter._get_range_reader(dataset)
+        store = cutter._signal_store
+        assert store is not None
+        
+        sliced = []
+        original_slice = store.slice
+        store.slice = lambda name, start, end: sliced.append(name) or original_slice(name, start, end)
+        frames = cutter.extract_frames_batch(dataset, frame_ranges, verbose=False)
+        
+        _assert_frames_equal(expected, frames)
+        assert set(sliced) == {'observation.state', 'action', 'timestamp', 'frame_index', 'episode_index',
+                               'task_index'}
+
+
+def test_image_passthrough_copies_source_bytes():
+    """直通模式：图片模式原样写出源PNG字节；需要像素时解码结果与逐帧读取一致"""
+    from parquet_range_reader import EncodedImage
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)[:3]
+        reader = DatasetCutter(Path(tmp) / 'out', save_mode='image')._get_range_reader(dataset)
+        source = reader.read_range(0, len(dataset), ['observation.images.image']).column(
+            'observation.images.image').combine_chunks().field('bytes')
+        
+        cutter = DatasetCutter(Path(tmp) / 'out', save_mode='image', image_passthrough=True)
+        frames = cutter.extract_frames_batch(dataset, frame_ranges, verbose=False)
+        assert isinstance(frames[0]['observation.images.image'], EncodedImage)
+        
+        reference = DatasetCutter(Path(tmp) / 'out', save_mode='image', direct_read=False)
+        expected = reference.extract_frames_batch(dataset, frame_ranges, verbose=False)
+        for a, b in zip(expected, frames):
+            assert np.array_equal(DatasetCutter._tensor_to_numpy_image(a['observation.images.image2']),
+                                  DatasetCutter._tensor_to_numpy_image(b['observation.images.image2']))
+        
+        cutter.save_as_image_format(cutter.organize_by_episode(frames), frame_ranges)
+        first_frame = Path(tmp) / 'out' / 'images' / 'episode_0000' / 'frame_cam1_0000.png'
+        assert first_frame.read_bytes() == source[frame_ranges[0]['frame_start']].as_py()
+
+
+
+def test_overlapping_ranges_share_source_frames():
+    """重叠范围的并集只读取一次：共享帧在各范围间共享内存，内容与逐帧读取一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        ranges = _frame_ranges(dataset)[:2]
+        # 与第一个范围重叠的 pick/place 窗口
+        ranges.insert(1, dict(ranges[0], frame_start=ranges[0]['frame_start'] + 5,
+                              frame_end=ranges[0]['frame_end'] + 10, action_type='place'))
+        
+        cutter = DatasetCutter(Path(tmp) / 'out', save_mode='image')
+        reader = cutter._get_range_reader(dataset)
+        reads = []
+        read_range = reader.read_range
+        reader.read_range = lambda start, end, columns=None: reads.append((start, end)) or read_range(start, end, columns)
+        
+        frames = cutter.extract_frames_batch(dataset, ranges, verbose=False)
+        # 读取互不重叠，且覆盖所有范围
+        assert all(a[1] <= b[0] for a, b in zip(sorted(reads), sorted(reads)[1:]))
+        for r in ranges:
+            assert any(start <= r['frame_start'] and r['frame_end'] <= end for start, end in reads)
+        
+        by_range = cutter.organize_by_episode(frames)
+        assert [len(by_range[i]['frames']) for i in range(3)] == [r['frame_end'] - r['frame_start'] for r in ranges]
+        shared = ranges[0]['frame_end'] - ranges[1]['frame_start']
+        for a, b in zip(by_range[0]['frames'][-shared:], by_range[1]['frames'][:shared]):
+            assert a['original_index'] == b['original_index']
+            assert np.shares_memory(a['observation.images.image'], b['observation.images.image'])
+            assert (a['cut_range_id'], b['cut_range_id']) == (0, 1)
+        
+        expected = DatasetCutter(Path(tmp) / 'out', save_mode='image', direct_read=False).extract_frames_batch(
+            dataset, ranges, verbose=False)
+        _assert_frames_equal(expected, frames)
+
+
+def test_ranges_are_contiguous_arrays():
+    """每个范围为整段连续数组：图像 [T, H, W, 3] uint8，state [T, 8]，action [T, 7]；两种读取方式结果一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        ranges = _frame_ranges(dataset)[:2]
+        ranges.insert(1, dict(ranges[0], frame_start=ranges[0]['frame_start'] + 5,
+                              frame_end=ranges[0]['frame_end'] + 10, action_type='place'))
+        
+        direct = DatasetCutter(Path(tmp) / 'out', save_mode='image').extract_ranges_batch(dataset, ranges, verbose=False)
+        per_frame = DatasetCutter(Path(tmp) / 'out', save_mode='image', direct_read=False).extract_ranges_batch(
+            dataset, ranges, verbose=False)
+        
+        for range_id, r in enumerate(ranges):
+            arrays = direct[range_id]['arrays']
+            length = r['frame_end'] - r['frame_start']
+            assert arrays['observation.images.image'].shape == (length, 16, 16, 3)
+            assert arrays['observation.images.image'].dtype == np.uint8
+            assert arrays['observation.state'].shape == (length, 8)
+            assert arrays['action'].shape == (length, 7)
+            assert direct[range_id]['original_index'].tolist() == list(range(r['frame_start'], r['frame_end']))
+            for key, values in arrays.items():
+                assert np.array_equal(values, per_frame[range_id]['arrays'][key]), key
+        
+        # 重叠的两个范围是同一块并集数组的视图；编码时共享帧只编码一次
+        assert np.shares_memory(direct[0]['arrays']['observation.images.image'],
+                                direct[1]['arrays']['observation.images.image'])
+        cutter = DatasetCutter(Path(tmp) / 'out', save_mode='image')
+        cutter._convert_episode_images(direct, 'encoded')
+        shared = ranges[0]['frame_end'] - ranges[1]['frame_start']
+        assert direct[0]['arrays']['observation.images.image2'][-1] is direct[1]['arrays']['observation.images.image2'][shared - 1]
+        
+        placeholder = cutter._create_placeholder_frame(per_frame[2]['frames'][-1], 0, 100, 0)
+        assert placeholder['action'].tolist() == [-999.0] * 7
+        assert not np.shares_memory(placeholder['observation.state'], per_frame[2]['arrays']['observation.state'])
+
+
+def test_images_stay_uint8():
+    """逐帧读取（float32 CHW）在读取时转换为 uint8 HWC，批次中图像内存为 T*H*W*3 字节，且转换无损"""
+    pixels = np.random.default_rng(0).integers(0, 256, size=(3, 32, 32), dtype=np.uint8)
+    restored = DatasetCutter._tensor_to_numpy_image(pixels.astype(np.float32) / 255.0)
+    assert restored.dtype == np.uint8 and np.array_equal(restored, pixels.transpose(1, 2, 0))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        ranges = _frame_ranges(dataset)[:2]
+        for direct_read in [True, False]:
+            cutter = DatasetCutter(Path(tmp) / 'out', save_mode='image', direct_read=direct_read)
+            episodes = cutter.extract_ranges_batch(dataset, ranges, verbose=False)
+            for episode_data in episodes.values():
+                images = episode_data['arrays']['observation.images.image']
+                assert images.dtype == np.uint8
+                assert images.nbytes == len(episode_data['frames']) * 16 * 16 * 3
+
+
+def test_read_plan_follows_file_and_row_group_order():
+    """读取计划按文件、row group顺序排列，共享row group的区间合并为一次读取；输出仍按 cut_range_id 顺序"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp, row_group_size=10)
+        reader = DatasetCutter(Path(tmp) / 'out', save_mode='image')._get_range_reader(dataset)
+        second_file = reader.spans[1].start
+        
+        intervals = [(second_file + 1, second_file + 3), (31, 35), (2, 5), (6, 12)]
+        assert reader.plan_reads(intervals) == [(2, 12, [2, 3]), (31, 35, [1]),
+                                                (second_file + 1, second_file + 3, [0])]
+        
+        # 范围按检测顺序（跨文件乱序）给出
+        ranges = [dict(r, frame_start=s, frame_end=e) for r, (s, e) in zip(_frame_ranges(dataset), intervals)]
+        cutter = DatasetCutter(Path(tmp) / 'out', save_mode='image')
+        frames = cutter.extract_frames_batch(dataset, ranges, verbose=False)
+        assert [f['cut_range_id'] for f in frames] == [k for k, (s, e) in enumerate(intervals) for _ in range(s, e)]
+        assert [f['original_index'] for f in frames] == [i for s, e in intervals for i in range(s, e)]
+
+
+def test_row_group_cache_shared_with_description_generator():
+    """row group缓存：重复读取命中缓存，超出上限按LRU淘汰，任务描述生成与裁剪共享同一缓存"""
+    from parquet_range_reader import ParquetRangeReader, RowGroupCache, configure_row_group_cache
+    from task_description_generator import TaskDescriptionGenerator
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp, row_group_size=10)
+        uncached = ParquetRangeReader(dataset.root, cache=RowGroupCache(max_mb=0))
+        
+        cache = RowGroupCache(max_mb=64)
+        reader = ParquetRangeReader(dataset.root, cache=cache)
+        assert reader.read_range(5, 25, ['action', 'index']).equals(uncached.read_range(5, 25, ['action', 'index']))
+        assert (cache.hits, cache.misses) == (0, 3)
+        reader.read_range(12, 18, ['action'])
+        assert (cache.hits, cache.misses) == (1, 3)
+        # 图像列默认不缓存，也不计入命中/未命中
+        reader.read_range(12, 18, ['observation.images.image'])
+        assert (cache.hits, cache.misses) == (1, 3)
+        
+        # 上限只够两个row group：最久未使用的被淘汰
+        one_row_group = cache.nbytes / 3
+        small = RowGroupCache(max_mb=2.5 * one_row_group / 1024 ** 2)
+        small_reader = ParquetRangeReader(dataset.root, cache=small)
+        small_reader.read_range(0, 30, ['action', 'index'])
+        assert small.evictions == 1 and small.stats()['row_groups'] == 2
+        small_reader.read_range(0, 5, ['action', 'index'])
+        assert small.misses == 4
+        
+        # 共享缓存：描述生成读取的帧，裁剪时直接命中
+        shared = configure_row_group_cache(64, cache_images=True)
+        frame_reader = TaskDescriptionGenerator._get_frame_reader(dataset)
+        images = TaskDescriptionGenerator._fetch_frame_images(dataset, frame_reader, 33)
+        expected = dataset[33]['observation.images.image2']
+        assert np.array_equal(images['observation.images.image2'], DatasetCutter._tensor_to_numpy_image(expected))
+        
+        cutter = DatasetCutter(Path(tmp) / 'out', save_mode='image')
+        cutter._get_range_reader(dataset).read_range(30, 40, ['observation.images.image'])
+        assert shared.hits == 1
+        configure_row_group_cache(256)
+
+
+def test_description_frames_read_each_row_group_once():
+    """共享缓存不缓存图像时，描述生成使用独立的图像缓存：同一row group中的首/尾/关键帧只读取一次"""
+    import pyarrow.parquet as pq
+    from parquet_range_reader import configure_row_group_cache
+    from task_description_generator import TaskDescriptionGenerator
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp, row_group_size=10)
+        configure_row_group_cache(256)
+        frame_reader = TaskDescriptionGenerator._get_frame_reader(dataset)
+        
+        reads = []
+        original_read = pq.ParquetFile.read_row_group
+        pq.ParquetFile.read_row_group = lambda self, i, **kwargs: reads.append(i) or original_read(self, i, **kwargs)
+        try:
+            images = [TaskDescriptionGenerator._fetch_frame_images(dataset, frame_reader, index)
+                      for index in [2, 9, 5, 12]]
+        finally:
+            pq.ParquetFile.read_row_group = original_read
+        
+        assert reads == [0, 1]
+        for index, frame in zip([2, 9, 5, 12], images):
+            expected = DatasetCutter._tensor_to_numpy_image(dataset[index]['observation.images.image'])
+            assert np.array_equal(frame['observation.images.image'], expected)
+
+
+def test_pipeline_preserves_order_and_propagates_errors():
+    """多线程阶段乱序完成时 sink 仍按输入顺序收到结果；阶段异常在 run() 中重新抛出"""
+    def slow_square(x):
+        time.sleep(0.001 * ((7 * x) % 5))
+        return x * x
+    
+    pipeline = StagedPipeline([('square', slow_square, 4), ('negate', lambda x: -x, 3)], queue_size=1)
+    results = []
+    pipeline.run(range(50), results.append, total=50)
+    assert results == [-x * x for x in range(50)]
+    assert pipeline.stats['square']['items'] == pipeline.stats['sink']['items'] == 50
+    
+    def fail_on_seven(x):
+        if x == 7:
+            raise ValueError('bad item')
+        return x
+    
+    try:
+        StagedPipeline([('check', fail_on_seven, 2)]).run(range(1000), lambda x: None)
+    except ValueError as e:
+        assert str(e) == 'bad item'
+    else:
+        raise AssertionError('流水线未抛出阶段异常')
+
+
+def test_batch_pipeline_matches_serial_extraction():
+    """流水线按批次顺序交付，转换阶段的图像与逐帧读取一致"""
+    from parquet_range_reader import EncodedImage
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)
+        expected = DatasetCutter(Path(tmp) / 'out', save_mode='image', direct_read=False).extract_frames_batch(
+            dataset, frame_ranges, verbose=False)
+        
+        for target in ['numpy', 'encoded']:
+            cutter = DatasetCutter(Path(tmp) / 'out', save_mode='image', batch_size=3,
+                                   read_workers=2, convert_workers=2)
+            pipeline, batches = cutter._build_batch_pipeline(dataset, frame_ranges, len(frame_ranges), target)
+            delivered = []
+            pipeline.run(batches, delivered.append, total=len(batches))
+            
+            assert [spec for spec, _ in delivered] == batches
+            frames = [frame for _, episodes_data in delivered
+                      for _, episode_data in sorted(episodes_data.items()) for frame in episode_data['frames']]
+            assert len(frames) == len(expected)
+            for a, b in zip(expected, frames):
+                image = b['observation.images.image']
+                assert isinstance(image, np.ndarray if target == 'numpy' else EncodedImage)
+                assert np.array_equal(DatasetCutter._tensor_to_numpy_image(a['observation.images.image']),
+                                      DatasetCutter._tensor_to_numpy_image(image))
+
+
+def test_memory_budget_batches_follow_measured_size_and_rss():
+    """按实测每帧字节数划分批次；RSS接近预算时缩小批次，回落后逐步恢复"""
+    gb = 1024 ** 3
+    rss = [0]
+    batcher = MemoryBudgetBatcher([10] * 100, budget_gb=1.0, batches_in_flight=2)
+    batcher._rss = lambda: rss[0]
+    batcher._baseline = 0
+    
+    batches = iter(batcher)
+    assert next(batches) == (0, 1)  # 第一批只有一个范围，用于测量
+    batcher.observe(10, 10 * gb // 100)  # 每帧 1/100 GB -> 单批 0.5 GB = 50 帧
+    assert next(batches) == (1, 6)
+    
+    rss[0] = int(0.9 * gb)
+    assert next(batches) == (6, 8)  # 缩小一半：25 帧
+    assert next(batches) == (8, 9)
+    rss[0] = int(0.1 * gb)
+    start, end = next(batches)
+    assert (start, end) == (9, 10) and batcher.scale == 0.25 * 1.25
+    
+    # 批次内容变大时立即按新的测量值缩小
+    batcher.observe(10, 10 * gb // 25)
+    start, end = next(batches)
+    assert end - start == 1
+    assert sum(batcher.batch_sizes) == end
+
+
+def test_memory_budget_empty_probe_does_not_stall():
+    """第一批没有帧时不等待测量超时，在有测量结果之前使用固定的批次大小"""
+    batcher = MemoryBudgetBatcher([10] * 20, budget_gb=1.0, probe_timeout=30, fallback_batch_size=4)
+    batches = iter(batcher)
+    assert next(batches) == (0, 1)
+    batcher.observe(0, 0)
+    
+    start_time = time.perf_counter()
+    assert next(batches) == (1, 5)
+    assert time.perf_counter() - start_time < 5
+    
+    # 有了测量结果后按内存预算划分
+    batcher.observe(10, 10 * 1024 ** 3 // 100)
+    start, end = next(batches)
+    assert start == 5 and end - start != 4
+
+
+def test_memory_budget_pipeline_covers_all_ranges():
+    """设置内存预算时流水线按需划分批次，仍按顺序覆盖所有范围"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)
+        cutter = DatasetCutter(Path(tmp) / 'out', save_mode='image', memory_budget_gb=64)
+        pipeline, batches = cutter._build_batch_pipeline(dataset, frame_ranges, len(frame_ranges), 'encoded')
+        delivered = []
+        cutter._run_batch_pipeline(pipeline, batches, delivered.append)
+        
+        assert delivered[0][0] == (0, 1)
+        assert [spec[1] for spec, _ in delivered][-1] == len(frame_ranges)
+        assert all(a[0][1] == b[0][0] for a, b in zip(delivered, delivered[1:]))
+        assert sorted(k for _, episodes_data in delivered for k in episodes_data) == list(range(len(frame_ranges)))
+        assert batches.bytes_per_frame > 16 * 16 * 3 * 2
+
+
+def test_memory_budget_ignores_noop_conversion():
+    """转换阶段没有分配新数组时（像素数组转 'numpy'），测得的批次字节数与读取阶段相同，不重复计入"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)
+        cutter = DatasetCutter(Path(tmp) / 'out', save_mode='image', memory_budget_gb=64)
+        pipeline, batches = cutter._build_batch_pipeline(dataset, frame_ranges, len(frame_ranges), 'numpy')
+        
+        observed = []
+        observe = batches.observe
+        
+        def record(frames, nbytes):
+            observed.append((frames, nbytes))
+            observe(frames, nbytes)
+        
+        batches.observe = record
+        cutter._run_batch_pipeline(pipeline, batches, lambda batch: None)
+        
+        # 每个批次在读取和转换阶段各测量一次，两次结果相同
+        observed.sort()
+        assert len(observed) == 2 * len(batches.batch_sizes)
+        assert observed[0::2] == observed[1::2]
+
+
+def test_frame_writer_matches_hf_dataset_parquet():
+    """pyarrow直接写出的帧Parquet与 datasets.Dataset.from_dict(...).to_parquet 的表和schema元信息一致"""
+    import pyarrow.parquet as pq
+    from datasets import Dataset, Features, Image as HFImage, Sequence, Value
+    from parquet_episode_writer import EpisodeParquetWriter, build_frame_table, encode_png
+    from parquet_range_reader import EncodedImage
+    
+    rng = np.random.default_rng(0)
+    count = 5
+    images = rng.integers(0, 256, size=(count, 16, 16, 3), dtype=np.uint8)
+    columns = {
+        'observation.images.image': list(images),
+        'observation.images.image2': [EncodedImage(encode_png(image)) for image in images[::-1]],
+        'observation.state': rng.random((count, 8), dtype=np.float32),
+        'action': rng.random((count, 7), dtype=np.float32),
+        'timestamp': np.arange(count, dtype=np.float32) / 10,
+        'episode_index': np.full(count, 3),
+        'frame_index': np.array([0, 1, 2, 3, -1]),
+        'index': np.arange(10, 10 + count),
+        'task_index': np.full(count, 1),
+    }
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        with EpisodeParquetWriter(Path(tmp) / 'arrow.parquet') as writer:
+            writer.write(build_frame_table(columns))
+        
+        features = Features({
+            'observation.images.image': HFImage(),
+            'observation.images.image2': HFImage(),
+            'observation.state': Sequence(Value('float32')),
+            'action': Sequence(Value('float32')),
+            'timestamp': Value('float32'),
+            'episode_index': Value('int64'),
+            'frame_index': Value('int64'),
+            'index': Value('int64'),
+            'task_index': Value('int64'),
+        })
+        data = {key: [v.tolist() if isinstance(v, np.ndarray) and v.ndim else v for v in values]
+                for key, values in columns.items()}
+        data['observation.images.image'] = [Image.fromarray(image) for image in images]
+        data['observation.images.image2'] = [{'bytes': image.data, 'path': None}
+                                             for image in columns['observation.images.image2']]
+        Dataset.from_dict(data, features=features).to_parquet(str(Path(tmp) / 'hf.parquet'))
+        
+        expected = pq.read_table(Path(tmp) / 'hf.parquet')
+        actual = pq.read_table(Path(tmp) / 'arrow.parquet')
+        assert actual.equals(expected, check_metadata=True)
+
+
+def test_rolling_writer_packs_whole_episodes_by_size():
+    """连续episode打包进按大小滚动的 chunk-XXX/file-YYY 文件，episode不跨文件，起始行与文件内容一致"""
+    import pyarrow.parquet as pq
+    from parquet_episode_writer import DATA_PATH, RollingParquetWriter, build_frame_table
+    
+    def episode_table(episode_index, count):
+        return build_frame_table({
+            'observation.images.image': [bytes(2000)] * count,
+            'observation.images.image2': [bytes(2000)] * count,
+            'observation.state': np.zeros((count, 8), dtype=np.float32),
+            'action': np.zeros((count, 7), dtype=np.float32),
+            'timestamp': np.zeros(count, dtype=np.float32),
+            'episode_index': np.full(count, episode_index),
+            'frame_index': np.arange(count),
+            'index': np.arange(count),
+            'task_index': np.zeros(count, dtype=np.int64),
+        })
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        lengths = [10, 12, 5, 40, 8, 12]
+        with RollingParquetWriter(tmp, max_file_mb=0.1, chunks_size=2) as writer:
+            locations = [writer.write_episode(episode_table(ep, n)) for ep, n in enumerate(lengths)]
+        
+        # 约4KB/帧、上限约105KB：超过上限前换文件，单个超大episode独占一个文件
+        assert [loc[:2] for loc in locations] == [(0, 0), (0, 0), (0, 1), (1, 0), (1, 1), (1, 1)]
+        assert writer.num_files == 4
+        for ep, ((chunk, file, row_offset), count) in enumerate(zip(locations, lengths)):
+            table = pq.read_table(Path(tmp) / DATA_PATH.format(chunk_index=chunk, file_index=file))
+            rows = table.slice(row_offset, count).column('episode_index').to_pylist()
+            assert rows == [ep] * count
+
+
+def test_writer_pool_runs_tasks_and_propagates_errors():
+    """写出线程池执行全部任务；任务异常在下一次提交或关闭时重新抛出"""
+    results = []
+    with AsyncWriterPool(workers=3, queue_size=2) as pool:
+        for x in range(40):
+            pool.submit(results.append, x)
+    assert sorted(results) == list(range(40))
+    assert pool.stats['items'] == 40
+    
+    def fail(x):
+        raise ValueError(f'bad {x}')
+    
+    pool = AsyncWriterPool(workers=2)
+    pool.submit(fail, 1)
+    try:
+        pool.close()
+    except ValueError as e:
+        assert str(e) == 'bad 1'
+    else:
+        raise AssertionError('写出线程池未抛出任务异常')
+
+
+def test_streaming_image_mode_matches_single_batch_save():
+    """流式图片模式（多批次、多线程写出）与一次性保存的图片文件和元数据逐字节一致，episode编号跨批次连续"""
+    from dataset_cutter import cut_and_convert_dataset
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)
+        
+        single = cut_and_convert_dataset(dataset, frame_ranges, str(Path(tmp) / 'single'), save_mode='image',
+                                         streaming=False, image_workers=1)
+        streamed = cut_and_convert_dataset(dataset, frame_ranges, str(Path(tmp) / 'streamed'), save_mode='image',
+                                           batch_size=3, image_workers=3)
+        
+        expected_files = sorted(p.relative_to(single) for p in Path(single).rglob('*') if p.is_file())
+        files = sorted(p.relative_to(streamed) for p in Path(streamed).rglob('*') if p.is_file())
+        assert files == expected_files
+        for path in files:
+            assert (Path(streamed) / path).read_bytes() == (Path(single) / path).read_bytes(), path
+        
+        summary = json.loads((Path(streamed) / 'episodes_summary.json').read_text())
+        assert [e['episode_idx'] for e in summary['episodes']] == list(range(len(frame_ranges)))
+
+
+if __name__ == '__main__':
+    test_direct_read_matches_frame_read()
+    test_signal_store_serves_low_dim_columns()
+    test_image_passthrough_copies_source_bytes()
+    test_overlapping_ranges_share_source_frames()
+    test_ranges_are_contiguous_arrays()
+    test_images_stay_uint8()
+    test_read_plan_follows_file_and_row_group_order()
+    test_row_group_cache_shared_with_description_generator()
+    test_description_frames_read_each_row_group_once()
+    test_pipeline_preserves_order_and_propagates_errors()
+    test_batch_pipeline_matches_serial_extraction()
+    test_memory_budget_batches_follow_measured_size_and_rss()
+    test_memory_budget_empty_probe_does_not_stall()
+    test_memory_budget_pipeline_covers_all_ranges()
+    test_memory_budget_ignores_noop_conversion()
+    test_frame_writer_matches_hf_dataset_parquet()
+    test_rolling_writer_packs_whole_episodes_by_size()
+    test_writer_pool_runs_tasks_and_propagates_errors()
+    test_streaming_image_mode_matches_single_batch_save()
+    print("✅ 所有测试通过！")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+测试帧范围区间索引：合并结果与逐个比较相邻范围一致，查询结果与暴力查找一致
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from frame_intervals import FrameIntervalIndex
+
+
+def _random_ranges(count: int, seed: int = 0):
+    """生成同一数据集中的随机帧范围（每个episode长200帧）"""
+    rng = np.random.default_rng(seed)
+    ranges = []
+    for i in range(count):
+        episode = int(rng.integers(0, 20))
+        start = episode * 200 + int(rng.integers(0, 180))
+        end = min(episode * 200 + 200, start + int(rng.integers(1, 60)))
+        ranges.append({'frame_start': start, 'frame_end': end, 'num_frames': end - start,
+                       'episode_index': episode, 'keyframe_index': start, 'id': i})
+    return ranges
+
+
+def _legacy_merge(ranges, min_gap):
+    """旧版 merge_adjacent_ranges：只比较相邻的范围（要求输入有序）"""
+    merged = []
+    current_range = ranges[0].copy()
+    for next_range in ranges[1:]:
+        if (current_range['episode_index'] == next_range['episode_index'] and
+                next_range['frame_start'] - current_range['frame_end'] < min_gap):
+            current_range['frame_end'] = max(current_range['frame_end'], next_range['frame_end'])
+            current_range['num_frames'] = current_range['frame_end'] - current_range['frame_start']
+        else:
+            merged.append(current_range)
+            current_range = next_range.copy()
+    merged.append(current_range)
+    return merged
+
+
+def test_merge_matches_legacy_on_sorted_input():
+    """有序输入：合并结果与旧实现一致；乱序输入：与先排序再合并一致"""
+    ranges = _random_ranges(300)
+    sorted_ranges = sorted(ranges, key=lambda r: r['frame_start'])
+    
+    for min_gap in [0, 1, 10, 50]:
+        expected = _legacy_merge(sorted_ranges, min_gap)
+        assert FrameIntervalIndex(sorted_ranges).merge(min_gap) == expected
+        assert FrameIntervalIndex(ranges).merge(min_gap) == expected
+
+
+def test_queries_match_brute_force():
+    """点查询、重叠查询和覆盖判断与暴力查找一致"""
+    ranges = _random_ranges(300, seed=1)
+    index = FrameIntervalIndex(ranges)
+    
+    frames = np.arange(0, 4000)
+    covered = index.contains(frames)
+    for frame in frames[::7].tolist():
+        expected = sorted(i for i, r in enumerate(ranges) if r['frame_start'] <= frame < r['frame_end'])
+        assert sorted(index.query_point(frame)) == expected
+        assert covered[frame] == bool(expected)
+    
+    for start, end in [(0, 50), (390, 420), (1000, 1001), (3990, 5000)]:
+        expected = sorted(i for i, r in enumerate(ranges) if r['frame_start'] < end and r['frame_end'] > start)
+        assert sorted(index.query_overlap(start, end)) == expected
+
+
+if __name__ == '__main__':
+    test_merge_matches_legacy_on_sorted_input()
+    test_queries_match_brute_force()
+    print("✅ 所有测试通过！")
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+测试夹爪检测：列式检测与逐帧检测结果一致
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# 添加路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from gripper_detector import (GripperStateDetector, EpisodeTable, StreamingGripperDetector,
+                              MultiSignalEventDetector, ActionGripperFlipRule, GripperWidthRule,
+                              ContactOnsetRule, EventRule, analyze_gripper_changes, load_low_dim_columns)
+
+
+class FakeLeRobotDataset:
+    """
+    最小的LeRobot风格数据集：低维列写入Parquet，__getitem__ 返回Tensor
+    """
+    
+    def __init__(self, root: Path, episode_lengths, seed: int = 0):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        rng = np.random.default_rng(seed)
+        self.root = root
+        self.episodes = None
+        self.meta = type('Meta', (), {})()
+        self.meta.tasks = {0: 'put the bowl on the plate', 1: 'open the drawer'}
+        
+        episode_index, frame_index, task_index, actions = [], [], [], []
+        for ep, length in enumerate(episode_lengths):
+            # 分段常值的夹爪指令：-1（打开）/ 1（关闭）
+            gripper = np.where((np.arange(length) // rng.integers(5, 15)) % 2 == 0, -1.0, 1.0)
+            action = rng.uniform(-1, 1, size=(length, 7)).astype(np.float32)
+            action[:, -1] = gripper
+            actions.append(action)
+            episode_index += [ep] * length
+            frame_index += list(range(length))
+            task_index += [ep % 2] * length
+        
+        self.actions = np.concatenate(actions)
+        self.episode_index = np.array(episode_index, dtype=np.int64)
+        self.frame_index = np.array(frame_index, dtype=np.int64)
+        self.task_index = np.array(task_index, dtype=np.int64)
+        
+        table = pa.table({
+            'action': pa.FixedSizeListArray.from_arrays(pa.array(self.actions.ravel()), 7),
+            'episode_index': self.episode_index,
+            'frame_index': self.frame_index,
+            'task_index': self.task_index,
+            'index': np.arange(len(self.actions), dtype=np.int64),
+        })
+        data_dir = root / 'data' / 'chunk-000'
+        data_dir.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, data_dir / 'file-000.parquet')
+    
+    def __len__(self):
+        return len(self.actions)
+    
+    def __getitem__(self, idx):
+        return {
+            'action': torch.from_numpy(self.actions[idx]),
+            'episode_index': torch.tensor(self.episode_index[idx]),
+            'frame_index': torch.tensor(self.frame_index[idx]),
+            'task_index': torch.tensor(self.task_index[idx]),
+            'task': self.meta.tasks[int(self.task_index[idx])],
+        }
+
+
+class FlakyLeRobotDataset(FakeLeRobotDataset):
+    """读取指定索引时抛出异常（模拟损坏的帧）"""
+    
+    def __init__(self, root: Path, episode_lengths, failing, seed: int = 0):
+        super().__init__(root, episode_lengths, seed)
+        self.failing = set(failing)
+    
+    def __getitem__(self, idx):
+        if idx in self.failing:
+            raise IOError(f'无法读取帧 {idx}')
+        return super().__getitem__(idx)
+
+
+def _normalize(changes):
+    """将Tensor字段转换为int，便于比较"""
+    return [
+        {k: (int(v) if isinstance(v, torch.Tensor) else v) for k, v in c.items()}
+        for c in changes
+    ]
+
+
+def test_columnar_matches_frame_detection():
+    """列式检测与逐帧检测输出一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = FakeLeRobotDataset(Path(tmp), [40, 55, 23, 61])
+        detector = GripperStateDetector(threshold=0.5)
+        
+        columns = load_low_dim_columns(dataset)
+        assert columns is not None
+        assert columns['action'].shape == (len(dataset), 7)
+        
+        for start_idx, end_idx in [(0, None), (17, 150), (0, 10000)]:
+            expected = detector.detect_gripper_changes(dataset, start_idx, end_idx)
+            actual = detector.detect_gripper_changes_columnar(dataset, start_idx, end_idx)
+            assert _normalize(expected) == actual
+            assert len(actual) > 0
+
+
+def test_episode_table_frame_ranges():
+    """episode偏移表计算的帧范围与逐帧查找一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = FakeLeRobotDataset(Path(tmp), [40, 55, 23, 61])
+        detector = GripperStateDetector(threshold=0.5)
+        changes = detector.detect_gripper_changes_columnar(dataset)
+        
+        table = EpisodeTable.from_dataset(dataset)
+        assert table is not None and len(table) == 4
+        assert table.starts.tolist() == [0, 40, 95, 118]
+        assert table.ends.tolist() == [40, 95, 118, 179]
+        
+        for before_frames, after_frames in [(30, 30), (3, 7), (0, 0)]:
+            expected = detector._extract_frame_ranges_by_lookup(dataset, changes, before_frames, after_frames)
+            actual = detector.extract_frame_ranges(dataset, changes, before_frames, after_frames,
+                                                   episode_table=table)
+            assert expected == actual
+
+
+def test_parallel_matches_serial_detection():
+    """按episode分片的并行检测与串行检测输出一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = FakeLeRobotDataset(Path(tmp), [40, 55, 23, 61, 12, 70])
+        detector = GripperStateDetector(threshold=0.5)
+        
+        expected = detector.detect_gripper_changes(dataset, 5, None)
+        actual = detector.detect_gripper_changes_parallel(dataset, 5, None, num_workers=3)
+        assert _normalize(expected) == _normalize(actual)
+
+
+def test_parallel_skips_unreadable_boundary_frame():
+    """分片起点前一帧读取失败时，与串行检测一样和更早的正常帧比较，不丢失分片起点的变化"""
+    with tempfile.TemporaryDirectory() as tmp:
+        lengths = [40, 55, 23, 61, 12, 70]
+        starts = np.cumsum(lengths)[:-1].tolist()
+        # 每个episode的最后一帧无法读取；倒数第二帧为打开、下一个episode的第一帧为关闭
+        dataset = FlakyLeRobotDataset(Path(tmp), lengths, failing=[s - 1 for s in starts])
+        for s in starts:
+            dataset.actions[s - 2, -1] = -1.0
+            dataset.actions[s, -1] = 1.0
+        detector = GripperStateDetector(threshold=0.5)
+        
+        expected = detector.detect_gripper_changes(dataset, 0, None, verbose=False)
+        assert set(starts) <= {c['index'] for c in expected}
+        actual = detector.detect_gripper_changes_parallel(dataset, 0, None, num_workers=3)
+        assert _normalize(expected) == _normalize(actual)
+
+
+def test_workers_ignored_by_columnar_detection_warns():
+    """num_workers 只对逐帧检测生效：列式检测忽略它并给出警告，结果与单进程一致"""
+    import contextlib
+    import io
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = FakeLeRobotDataset(Path(tmp), [40, 55, 23])
+        expected = analyze_gripper_changes(dataset, 0, len(dataset), method='columnar')
+        
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            actual = analyze_gripper_changes(dataset, 0, len(dataset), method='columnar', num_workers=4)
+        assert actual == expected
+        assert "num_workers=4 只对逐帧检测" in output.getvalue()
+
+
+def test_coarse_matches_frame_detection():
+    """粗采样+二分检测：常值区间不短于采样间隔时与逐帧检测一致，且读取帧数大幅减少"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = FakeLeRobotDataset(Path(tmp), [40, 55, 23, 61, 12, 70])
+        detector = GripperStateDetector(threshold=0.5)
+        expected = _normalize(detector.detect_gripper_changes(dataset, 3, None))
+
+        reads = []
+        original_getitem = FakeLeRobotDataset.__getitem__
+        dataset.__class__ = type('CountingDataset', (FakeLeRobotDataset,), {
+            '__getitem__': lambda self, idx: reads.append(idx) or original_getitem(self, idx)
+        })
+
+        # FakeLeRobotDataset 的常值区间至少5帧
+        for stride in [1, 4, 5]:
+            reads.clear()
+            actual = detector.detect_gripper_changes_coarse(dataset, 3, None, stride=stride)
+            assert _normalize(actual) == expected
+            assert len(reads) == len(set(reads))
+
+        # 长常值区间：读取帧数远少于逐帧检测
+        dataset.actions[:, -1] = np.where((np.arange(len(dataset)) // 50) % 2 == 0, -1.0, 1.0)
+        expected = _normalize(detector.detect_gripper_changes(dataset))
+        reads.clear()
+        assert _normalize(detector.detect_gripper_changes_coarse(dataset, stride=16)) == expected
+        assert len(reads) < len(dataset) // 3
+
+
+def test_keyframe_cache_roundtrip():
+    """关键帧索引缓存：命中时结果一致，数据集变化后失效"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = FakeLeRobotDataset(Path(tmp) / 'dataset', [40, 55, 23])
+        cache_path = Path(tmp) / 'keyframe_index.npz'
+        
+        changes, ranges = analyze_gripper_changes(dataset, 0, len(dataset), cache_path=cache_path)
+        assert cache_path.exists()
+        
+        cached_changes, cached_ranges = analyze_gripper_changes(dataset, 0, len(dataset), cache_path=cache_path)
+        assert cached_changes == changes
+        assert cached_ranges == ranges
+        
+        # 修改数据文件后指纹变化，缓存失效
+        from keyframe_cache import compute_dataset_fingerprint, load_keyframe_index
+        data_file = next((Path(tmp) / 'dataset' / 'data').glob('**/*.parquet'))
+        data_file.write_bytes(data_file.read_bytes() + b'\0')
+        fingerprint = compute_dataset_fingerprint(dataset.root)
+        assert load_keyframe_index(cache_path, fingerprint, 0.5, 0, len(dataset)) is None
+        
+        # 事件规则的自定义动作类型按文件的字符串表保存和还原
+        from keyframe_cache import save_keyframe_index
+        custom = [dict(change, action_type=action_type, source='push_rule')
+                  for change, action_type in zip(changes, ['push', 'pick', 'wipe'])]
+        save_keyframe_index(cache_path, custom, fingerprint, 0.5, 0, len(dataset), detector='events')
+        assert load_keyframe_index(cache_path, fingerprint, 0.5, 0, len(dataset), detector='events') == custom
+
+
+def test_signal_store_materialize():
+    """物化后的信号存储被检测复用，且结果不变"""
+    from signal_store import SignalStore
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = FakeLeRobotDataset(Path(tmp), [40, 55, 23])
+        detector = GripperStateDetector(threshold=0.5)
+        expected = detector.detect_gripper_changes_columnar(dataset)
+        
+        store = SignalStore.materialize(dataset.root)
+        assert len(store) == len(dataset)
+        assert 'observation.state' not in store  # 源数据中不存在的列不会被物化
+        assert isinstance(store.column('action'), np.memmap)
+        assert store.episode_table().starts.tolist() == [0, 40, 95]
+        
+        columns = load_low_dim_columns(dataset)
+        assert isinstance(columns['action'], np.memmap)
+        assert detector.detect_gripper_changes_columnar(dataset) == expected
+
+
+def test_streaming_matches_offline():
+    """逐帧/小批量推送的流式检测与离线检测 + 范围提取结果一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = FakeLeRobotDataset(Path(tmp), [40, 55, 23, 61])
+        detector = GripperStateDetector(threshold=0.5)
+        expected_changes = detector.detect_gripper_changes_columnar(dataset)
+        expected_ranges = detector.extract_frame_ranges(dataset, expected_changes, 10, 12)
+
+        for batch_size in [1, 7]:
+            stream = StreamingGripperDetector(threshold=0.5, before_frames=10, after_frames=12)
+            changes, ranges = [], []
+            table = EpisodeTable.from_episode_column(dataset.episode_index)
+            for ep, (start, end) in enumerate(zip(table.starts, table.ends)):
+                task_index = int(dataset.task_index[start])
+                for batch_start in range(start, end, batch_size):
+                    batch_end = min(batch_start + batch_size, end)
+                    new_changes, completed = stream.push_batch(
+                        dataset.actions[batch_start:batch_end], ep,
+                        task=dataset.meta.tasks[task_index], task_index=task_index)
+                    changes += new_changes
+                    ranges += completed
+                    # 已完成的范围不会超出已推送的帧
+                    assert all(r['frame_end'] <= batch_end for r in completed)
+            ranges += stream.end_episode()
+
+            assert changes == expected_changes
+            assert ranges == expected_ranges
+
+
+def test_event_engine_rules():
+    """多信号事件引擎：action_flip 与列式检测一致；宽度/接触规则在合成信号上定位准确"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = FakeLeRobotDataset(Path(tmp), [40, 55, 23, 61])
+        detector = GripperStateDetector(threshold=0.5)
+        expected = detector.detect_gripper_changes_columnar(dataset)
+
+        engine = MultiSignalEventDetector([ActionGripperFlipRule(0.5)])
+        actual = engine.detect_dataset(dataset)
+        assert [{k: v for k, v in c.items() if k != 'source'} for c in actual] == expected
+
+        # 手指位置滞后指令2帧：宽度事件 = episode内的指令翻转 + 2
+        columns = load_low_dim_columns(dataset)
+        lag = 2
+        table = EpisodeTable.from_episode_column(dataset.episode_index)
+        episode_starts, episode_ends = table.bounds(np.arange(len(dataset)))
+        lagged = np.maximum(np.arange(len(dataset)) - lag, episode_starts)
+        finger = np.where(dataset.actions[lagged, -1] > 0, 0.02, 0.04)
+        state = np.zeros((len(dataset), 8))
+        state[:, -2], state[:, -1] = finger, -finger
+        columns['observation.state'] = state
+
+        flips = [c for c in expected
+                 if c['index'] != episode_starts[c['index']] and c['index'] + lag < episode_ends[c['index']]]
+
+        width_engine = MultiSignalEventDetector([GripperWidthRule(smooth_window=1)])
+        events = width_engine.detect(columns)
+        assert [e['index'] for e in events] == [c['index'] + lag for c in flips]
+        assert [e['action_type'] for e in events] == [c['action_type'] for c in flips]
+
+    # 末端匀速运动后在第20帧停下
+    position = np.concatenate([np.arange(20) * 0.01, np.full(10, 0.19)])
+    state = np.zeros((30, 8))
+    state[:, 0] = position
+    columns = {
+        'action': np.zeros((30, 7)),
+        'observation.state': state,
+        'episode_index': np.zeros(30, dtype=np.int64),
+    }
+    events = MultiSignalEventDetector([ContactOnsetRule(smooth_window=1)]).detect(columns)
+    assert [(e['index'], e['action_type']) for e in events] == [(20, 'contact')]
+    
+    # 没有实现 detect 的规则在创建时就报错
+    class IncompleteRule(EventRule):
+        name = 'incomplete'
+    
+    try:
+        IncompleteRule()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('缺少 detect 的规则未在创建时报错')
+
+
+if __name__ == '__main__':
+    test_columnar_matches_frame_detection()
+    test_episode_table_frame_ranges()
+    test_parallel_matches_serial_detection()
+    test_parallel_skips_unreadable_boundary_frame()
+    test_workers_ignored_by_columnar_detection_warns()
+    test_coarse_matches_frame_detection()
+    test_keyframe_cache_roundtrip()
+    test_signal_store_materialize()
+    test_streaming_matches_offline()
+    test_event_engine_rules()
+    print("✅ 所有测试通过！")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+测试多进程分片裁剪：分片边界落在原始episode变化处，合并结果与单进程裁剪一致
+"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 添加路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from dataset_cutter import cut_and_convert_dataset
+from sharded_cut import split_into_shards
+from test_dataset_cutter import _make_dataset, _frame_ranges
+
+
+def _read_output(root: Path):
+    """按episode顺序读取输出数据集的 (episodes元数据, tasks, 拼接后的帧表)"""
+    info = json.loads((root / 'meta' / 'info.json').read_text())
+    episodes = pd.read_parquet(root / 'meta' / 'episodes' / 'chunk-000' / 'file-000.parquet')
+    tasks = pd.read_parquet(root / 'meta' / 'tasks.parquet')
+    files = dict.fromkeys(zip(episodes['data/chunk_index'], episodes['data/file_index']))
+    tables = [pq.read_table(root / info['data_path'].format(chunk_index=chunk, file_index=file))
+              for chunk, file in files]
+    return episodes, tasks, pa.concat_tables(tables)
+
+
+def test_shards_split_at_episode_changes():
+    """分片连续覆盖全部范围，边界两侧属于不同的原始episode，帧数大致均衡"""
+    ranges = [{'frame_start': 0, 'frame_end': 10, 'episode_index': ep} for ep in [0, 0, 1, 2, 2, 2, 3, 4]]
+    shards = split_into_shards(ranges, 3)
+    
+    assert shards[0][0] == 0 and shards[-1][1] == len(ranges)
+    assert all(a[1] == b[0] for a, b in zip(shards, shards[1:]))
+    for _, end in shards[:-1]:
+        assert ranges[end]['episode_index'] != ranges[end - 1]['episode_index']
+    assert len(shards) == 3
+    
+    # 只有一个原始episode时无法分片
+    assert split_into_shards(ranges[:2], 4) == [(0, 2)]
+    assert split_into_shards([], 4) == []
+
+
+def test_sharded_output_matches_single_process():
+    """多进程分片 + 合并 与 单进程传统方法的输出逐列一致（含placeholder、任务索引与全局索引）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)
+        # 数据文件上限很小：合并时的重新打包也要与单进程的滚动位置一致
+        options = dict(save_mode='lerobot', batch_size=3, use_official_api=False, insert_placeholders=True,
+                       data_files_size_in_mb=0.01)
+        
+        single = cut_and_convert_dataset(dataset, frame_ranges, str(Path(tmp) / 'single'), **options)
+        sharded = cut_and_convert_dataset(dataset, frame_ranges, str(Path(tmp) / 'sharded'), workers=3, **options)
+        
+        expected_episodes, expected_tasks, expected_table = _read_output(Path(single))
+        episodes, tasks, table = _read_output(Path(sharded))
+        
+        assert len(set(zip(episodes['data/chunk_index'], episodes['data/file_index']))) > 1
+        pd.testing.assert_frame_equal(expected_episodes, episodes)
+        pd.testing.assert_frame_equal(expected_tasks, tasks)
+        assert table.equals(expected_table, check_metadata=True)
+        assert table.column('index').to_pylist() == list(range(table.num_rows))
+        assert not (Path(sharded) / '_shards').exists()
+
+
+if __name__ == '__main__':
+    test_shards_split_at_episode_changes()
+    test_sharded_output_matches_single_process()
+    print("✅ 所有测试通过！")
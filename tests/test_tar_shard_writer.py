@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+测试tar分片图片模式：分片按大小滚动、episode不跨分片，每帧一个完整的WebDataset样本，成员内容与目录形式的图片模式一致，索引中的偏移可直接定位episode
+"""
+import io
+import json
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+# 添加路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from dataset_cutter import cut_and_convert_dataset
+from tar_shard_writer import SHARD_INDEX_PATH, TarShardWriter
+from test_dataset_cutter import _make_dataset, _frame_ranges
+
+
+def test_image_tar_shards_match_image_directory():
+    """tar分片中每个episode的图像与目录形式的图片模式逐字节一致；索引的字节范围对应episode的全部成员"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)
+        
+        directory = Path(cut_and_convert_dataset(dataset, frame_ranges, str(Path(tmp) / 'dir'), save_mode='image',
+                                                 batch_size=3))
+        sharded = Path(cut_and_convert_dataset(dataset, frame_ranges, str(Path(tmp) / 'tar'), save_mode='image-tar',
+                                               batch_size=3, image_workers=3, shard_size_in_mb=0.5))
+        
+        index = json.loads((sharded / SHARD_INDEX_PATH).read_text())
+        summary = json.loads((directory / 'episodes_summary.json').read_text())
+        assert index['total_episodes'] == summary['total_episodes'] == len(frame_ranges)
+        assert index['total_shards'] > 1
+        assert not (sharded / 'images').exists()
+        
+        # 大小上限包含成员头、对齐填充和tar结尾的结束块
+        for shard in index['shards']:
+            assert shard['num_bytes'] <= 0.5 * 1024 ** 2 or shard['num_episodes'] == 1
+        
+        for entry, expected in zip(index['episodes'], summary['episodes']):
+            with open(sharded / 'shards' / entry['shard'], 'rb') as f:
+                f.seek(entry['offset'])
+                data = f.read(entry['num_bytes'])
+            
+            # 索引的字节范围本身是一段完整的tar成员序列
+            with tarfile.open(fileobj=io.BytesIO(data), mode='r:') as tar:
+                members = {m.name: tar.extractfile(m).read() for m in tar.getmembers()}
+            
+            # 每个WebDataset样本（成员名第一个点之前的部分）恰好是一帧的两路相机图像和该帧的json
+            samples = {}
+            for name in members:
+                sample_key, extension = name.split('.', 1)
+                samples.setdefault(sample_key, []).append(extension)
+            assert len(samples) == expected['num_frames']
+            assert all(extensions == ['cam1.jpg', 'cam2.jpg', 'json'] for extensions in samples.values())
+            
+            record = entry['metadata']
+            assert 'frames' not in record
+            assert record == {k: v for k, v in expected.items() if k != 'frames'}
+            assert entry['num_frames'] == expected['num_frames']
+            for expected_frame in expected['frames']:
+                sample_key = f"{entry['key']}/frame_{expected_frame['frame_idx']:04d}"
+                frame = json.loads(members[f'{sample_key}.json'])
+                assert frame['action'] == expected_frame['action']
+                assert frame['state'] == expected_frame['state']
+                for key in ['episode_idx', 'task', 'action_type', 'original_task', 'cut_range_id', 'keyframe_index']:
+                    assert frame[key] == record[key if key != 'task' else 'new_task'], key
+                assert frame['original_episode_index'] == frame_ranges[record['cut_range_id']]['episode_index']
+                for camera in ['cam1', 'cam2']:
+                    assert frame[camera] == f'{sample_key}.{camera}.jpg'
+                    assert members[frame[camera]] == (directory / expected_frame[camera]).read_bytes()
+
+
+def test_shard_size_cap_counts_tar_trailer():
+    """成员恰好填满上限时，tar结尾的结束块和记录填充会超出上限，下一个episode应换到新分片"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cap = 2 * tarfile.RECORDSIZE
+        # 每个episode（512字节头 + 数据）恰好占半个上限
+        data = bytes(tarfile.RECORDSIZE - tarfile.BLOCKSIZE)
+        writer = TarShardWriter(tmp, max_shard_mb=cap / 1024 ** 2)
+        for episode in range(4):
+            writer.write_episode(f'episode_{episode:04d}', [('frame_0000.json', data)], {'num_frames': 1})
+        index = json.loads(writer.close().read_text())
+        
+        for shard in index['shards']:
+            assert shard['num_bytes'] == (Path(tmp) / 'shards' / shard['shard']).stat().st_size
+            assert shard['num_bytes'] <= cap
+        assert [shard['num_episodes'] for shard in index['shards']] == [1, 1, 1, 1]
+
+
+if __name__ == '__main__':
+    test_image_tar_shards_match_image_directory()
+    test_shard_size_cap_counts_tar_trailer()
+    print("✅ 所有测试通过！")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+测试视频模式：相机画面编码为按大小滚动的 chunk/file 视频，meta中的时间戳与数据帧一一对应
+"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# 添加路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from dataset_cutter import DatasetCutter, cut_and_convert_dataset
+from video_writer import VIDEO_PATH, video_backend
+from test_dataset_cutter import _make_dataset, _frame_ranges
+
+
+def _decode_frames(path: Path) -> np.ndarray:
+    import av
+    with av.open(str(path)) as container:
+        return np.stack([frame.to_ndarray(format='rgb24') for frame in container.decode(video=0)])
+
+
+def test_video_mode_writes_chunked_camera_videos():
+    """每个相机的视频按episode顺序拼接进滚动文件；帧数、时间戳与数据文件一致，画面与源图像接近"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)
+        output = Path(cut_and_convert_dataset(dataset, frame_ranges, str(Path(tmp) / 'out'),
+                                              save_mode='lerobot-video', batch_size=3, use_official_api=False,
+                                              insert_placeholders=True, video_files_size_in_mb=0.005))
+        
+        info = json.loads((output / 'meta' / 'info.json').read_text())
+        episodes = pd.read_parquet(output / 'meta' / 'episodes' / 'chunk-000' / 'file-000.parquet')
+        data_columns = pq.read_schema(output / info['data_path'].format(chunk_index=0, file_index=0)).names
+        
+        backend = video_backend()
+        if backend is None:
+            # 没有本地编码器：退回图像Parquet
+            assert 'video_path' not in info
+            assert 'observation.images.image' in data_columns
+            return
+        
+        assert info['features']['observation.images.image']['dtype'] == 'video'
+        assert 'observation.images.image' not in data_columns
+        assert not (output / 'videos' / '_episodes').exists()
+        
+        fps = info['fps']
+        for key in ['observation.images.image', 'observation.images.image2']:
+            prefix = f'videos/{key}'
+            files = list(dict.fromkeys(zip(episodes[f'{prefix}/chunk_index'], episodes[f'{prefix}/file_index'])))
+            assert len(files) > 1
+            
+            durations = episodes[f'{prefix}/to_timestamp'] - episodes[f'{prefix}/from_timestamp']
+            assert np.allclose(durations, episodes['length'] / fps)
+            
+            for chunk, file in files:
+                in_file = episodes[(episodes[f'{prefix}/chunk_index'] == chunk) & (episodes[f'{prefix}/file_index'] == file)]
+                # 同一文件内的episode首尾相接
+                assert in_file[f'{prefix}/from_timestamp'].iloc[0] == 0
+                assert np.allclose(in_file[f'{prefix}/from_timestamp'].iloc[1:], in_file[f'{prefix}/to_timestamp'].iloc[:-1])
+                
+                if backend == 'pyav':
+                    path = output / VIDEO_PATH.format(video_key=key, chunk_index=chunk, file_index=file)
+                    assert len(_decode_frames(path)) == in_file['length'].sum()
+        
+        # 数据文件的timestamp是episode视频片段内的位置：from_timestamp + timestamp 落在本episode的片段内
+        data = pq.read_table(output / info['data_path'].format(chunk_index=0, file_index=0)).to_pandas()
+        for path in sorted((output / 'data').rglob('*.parquet'))[1:]:
+            data = pd.concat([data, pq.read_table(path).to_pandas()], ignore_index=True)
+        prefix = 'videos/observation.images.image'
+        decoded_files = {}
+        for episode in episodes.to_dict('records'):
+            rows = data[data['episode_index'] == episode['episode_index']]
+            assert len(rows) == episode['length']
+            positions = episode[f'{prefix}/from_timestamp'] + rows['timestamp'].to_numpy()
+            assert (positions >= episode[f'{prefix}/from_timestamp'] - 1e-6).all()
+            assert (positions < episode[f'{prefix}/to_timestamp'] - 1e-6).all()
+            
+            if backend != 'pyav':
+                continue
+            # 第k个数据帧解码得到的画面是源范围的第k帧（placeholder帧为最后一帧；有损编码，只比较平均误差）
+            location = (episode[f'{prefix}/chunk_index'], episode[f'{prefix}/file_index'])
+            if location not in decoded_files:
+                decoded_files[location] = _decode_frames(output / VIDEO_PATH.format(
+                    video_key='observation.images.image', chunk_index=location[0], file_index=location[1]))
+            frame_range = frame_ranges[episode['cut_range_id']]
+            for k, position in enumerate(positions):
+                source_idx = min(frame_range['frame_start'] + k, frame_range['frame_end'] - 1)
+                source = DatasetCutter._tensor_to_numpy_image(dataset[source_idx]['observation.images.image'])
+                decoded = decoded_files[location][int(round(position * fps))]
+                assert np.abs(decoded.astype(np.int16) - source).mean() < 10
+
+def test_memory_budget_counts_encode_stage():
+    """内存预算按批次数划分时计入编码阶段（线程、输出队列与placeholder帧副本）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = _make_dataset(tmp)
+        frame_ranges = _frame_ranges(dataset)
+        cutter = DatasetCutter(Path(tmp) / 'out', save_mode='lerobot', memory_budget_gb=64,
+                               insert_placeholders=True, use_official_api=False)
+        
+        cutter._build_batch_pipeline(dataset, frame_ranges, len(frame_ranges), image_target='numpy')
+        without_encode = cutter._batcher.batches_in_flight
+        cutter._build_batch_pipeline(dataset, frame_ranges, len(frame_ranges), image_target='numpy',
+                                     encode=lambda batch: batch)
+        assert cutter._batcher.batches_in_flight == without_encode + cutter.pipeline_queue_size + 2
+
+
+if __name__ == '__main__':
+    test_video_mode_writes_chunked_camera_videos()
+    test_memory_budget_counts_encode_stage()
+    print("✅ 所有测试通过！")
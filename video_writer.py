@@ -0,0 +1,194 @@
+"""
+相机视频写出：把episode的图像编码为MP4（默认AV1），连续episode拼接为按大小滚动的 chunk/file 视频文件
+
+编码器为本地的 PyAV（优先）或 ffmpeg 命令行，两者都不可用时 video_backend() 返回 None。
+"""
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# LeRobot v3 视频文件布局
+VIDEO_PATH = 'videos/{video_key}/chunk-{chunk_index:03d}/file-{file_index:03d}.mp4'
+DEFAULT_VIDEO_FILE_SIZE_MB = 500
+DEFAULT_VIDEO_CODEC = 'libsvtav1'
+
+# 与LeRobot默认编码参数相同
+VIDEO_PIX_FMT = 'yuv420p'
+VIDEO_GOP = 2
+VIDEO_CRF = 30
+
+
+def video_backend() -> Optional[str]:
+    """可用的本地编码器：'pyav' / 'ffmpeg' / None"""
+    try:
+        import av  # noqa: F401
+        return 'pyav'
+    except ImportError:
+        pass
+    if shutil.which('ffmpeg'):
+        return 'ffmpeg'
+    return None
+
+
+def encode_video(frames: np.ndarray, path: Path, fps: float, codec: str = DEFAULT_VIDEO_CODEC,
+                 backend: Optional[str] = None):
+    """
+    把 [T, H, W, 3] uint8 帧编码为一个视频文件
+    
+    Args:
+        frames: RGB帧
+        path: 输出路径（.mp4）
+        fps: 帧率
+        codec: 编码器名称（libsvtav1 / libx264 / ...）
+        backend: 'pyav' 或 'ffmpeg'（None表示自动选择）
+    """
+    backend = backend or video_backend()
+    frames = np.ascontiguousarray(frames, dtype=np.uint8)
+    height, width = frames.shape[1:3]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    if backend == 'pyav':
+        import av
+        from fractions import Fraction
+        
+        with av.open(str(path), 'w') as container:
+            stream = container.add_stream(codec, rate=Fraction(fps).limit_denominator(1000),
+                                          options={'g': str(VIDEO_GOP), 'crf': str(VIDEO_CRF)})
+            stream.width, stream.height, stream.pix_fmt = width, height, VIDEO_PIX_FMT
+            for frame in frames:
+                for packet in stream.encode(av.VideoFrame.from_ndarray(frame, format='rgb24')):
+                    container.mux(packet)
+            for packet in stream.encode():
+                container.mux(packet)
+    elif backend == 'ffmpeg':
+        command = ['ffmpeg', '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+                   '-c:v', codec, '-pix_fmt', VIDEO_PIX_FMT, '-g', str(VIDEO_GOP), '-crf', str(VIDEO_CRF),
+                   str(path)]
+        result = subprocess.run(command, input=frames.tobytes(), stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg编码失败: {result.stderr.decode(errors='replace').strip()}")
+    else:
+        raise RuntimeError("没有可用的视频编码器（需要 PyAV 或 ffmpeg）")
+
+
+def concatenate_videos(inputs: List[Path], output: Path, backend: Optional[str] = None):
+    """
+    按顺序拼接编码参数相同的视频（只重新封装，不重新编码）
+    """
+    backend = backend or video_backend()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    
+    if len(inputs) == 1:
+        shutil.copyfile(inputs[0], output)
+        return
+    
+    if backend == 'pyav':
+        import av
+        
+        with av.open(str(output), 'w') as container:
+            out_stream = None
+            offset = 0
+            for path in inputs:
+                with av.open(str(path)) as source:
+                    in_stream = source.streams.video[0]
+                    if out_stream is None:
+                        out_stream = container.add_stream_from_template(in_stream, opaque=True)
+                    end = offset
+                    for packet in source.demux(in_stream):
+                        if packet.dts is None:
+                            continue
+                        packet.pts += offset
+                        packet.dts += offset
+                        end = max(end, packet.pts + (packet.duration or 0))
+                        packet.stream = out_stream
+                        container.mux(packet)
+                    offset = end
+    elif backend == 'ffmpeg':
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as listing:
+            for path in inputs:
+                listing.write(f"file '{Path(path).absolute()}'\n")
+        try:
+            command = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                       '-i', listing.name, '-c', 'copy', str(output)]
+            result = subprocess.run(command, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                raise RuntimeError(f"ffmpeg拼接失败: {result.stderr.decode(errors='replace').strip()}")
+        finally:
+            Path(listing.name).unlink()
+    else:
+        raise RuntimeError("没有可用的视频编码器（需要 PyAV 或 ffmpeg）")
+
+
+class RollingVideoWriter:
+    """
+    一个相机的滚动视频文件：连续episode的视频依次拼接到当前文件，
+    加上下一个episode会超过大小上限时换到下一个文件（episode不跨文件）
+    """
+    
+    def __init__(self, root, video_key: str, fps: float, max_file_mb: float = DEFAULT_VIDEO_FILE_SIZE_MB,
+                 chunks_size: int = 1000, backend: Optional[str] = None):
+        self.root = Path(root)
+        self.video_key = video_key
+        self.fps = fps
+        self.max_file_bytes = max_file_mb * 1024 ** 2
+        self.chunks_size = chunks_size
+        self.backend = backend or video_backend()
+        self.num_files = 0
+        self._pending: List[Path] = []
+        self._pending_bytes = 0
+        self._pending_frames = 0
+    
+    def _location(self):
+        file_number = self.num_files
+        return file_number // self.chunks_size, file_number % self.chunks_size
+    
+    def add_episode(self, episode_video: Path, num_frames: int) -> Dict:
+        """
+        追加一个episode的视频（已编码的临时文件，拼接后删除）
+        
+        Returns:
+            该episode的视频元数据 {videos/<key>/chunk_index, file_index, from_timestamp, to_timestamp}
+        """
+        size = Path(episode_video).stat().st_size
+        if self._pending and self._pending_bytes + size > self.max_file_bytes:
+            self.flush()
+        
+        chunk_index, file_index = self._location()
+        from_timestamp = self._pending_frames / self.fps
+        self._pending.append(Path(episode_video))
+        self._pending_bytes += size
+        self._pending_frames += num_frames
+        
+        prefix = f'videos/{self.video_key}'
+        return {
+            f'{prefix}/chunk_index': chunk_index,
+            f'{prefix}/file_index': file_index,
+            f'{prefix}/from_timestamp': from_timestamp,
+            f'{prefix}/to_timestamp': self._pending_frames / self.fps,
+        }
+    
+    def flush(self):
+        """把当前文件的episode视频拼接写出"""
+        if not self._pending:
+            return
+        chunk_index, file_index = self._location()
+        output = self.root / VIDEO_PATH.format(video_key=self.video_key, chunk_index=chunk_index,
+                                               file_index=file_index)
+        concatenate_videos(self._pending, output, self.backend)
+        for path in self._pending:
+            path.unlink()
+        self._pending, self._pending_bytes, self._pending_frames = [], 0, 0
+        self.num_files += 1
+    
+    def close(self):
+        self.flush()
+
+
+if __name__ == '__main__':
+    print("Video Writer Module")